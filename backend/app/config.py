@@ -1,32 +1,147 @@
 
+import logging
 import os
 from dotenv import load_dotenv
 
+logger = logging.getLogger(__name__)
+
 # Load environment variables from the same directory as this file
 dotenv_path = os.path.join(os.path.dirname(__file__), ".env")
 load_dotenv(dotenv_path=dotenv_path)
 load_dotenv(dotenv_path=dotenv_path, override=True)
-print("File exists:", os.path.isfile(dotenv_path))
+if os.path.isfile(dotenv_path):
+    logger.debug("Loaded environment from %s", dotenv_path)
 
-# API key for authentication
+# API keys for authentication: a plain API_KEY and/or hashed named keys,
+# "name:pbkdf2_sha256$...,other:sha256$..." (see `python -m app.utils.auth hash`)
 API_KEY = os.getenv("API_KEY")
-print(f"Config loaded API_KEY: {API_KEY}")
-print(f"Config API_KEY length: {len(API_KEY) if API_KEY else 0}")
+API_KEY_HASHES = os.getenv("API_KEY_HASHES", "")
 
-if not API_KEY:
+if not API_KEY and not API_KEY_HASHES.strip():
     raise RuntimeError("API_KEY is missing in environment variables. Please set it in your .env file.")
 
+# Admin session tokens issued by POST /verify-key
+SESSION_TOKEN_SECRET = os.getenv("SESSION_TOKEN_SECRET")  # Default: derived from the configured keys
+SESSION_TOKEN_TTL = int(os.getenv("SESSION_TOKEN_TTL", "900"))  # Seconds
+
+# In-memory, per-worker limits on authenticated requests
+AUTH_RATE_LIMIT = float(os.getenv("AUTH_RATE_LIMIT", "120"))  # Requests per minute per key
+AUTH_FAILURE_LIMIT = float(os.getenv("AUTH_FAILURE_LIMIT", "10"))  # Rejected attempts per minute per client address
+
 # Email settings
 EMAIL_PASSWORD = os.getenv("EMAIL_PASSWORD")
 EMAIL_SENDER = os.getenv("EMAIL_ADDRESS")
 EMAIL_RECIPIENT = os.getenv("EMAIL_ADDRESS")  # Where to receive contact form messages
 DOMAIN_SENDER = os.getenv("DOMAIN_SENDER")  # Domain sender for newsletters
+# Signs unsubscribe links; default: derived from the configured keys (rotating them breaks links in sent mail)
+UNSUBSCRIBE_SECRET = os.getenv("UNSUBSCRIBE_SECRET")
+
+# SMTP delivery settings
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))  # Concurrent authenticated sessions
+SMTP_MAX_MESSAGES_PER_CONNECTION = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+
+# Outbox for contact and welcome emails
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))  # Seconds between checks for due messages
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))  # Then the message is dead-lettered
+OUTBOX_RETRY_BASE = float(os.getenv("OUTBOX_RETRY_BASE", "30"))  # Seconds before the first retry, doubled each time
+OUTBOX_RETRY_MAX = float(os.getenv("OUTBOX_RETRY_MAX", "3600"))
+OUTBOX_LEASE_SECONDS = float(os.getenv("OUTBOX_LEASE_SECONDS", "300"))  # A claimed message is retried after this if its sender died
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))  # Sent messages are kept this long
+
+# Scheduled newsletters and digests
+NEWSLETTER_POLL_INTERVAL = float(os.getenv("NEWSLETTER_POLL_INTERVAL", "15"))  # Seconds between checks for due jobs
+NEWSLETTER_BATCH_SIZE = int(os.getenv("NEWSLETTER_BATCH_SIZE", "200"))  # Recipients sent and recorded per transaction
+NEWSLETTER_RATE_LIMIT = int(os.getenv("NEWSLETTER_RATE_LIMIT", "0"))  # Messages per NEWSLETTER_RATE_WINDOW across all workers; 0 is unlimited
+NEWSLETTER_RATE_WINDOW = float(os.getenv("NEWSLETTER_RATE_WINDOW", "3600"))  # Seconds
+NEWSLETTER_MAX_ATTEMPTS = int(os.getenv("NEWSLETTER_MAX_ATTEMPTS", "3"))  # Passes over a job's failed recipients
+NEWSLETTER_LEASE_SECONDS = float(os.getenv("NEWSLETTER_LEASE_SECONDS", "120"))  # A running job is resumed elsewhere after this if its worker died
+NEWSLETTER_RETENTION_DAYS = int(os.getenv("NEWSLETTER_RETENTION_DAYS", "30"))  # Per-recipient rows of finished jobs are kept this long
+NEWSLETTER_DIGEST_INTERVAL_HOURS = float(os.getenv("NEWSLETTER_DIGEST_INTERVAL_HOURS", "0"))  # Schedule a digest this often; 0 disables
+NEWSLETTER_DIGEST_MAX_POSTS = int(os.getenv("NEWSLETTER_DIGEST_MAX_POSTS", "20"))
+NEWSLETTER_DIGEST_SUBJECT = os.getenv("NEWSLETTER_DIGEST_SUBJECT", "Your smallCapSIGNAL digest")
 
 # Database settings
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-DATA_DIR = os.path.join(BASE_DIR, "data")
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(BASE_DIR, "data"))
 os.makedirs(DATA_DIR, exist_ok=True)
 
 # Database connection strings
-DATABASE_URL = f"sqlite:///{os.path.join(DATA_DIR, 'posts.db')}"
-SUBSCRIBERS_DATABASE_URL = f"sqlite:///{os.path.join(DATA_DIR, 'subscribers.db')}"
+DATABASE_PATH = os.path.join(DATA_DIR, "smallcap.db")
+DATABASE_URL = f"sqlite:///{DATABASE_PATH}"
+# Separate files used before posts and subscribers shared one database; imported on first start
+LEGACY_POSTS_DATABASE = os.path.join(DATA_DIR, "posts.db")
+LEGACY_SUBSCRIBERS_DATABASE = os.path.join(DATA_DIR, "subscribers.db")
+
+# SQLite tuning, applied to every new connection
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # Wait for writers instead of "database is locked"
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "20000"))  # Page cache per connection
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "5"))  # Per worker process
+SQLITE_MAX_OVERFLOW = int(os.getenv("SQLITE_MAX_OVERFLOW", "10"))
+
+# Server settings
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("SERVER_PORT", "8111"))
+SERVER_WORKERS = int(os.getenv("SERVER_WORKERS", "0"))  # 0: one worker per CPU in production mode
+SERVER_GRACEFUL_SHUTDOWN_TIMEOUT = float(os.getenv("SERVER_GRACEFUL_SHUTDOWN_TIMEOUT", "10"))  # Then open SSE streams are cut
+# Comma-separated proxy addresses whose X-Forwarded-For is believed; anyone else's client address is the socket peer.
+# Rate limits key on that address, so never "*" while the port is reachable without the proxy.
+FORWARDED_ALLOW_IPS = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# Public site address used in feeds and emails
+SITE_URL = os.getenv("SITE_URL", "https://www.smallcapsignal.com").rstrip("/")
+
+# Feed artifacts
+FEED_ITEM_COUNT = int(os.getenv("FEED_ITEM_COUNT", "20"))
+FEED_FULL_CONTENT = os.getenv("FEED_FULL_CONTENT", "true").lower() in ("1", "true", "yes")  # false: excerpts only
+FEED_IMAGE_WIDTH = int(os.getenv("FEED_IMAGE_WIDTH", "1280"))  # Widest JPEG variant of an uploaded image used in feeds
+
+# Uploaded images, stored once per content hash with resized variants
+UPLOADS_DIR = os.getenv("UPLOADS_DIR", os.path.join(DATA_DIR, "uploads"))
+IMAGE_MAX_BYTES = int(os.getenv("IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", "40000000"))  # Larger images are refused before decoding
+IMAGE_VARIANT_WIDTHS = sorted({int(w) for w in os.getenv("IMAGE_VARIANT_WIDTHS", "320,640,1280").split(",") if w.strip()})
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "82"))  # WebP and JPEG variants
+
+# Live signal stream (SSE)
+SIGNAL_POLL_INTERVAL = float(os.getenv("SIGNAL_POLL_INTERVAL", "0.25"))  # How quickly other workers' posts reach this worker's clients
+SIGNAL_HEARTBEAT_INTERVAL = float(os.getenv("SIGNAL_HEARTBEAT_INTERVAL", "15"))  # Keeps idle connections open through proxies
+SIGNAL_CLIENT_BUFFER = int(os.getenv("SIGNAL_CLIENT_BUFFER", "64"))  # Events queued per client before a slow one is dropped
+SIGNAL_REPLAY_LIMIT = int(os.getenv("SIGNAL_REPLAY_LIMIT", "100"))  # Missed events resent to a reconnecting client
+SIGNAL_EVENT_RETENTION = int(os.getenv("SIGNAL_EVENT_RETENTION", "1000"))  # Events kept in the log for replay
+
+# Post cache: how often (seconds) a worker re-checks the shared version counter
+POST_CACHE_CHECK_INTERVAL = float(os.getenv("POST_CACHE_CHECK_INTERVAL", "1.0"))
+
+# Most posts accepted by one POST /posts/batch
+POST_BATCH_MAX_ITEMS = int(os.getenv("POST_BATCH_MAX_ITEMS", "1000"))
+
+# Per-worker Bloom filter of subscribed addresses, so signups of new addresses skip the lookup
+SUBSCRIBER_FILTER_ERROR_RATE = float(os.getenv("SUBSCRIBER_FILTER_ERROR_RATE", "0.001"))  # Share of new addresses still looked up; 0 disables the filter
+SUBSCRIBER_FILTER_MIN_CAPACITY = int(os.getenv("SUBSCRIBER_FILTER_MIN_CAPACITY", "100000"))  # Sized for twice the subscribers at load, at least this many
+
+# Built frontend, served from memory
+STATIC_DIR = os.getenv("STATIC_DIR", os.path.join(BASE_DIR, "..", "static"))
+STATIC_MAX_MEMORY_FILE = int(os.getenv("STATIC_MAX_MEMORY_FILE", str(4 * 1024 * 1024)))  # Larger files are streamed from disk
+STATIC_CHECK_INTERVAL = float(os.getenv("STATIC_CHECK_INTERVAL", "5"))  # How quickly a rebuild request reaches every worker
+
+# Metrics and profiling
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # Seconds between each worker's snapshot for /metrics
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))  # Profile requests slower than this; 0 disables the sampler
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "100"))  # Oldest profiles are deleted beyond this
+
+# Logging
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")  # Per-logger overrides, e.g. "app.utils.outbox=DEBUG,uvicorn.access=WARNING"
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # json or text
+
+# Rate limits on the unauthenticated write endpoints (POST /subscribe, /api/contact), per worker
+RATE_LIMIT_IP_PER_MINUTE = float(os.getenv("RATE_LIMIT_IP_PER_MINUTE", "20"))  # 0 disables
+RATE_LIMIT_EMAIL_PER_HOUR = float(os.getenv("RATE_LIMIT_EMAIL_PER_HOUR", "5"))  # Per address in the request body; 0 disables
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))  # Buckets kept per limiter, least recently used evicted
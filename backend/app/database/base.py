@@ -1,27 +1,156 @@
 
-from sqlalchemy import create_engine
+import os
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.schema import CreateColumn
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+from app.config import (
+    DATABASE_URL,
+    DATA_DIR,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_MMAP_SIZE,
+    SQLITE_POOL_SIZE,
+    SQLITE_MAX_OVERFLOW,
+)
+from app.utils.metrics import instrument_engine
+
+# Set by server.py once it has run create_tables() in the parent process
+SKIP_MIGRATIONS_ENV = "SMALLCAP_MIGRATIONS_DONE"
+
+def create_sqlite_engine(url: str):
+    """SQLite engine tuned for several worker processes sharing one file"""
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_MAX_OVERFLOW,
+    )
+    event.listen(engine, "connect", set_sqlite_pragmas)
+    return engine
+
+def create_async_sqlite_engine(url: str):
+    """aiosqlite engine over the same file, for handlers running on the event loop"""
+    engine = create_async_engine(
+        url.replace("sqlite:///", "sqlite+aiosqlite:///", 1),
+        connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000},
+        # aiosqlite defaults to NullPool, which would start a connection thread per session
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=SQLITE_POOL_SIZE,
+        max_overflow=SQLITE_MAX_OVERFLOW,
+    )
+    event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    return engine
 
-from app.config import DATABASE_URL, SUBSCRIBERS_DATABASE_URL
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers proceed while a writer commits; NORMAL sync is safe under WAL"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
 
-# Posts DB engine and session
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Posts, subscribers and the email outbox share one database file, so a
+# transaction can span all of them (app/database/migrate.py imports the
+# older posts.db/subscribers.db pair)
+engine = create_sqlite_engine(DATABASE_URL)
 SessionLocal = sessionmaker(bind=engine)
 Base = declarative_base()
 
-# Subscribers DB engine and session
-subscriber_engine = create_engine(SUBSCRIBERS_DATABASE_URL, connect_args={"check_same_thread": False})
-SubscriberSessionLocal = sessionmaker(bind=subscriber_engine)
-SubscriberBase = declarative_base()
+# Async engine and sessions for the route handlers; the sync ones above are
+# kept for migrations, scripts and worker threads
+async_engine = create_async_sqlite_engine(DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, expire_on_commit=False)
 
-def create_tables():
-    """Create all database tables if they don't exist"""
+# Query counts and timings for /metrics and Server-Timing
+instrument_engine(engine, "main")
+instrument_engine(async_engine.sync_engine, "main")
+
+@contextmanager
+def migration_lock():
+    """Serialise schema changes between processes starting at the same time"""
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(DATA_DIR, ".migrate.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def register_models():
+    """Import every model so its table is part of Base.metadata"""
     from app.models.post import PostModel
-    from app.models.subscriber import SubscriberModel
-    
+    from app.models.subscriber import SubscriberModel, SubscriberSegmentModel
+    from app.models.cache_version import CacheVersionModel
+    from app.models.outbox import OutboxMessageModel
+    from app.models.signal_event import SignalEventModel
+    from app.models.newsletter import NewsletterJobModel, NewsletterDeliveryModel, DigestCursorModel
+
+def create_schema():
+    """Tables, indexes and the FTS index; callers hold migration_lock()"""
+    from app.database.dedupe import merge_duplicate_subscribers
+    from app.database.fts import create_fts_index
+
+    register_models()
     Base.metadata.create_all(bind=engine)
-    SubscriberBase.metadata.create_all(bind=subscriber_engine)
+    create_missing_columns(Base, engine)
+    # Before the unique index on lower(email) can be added to an older database
+    merge_duplicate_subscribers(engine)
+    create_missing_indexes(Base, engine)
+    create_fts_index()
+
+def create_tables():
+    """Create all database tables if they don't exist, then import any pre-unification database files"""
+    from app.database.migrate import migrate_legacy_databases
+    
+    with migration_lock():
+        create_schema()
+        migrate_legacy_databases()
+
+def run_startup_migrations():
+    """Called on app import; a no-op in workers whose parent already migrated"""
+    if os.getenv(SKIP_MIGRATIONS_ENV) == "1":
+        return
+    create_tables()
+
+def create_missing_columns(base, bind):
+    """create_all() doesn't alter existing tables; add new columns (nullable or with a server default)"""
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in base.metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN {ddl}'))
+
+def index_names(bind) -> set:
+    """Every index in the database; read from the catalogue, since reflection skips expression indexes"""
+    with bind.connect() as conn:
+        return set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'")).scalars())
+
+def create_missing_indexes(base, bind):
+    """create_all() skips indexes on tables that already exist; add any new ones"""
+    existing = index_names(bind)
+    for table in base.metadata.sorted_tables:
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(bind=bind)
 
 def get_db():
     """Dependency for getting DB session"""
@@ -31,10 +160,16 @@ def get_db():
     finally:
         db.close()
 
-def get_subscriber_db():
-    """Dependency for getting subscriber DB session"""
-    db = SubscriberSessionLocal()
-    try:
+async def get_async_db():
+    """Dependency for getting an async DB session.
+
+    FastAPI resolves it once per request, so every dependency and the
+    handler share one session, and with it one pooled connection for
+    posts and subscribers alike.
+    """
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def dispose_async_engines():
+    """Close pooled aiosqlite connections on shutdown"""
+    await async_engine.dispose()
@@ -0,0 +1,47 @@
+"""Batched reads and writes over an async session.
+
+Inserts are one ``executemany`` per batch, and callers split long ``IN``
+lists with ``chunked(keys, MAX_IN_LIST)`` to stay below SQLite's bound
+parameter limit. None of the helpers commit, so several of them (on posts
+and subscribers alike) can make up one transaction on the request's session.
+"""
+
+from typing import AsyncIterator, Iterable, Iterator, List, Sequence
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# SQLite builds before 3.32 allow 999 bound parameters per statement
+MAX_IN_LIST = 900
+DEFAULT_BATCH_SIZE = 1000
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+async def insert_many(db: AsyncSession, model, rows: Sequence[dict], batch_size: int = DEFAULT_BATCH_SIZE,
+                      ignore_conflicts: bool = True) -> int:
+    """Insert plain dict rows; returns how many were new (conflicting rows are skipped if ``ignore_conflicts``)"""
+    statement = sqlite_insert(model.__table__)
+    if ignore_conflicts:
+        statement = statement.on_conflict_do_nothing()
+    inserted = 0
+    for chunk in chunked(rows, batch_size):
+        # Core executemany, so the rowcount covers the whole batch
+        inserted += (await db.execute(statement, chunk)).rowcount
+    return inserted
+
+
+async def stream_batches(db: AsyncSession, statement, batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[List]:
+    """Result rows ``batch_size`` at a time from a server-side cursor"""
+    result = await db.stream(statement.execution_options(yield_per=batch_size))
+    async for rows in result.partitions():
+        yield rows
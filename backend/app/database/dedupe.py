@@ -0,0 +1,105 @@
+"""Merge subscribers whose addresses differ only in case, so the unique index on ``lower(email)`` can be built.
+
+``create_schema()`` calls this before adding missing indexes; once the index
+exists there can be no duplicates and it returns after one catalogue lookup.
+Each group keeps its earliest subscription (the row's address, date and
+preferences). The others' segments are moved to it, the newest digest
+cursor of the group is kept under its address, and the other rows are
+deleted, all in one transaction.
+
+    python -m app.database.dedupe   # list the groups the next start will merge
+"""
+
+import argparse
+import logging
+from typing import Dict, List
+
+from sqlalchemy import delete, func, insert, inspect, literal, select, update
+
+logger = logging.getLogger(__name__)
+
+UNIQUE_INDEX = "ix_subscribers_email_key"
+
+
+def _needs_merge(bind) -> bool:
+    from app.database.base import index_names
+
+    return inspect(bind).has_table("subscribers") and UNIQUE_INDEX not in index_names(bind)
+
+
+def duplicate_groups(conn) -> Dict[str, List[str]]:
+    """Addresses sharing a normalized form, earliest subscription first"""
+    from app.models.subscriber import EMAIL_KEY, SubscriberModel
+
+    keys = select(EMAIL_KEY).group_by(EMAIL_KEY).having(func.count() > 1).scalar_subquery()
+    rows = conn.execute(
+        select(EMAIL_KEY, SubscriberModel.email)
+        .where(EMAIL_KEY.in_(keys))
+        .order_by(EMAIL_KEY, SubscriberModel.subscribed_at.is_(None), SubscriberModel.subscribed_at, SubscriberModel.email)
+    )
+    groups: Dict[str, List[str]] = {}
+    for key, email in rows:
+        groups.setdefault(key, []).append(email)
+    return groups
+
+
+def _merge(conn, keep: str, others: List[str]):
+    from app.models.newsletter import DigestCursorModel
+    from app.models.subscriber import SubscriberModel, SubscriberSegmentModel
+
+    conn.execute(
+        insert(SubscriberSegmentModel.__table__).prefix_with("OR IGNORE").from_select(
+            ["segment", "email"],
+            select(SubscriberSegmentModel.segment, literal(keep))
+            .where(SubscriberSegmentModel.email.in_(others)),
+        )
+    )
+    conn.execute(delete(SubscriberSegmentModel).where(SubscriberSegmentModel.email.in_(others)))
+
+    newest = conn.execute(
+        select(func.max(DigestCursorModel.last_post_at), func.max(DigestCursorModel.delivered_at))
+        .where(DigestCursorModel.email.in_([keep] + others))
+    ).first()
+    conn.execute(delete(DigestCursorModel).where(DigestCursorModel.email.in_(others)))
+    if newest[0] is not None:
+        updated = conn.execute(
+            update(DigestCursorModel).where(DigestCursorModel.email == keep)
+            .values(last_post_at=newest[0], delivered_at=newest[1])
+        ).rowcount
+        if not updated:
+            conn.execute(insert(DigestCursorModel).values(email=keep, last_post_at=newest[0], delivered_at=newest[1]))
+
+    conn.execute(delete(SubscriberModel).where(SubscriberModel.email.in_(others)))
+
+
+def merge_duplicate_subscribers(bind, dry_run: bool = False) -> Dict[str, List[str]]:
+    """Merge every group of case-variant addresses; returns the groups found (kept address first)"""
+    if not _needs_merge(bind):
+        return {}
+    with bind.begin() as conn:
+        groups = duplicate_groups(conn)
+        if not dry_run:
+            for addresses in groups.values():
+                _merge(conn, addresses[0], addresses[1:])
+    if groups and not dry_run:
+        logger.info(
+            "Merged duplicate subscribers",
+            extra={"groups": len(groups), "removed": sum(len(addresses) - 1 for addresses in groups.values())},
+        )
+    return groups
+
+
+def main():
+    argparse.ArgumentParser(description=__doc__.splitlines()[0]).parse_args()
+
+    from app.database.base import engine, register_models
+
+    register_models()
+    groups = merge_duplicate_subscribers(engine, dry_run=True)
+    for addresses in groups.values():
+        print(f"keep {addresses[0]}, merge {', '.join(addresses[1:])}")
+    print(f"{len(groups)} groups, {sum(len(addresses) - 1 for addresses in groups.values())} subscribers to merge")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+
+"""SQLite FTS5 index over post titles and bodies.
+
+The ``posts_fts`` table is kept in sync with ``posts`` by triggers, so every
+insert, update and delete through the ORM (or any other client) is indexed.
+Rows are keyed by ``post_id`` rather than rowid, which SQLite may renumber
+on VACUUM for tables without an integer primary key.
+
+For databases created before the index existed, run:
+
+    python -m app.database.fts rebuild
+"""
+
+import html
+import re
+import sys
+from typing import List
+
+from sqlalchemy import DateTime, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.base import engine
+from app.utils.html_text import plain_text
+
+FTS_SCHEMA = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+        post_id UNINDEXED,
+        title,
+        content,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON posts BEGIN
+        INSERT INTO posts_fts (post_id, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON posts BEGIN
+        DELETE FROM posts_fts WHERE post_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE ON posts BEGIN
+        DELETE FROM posts_fts WHERE post_id = old.id;
+        INSERT INTO posts_fts (post_id, title, content) VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+# Title matches outrank body matches
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+# Snippets are cut from the HTML body; its markup is removed, the text escaped and the match markers
+# swapped for <mark> afterwards
+SNIPPET_OPEN = "\x02"
+SNIPPET_CLOSE = "\x03"
+SNIPPET_TOKENS = 16
+# A tag (or a piece of one at either end) of the snippet; a match on a tag's name or attributes marks it too
+_SNIPPET_TAG = re.compile(r"^[^<>]*>|<[^<>]*(?:>|$)")
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def create_fts_index(bind=engine):
+    """Create the index and triggers; populate it if it was just created"""
+    with bind.begin() as conn:
+        existed = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'posts_fts'")
+        ).first()
+        for statement in FTS_SCHEMA:
+            conn.execute(text(statement))
+        if not existed:
+            _rebuild(conn)
+
+
+def rebuild_fts_index(bind=engine) -> int:
+    """Re-index every post from scratch; returns the number of indexed posts"""
+    with bind.begin() as conn:
+        return _rebuild(conn)
+
+
+def _rebuild(conn) -> int:
+    conn.execute(text("DELETE FROM posts_fts"))
+    result = conn.execute(text(
+        "INSERT INTO posts_fts (post_id, title, content) SELECT id, title, content FROM posts"
+    ))
+    conn.execute(text("INSERT INTO posts_fts (posts_fts) VALUES ('optimize')"))
+    return result.rowcount
+
+
+def build_match_query(q: str) -> str:
+    """Turn free text into a safe FTS5 query: every word must match, as a prefix"""
+    tokens = _TOKEN_RE.findall(q)
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+async def search_posts(db: AsyncSession, q: str, limit: int) -> List[dict]:
+    """Ranked full-text search; each row carries a highlighted ``snippet``"""
+    match = build_match_query(q)
+    if not match:
+        return []
+    result = await db.execute(
+        text(
+            """
+            SELECT p.id, p.title, p.content, p.author, p.createdAt, p.imageUrl,
+                   snippet(posts_fts, -1, :open, :close, '…', :tokens) AS snippet
+            FROM posts_fts
+            JOIN posts p ON p.id = posts_fts.post_id
+            WHERE posts_fts MATCH :match
+            ORDER BY bm25(posts_fts, 0.0, :title_weight, :content_weight), p.createdAt DESC
+            LIMIT :limit
+            """
+        ).columns(createdAt=DateTime),
+        {
+            "match": match,
+            "open": SNIPPET_OPEN,
+            "close": SNIPPET_CLOSE,
+            "tokens": SNIPPET_TOKENS,
+            "title_weight": TITLE_WEIGHT,
+            "content_weight": CONTENT_WEIGHT,
+            "limit": limit,
+        },
+    )
+    rows = result.mappings().all()
+    results = []
+    for row in rows:
+        result = dict(row)
+        result["snippet"] = highlight(result["snippet"])
+        results.append(result)
+    return results
+
+
+def highlight(snippet: str) -> str:
+    # Markers inside a tag would keep it from being recognised as one
+    snippet = _SNIPPET_TAG.sub(lambda tag: tag.group().replace(SNIPPET_OPEN, "").replace(SNIPPET_CLOSE, ""), snippet or "")
+    # The snippet may start or end inside a tag of the body
+    return html.escape(plain_text(snippet, fragment=True)).replace(SNIPPET_OPEN, "<mark>").replace(SNIPPET_CLOSE, "</mark>")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["rebuild"]:
+        print("Usage: python -m app.database.fts rebuild")
+        sys.exit(1)
+    from app.database.base import create_tables
+    create_tables()
+    print(f"Indexed {rebuild_fts_index()} posts")
@@ -0,0 +1,127 @@
+"""Import the separate ``posts.db`` and ``subscribers.db`` into the shared database.
+
+``create_tables()`` calls this on every start; it does nothing unless one
+of the old files is still in ``DATA_DIR``. Both files are attached to the
+new database and every table the models know about is copied in a single
+transaction (``INSERT OR IGNORE``, so rows that already exist are kept
+as they are). Inserted posts go through the FTS triggers like any other
+write. Afterwards the old files are renamed to ``*.migrated`` and can be
+deleted once the new database has been checked.
+
+    python -m app.database.migrate             # same as a normal start
+    python -m app.database.migrate --dry-run   # row counts only
+"""
+
+import argparse
+import logging
+import os
+import sqlite3
+from typing import Dict, Iterable, List
+
+from app.config import DATABASE_PATH, LEGACY_POSTS_DATABASE, LEGACY_SUBSCRIBERS_DATABASE, SQLITE_BUSY_TIMEOUT_MS
+
+logger = logging.getLogger(__name__)
+
+MIGRATED_SUFFIX = ".migrated"
+LEGACY_DATABASES = (LEGACY_POSTS_DATABASE, LEGACY_SUBSCRIBERS_DATABASE)
+
+
+def _tables():
+    from app.database.base import Base
+    return Base.metadata.sorted_tables
+
+
+def _legacy_columns(conn: sqlite3.Connection, alias: str, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f'PRAGMA {alias}.table_info("{table}")')]
+
+
+def _attach(conn: sqlite3.Connection, sources: List[str]) -> List[str]:
+    aliases = []
+    for i, path in enumerate(sources):
+        alias = f"legacy{i}"
+        conn.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+        aliases.append(alias)
+    return aliases
+
+
+def _copy_statements(conn: sqlite3.Connection, aliases: List[str]):
+    """(table, alias, INSERT ... SELECT) for every model table found in an attached file"""
+    for table in _tables():
+        for alias in aliases:
+            legacy_columns = set(_legacy_columns(conn, alias, table.name))
+            if not legacy_columns:
+                continue
+            # Columns added since the old file was written take their defaults
+            columns = ", ".join(f'"{column.name}"' for column in table.columns if column.name in legacy_columns)
+            yield table.name, alias, (
+                f'INSERT OR IGNORE INTO main."{table.name}" ({columns}) SELECT {columns} FROM {alias}."{table.name}"'
+            )
+
+
+def pending_legacy_databases(paths: Iterable[str] = LEGACY_DATABASES) -> List[str]:
+    return [path for path in paths if os.path.isfile(path)]
+
+
+def migrate_legacy_databases(sources: Iterable[str] = LEGACY_DATABASES, target: str = DATABASE_PATH,
+                             dry_run: bool = False) -> Dict[str, int]:
+    """Copy every legacy table into ``target`` atomically; returns rows copied (or found, for a dry run) per table"""
+    sources = pending_legacy_databases(sources)
+    if not sources:
+        return {}
+
+    counts: Dict[str, int] = {}
+    conn = sqlite3.connect(target, isolation_level=None, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000)
+    try:
+        aliases = _attach(conn, sources)
+        if dry_run:
+            for table, alias, _ in _copy_statements(conn, aliases):
+                found = conn.execute(f'SELECT COUNT(*) FROM {alias}."{table}"').fetchone()[0]
+                counts[table] = counts.get(table, 0) + found
+        else:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table, _, statement in list(_copy_statements(conn, aliases)):
+                    counts[table] = counts.get(table, 0) + conn.execute(statement).rowcount
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        for alias in aliases:
+            conn.execute(f"DETACH DATABASE {alias}")
+    finally:
+        conn.close()
+
+    if not dry_run:
+        for path in sources:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.replace(path + suffix, path + MIGRATED_SUFFIX + suffix)
+        logger.info("Imported legacy databases", extra={"sources": sources, "rows": counts})
+    return counts
+
+
+def _main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="count the rows that would be copied")
+    args = parser.parse_args()
+
+    sources = pending_legacy_databases()
+    if not sources:
+        print(f"Nothing to import: no posts.db or subscribers.db next to {DATABASE_PATH}")
+        return
+    from app.database.base import create_schema, migration_lock, register_models
+
+    register_models()
+    if args.dry_run:
+        counts = migrate_legacy_databases(sources, dry_run=True)
+    else:
+        with migration_lock():
+            create_schema()
+            counts = migrate_legacy_databases(sources)
+    verb = "Would copy" if args.dry_run else "Copied"
+    for table, count in counts.items():
+        print(f"{verb} {count} rows into {table}")
+
+
+if __name__ == "__main__":
+    _main()
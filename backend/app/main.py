@@ -1,17 +1,33 @@
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-import os
 import mimetypes
 
+from app.utils.log import configure_logging, shutdown_logging, RequestIdMiddleware
+
+# Before the other imports, so nothing logs through an unconfigured root logger
+configure_logging()
+
 from app.routes.posts import router as posts_router
 from app.routes.subscribers import router as subscribers_router
 from app.routes.contact import router as contact_router
 from app.routes.auth import router as auth_router
 from app.routes.newsletter import router as newsletter_router
-from app.database.base import create_tables
+from app.routes.metrics import router as metrics_router
+from app.routes.site import router as site_router
+from app.routes.images import router as images_router
+from app.database.base import run_startup_migrations, dispose_async_engines
+from app.utils.newsletter_jobs import start_newsletter_scheduler, shutdown_newsletter_scheduler
+from app.utils.outbox import start_outbox_dispatcher, shutdown_outbox_dispatcher
+from app.utils.signal_hub import signal_hub
+from app.utils.smtp_pool import close_smtp_pool
+from app.utils.metrics import MetricsMiddleware, start_metrics, shutdown_metrics
+from app.utils.profiler import start_profiler, shutdown_profiler
+from app.utils.rate_limit import PublicWriteRateLimitMiddleware
+from app.utils.static_site import static_index, IndexedStaticFiles
+from app.utils.subscriber_filter import start_subscriber_filter
+from app.utils.fast_json import FastJSONResponse
 
 # ------------------- MIME Types -------------------
 mimetypes.add_type("application/javascript", ".js")
@@ -19,7 +35,14 @@ mimetypes.add_type("text/css", ".css")
 mimetypes.add_type("text/html", ".html")
 
 # ------------------- App Setup -------------------
-app = FastAPI(title="SMALLCAP Signal API", docs_url=None, redoc_url=None, openapi_url=None)
+app = FastAPI(
+    title="SMALLCAP Signal API", docs_url=None, redoc_url=None, openapi_url=None,
+    default_response_class=FastJSONResponse,
+)
+
+# ------------------- Rate Limits -------------------
+# Added before CORS so that 429 responses still carry CORS headers
+app.add_middleware(PublicWriteRateLimitMiddleware)
 
 # ------------------- CORS -------------------
 app.add_middleware(
@@ -30,8 +53,70 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize database tables
-create_tables()
+# ------------------- Metrics -------------------
+# Outermost, so latency and Server-Timing include CORS handling
+app.add_middleware(MetricsMiddleware)
+# Outside the metrics middleware, so slow-request log lines carry the request id
+app.add_middleware(RequestIdMiddleware)
+
+# Initialize database tables (skipped in workers started by `server.py --prod`)
+run_startup_migrations()
+
+@app.on_event("startup")
+def start_instrumentation():
+    """Publish this worker's metrics and, if configured, sample slow requests"""
+    start_metrics()
+    start_profiler()
+
+@app.on_event("shutdown")
+def shutdown_instrumentation():
+    shutdown_profiler()
+    shutdown_metrics()
+
+@app.on_event("startup")
+def start_mail_delivery():
+    """Deliver queued contact/welcome emails and due newsletters, resuming anything left from a previous run"""
+    start_outbox_dispatcher()
+    start_newsletter_scheduler()
+
+@app.on_event("shutdown")
+def shutdown_mail_delivery():
+    """Stop after the newsletter batch in flight, then close pooled SMTP sessions"""
+    shutdown_newsletter_scheduler()
+    shutdown_outbox_dispatcher()
+    close_smtp_pool()
+
+@app.on_event("startup")
+def load_subscriber_filter():
+    """Load the addresses signups are checked against, in a thread; until then every signup is looked up"""
+    start_subscriber_filter()
+
+@app.on_event("startup")
+async def start_signal_hub():
+    """Begin tailing the signal event log for live SSE clients"""
+    await signal_hub.start()
+
+@app.on_event("shutdown")
+async def shutdown_signal_hub():
+    await signal_hub.stop()
+
+@app.on_event("startup")
+async def start_static_index():
+    """Load the built frontend into memory and follow rebuild requests"""
+    await static_index.start()
+
+@app.on_event("shutdown")
+async def shutdown_static_index():
+    await static_index.stop()
+
+@app.on_event("shutdown")
+async def shutdown_database():
+    await dispose_async_engines()
+
+@app.on_event("shutdown")
+def flush_logs():
+    """Registered last: worker processes exit without running atexit handlers"""
+    shutdown_logging()
 
 # Include routers with API prefix to avoid conflicts with static files
 app.include_router(posts_router, prefix="/api")
@@ -39,6 +124,9 @@ app.include_router(subscribers_router, prefix="/api")
 app.include_router(contact_router, prefix="/api")
 app.include_router(auth_router, prefix="/api")
 app.include_router(newsletter_router, prefix="/api")
+app.include_router(metrics_router, prefix="/api")
+app.include_router(site_router, prefix="/api")
+app.include_router(images_router, prefix="/api")
 
 # Also include without prefix for backward compatibility
 app.include_router(posts_router)
@@ -46,23 +134,27 @@ app.include_router(subscribers_router)
 app.include_router(contact_router)
 app.include_router(auth_router)
 app.include_router(newsletter_router)
+app.include_router(metrics_router)
+app.include_router(site_router)
+app.include_router(images_router)
 
 # ------------------- Static & SPA Setup -------------------
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-STATIC_DIR = os.path.join(BASE_DIR, "..", "static")
+# First path segments owned by the API; unknown paths below them are 404s, not SPA routes
+API_ROOTS = frozenset({"api", "subscribers", "posts", "contact", "auth", "newsletter", "metrics", "site", "images", "uploads", "unsubscribe"})
 
-# Mount static files
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
-app.mount("/assets", StaticFiles(directory=os.path.join(STATIC_DIR, "assets")), name="assets")
+# Served from the in-memory index (app/utils/static_site.py); no filesystem access per request
+app.mount("/static", IndexedStaticFiles(static_index), name="static")
+app.mount("/assets", IndexedStaticFiles(static_index, prefix="assets/"), name="assets")
 
 # SPA fallback - only serve index.html for non-API routes
 @app.get("/{full_path:path}")
-async def serve_spa(full_path: str):
+async def serve_spa(full_path: str, request: Request):
+    shell = static_index.shell
+    if shell is None:
+        return Response("Frontend not built", status_code=404, media_type="text/plain")
     # Don't serve SPA for API routes
-    if full_path.startswith("api/") or full_path.startswith("subscribers") or full_path.startswith("posts") or full_path.startswith("contact") or full_path.startswith("auth") or full_path.startswith("newsletter"):
-        return FileResponse(os.path.join(STATIC_DIR, "index.html"), status_code=404)
-    
-    file_path = os.path.join(STATIC_DIR, full_path)
-    if os.path.exists(file_path) and os.path.isfile(file_path):
-        return FileResponse(file_path)
-    return FileResponse(os.path.join(STATIC_DIR, "index.html"))
+    if full_path.partition("/")[0] in API_ROOTS:
+        return shell.response(request, status_code=404)
+
+    asset = static_index.get(full_path)
+    return (asset or shell).response(request)
@@ -0,0 +1,13 @@
+
+from sqlalchemy import Column, String, Integer
+from app.database.base import Base
+
+class CacheVersionModel(Base):
+    """Monotonic counters bumped on every write to a cached data set.
+
+    Shared through the database so every uvicorn worker can tell when its
+    in-memory copy is stale.
+    """
+    __tablename__ = "cache_versions"
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
@@ -0,0 +1,59 @@
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index
+from datetime import datetime
+from app.database.base import Base
+
+class NewsletterJobModel(Base):
+    """A newsletter send: a broadcast of one message, or a digest of recent posts.
+
+    ``scheduled`` until ``send_at``; then one worker claims it by setting
+    ``lease_until`` and it becomes ``running``. The recipient list is copied
+    into ``newsletter_deliveries`` when the job starts (``total`` is NULL
+    until then), so a job picked up again after a restart carries on with
+    the addresses that are still pending.
+    """
+    __tablename__ = "newsletter_jobs"
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)  # "broadcast", "digest"
+    subject = Column(String, nullable=False)
+    message = Column(Text, nullable=False)  # Body of a broadcast, introduction of a digest
+    html = Column(Text, nullable=True)  # HTML alternative of a broadcast's body; digests build their own
+    audience = Column(Text, nullable=True)  # JSON segments/frequencies; NULL sends to every email subscriber
+    status = Column(String, nullable=False, default="scheduled")
+    send_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    digest_until = Column(DateTime, nullable=True)  # Newest post a digest covers, fixed when it starts
+    total = Column(Integer, nullable=True)
+    sent = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    lease_until = Column(DateTime, nullable=True)
+    claimed_by = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # The scheduler polls for due jobs
+        Index("ix_newsletter_jobs_status_send_at", "status", "send_at"),
+    )
+
+class NewsletterDeliveryModel(Base):
+    """One recipient of a newsletter job and how delivery to them went"""
+    __tablename__ = "newsletter_deliveries"
+    job_id = Column(String, primary_key=True)
+    email = Column(String, primary_key=True)
+    status = Column(String, nullable=False, default="pending")  # "pending", "sent", "failed"
+    attempts = Column(Integer, nullable=False, default=0)
+    since = Column(DateTime, nullable=True)  # Digests: posts after this are new to the recipient
+    last_error = Column(String, nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Sends in the rate window are counted before every batch
+        Index("ix_newsletter_deliveries_sent_at", "sent_at"),
+    )
+
+class DigestCursorModel(Base):
+    """Newest post each subscriber has received in a digest"""
+    __tablename__ = "digest_cursors"
+    email = Column(String, primary_key=True)
+    last_post_at = Column(DateTime, nullable=False)
+    delivered_at = Column(DateTime, nullable=False, default=datetime.utcnow)
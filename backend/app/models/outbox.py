@@ -0,0 +1,29 @@
+
+from sqlalchemy import Column, String, Integer, DateTime, Text, Index
+from datetime import datetime
+from app.database.base import Base
+
+class OutboxMessageModel(Base):
+    """A rendered email waiting for (or done with) background delivery.
+
+    ``status`` is ``pending`` until the message is sent or dead-lettered.
+    A dispatcher claims a pending row by pushing ``next_attempt_at`` past a
+    lease, so a row whose sender crashed becomes due again by itself.
+    """
+    __tablename__ = "email_outbox"
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)  # "contact", "welcome"
+    sender = Column(String, nullable=True)
+    recipient = Column(String, nullable=False)
+    message = Column(Text, nullable=False)
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # The dispatcher polls for due pending rows
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+    )
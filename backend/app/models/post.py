@@ -1,5 +1,5 @@
 
-from sqlalchemy import Column, String, DateTime
+from sqlalchemy import Column, String, DateTime, Index
 from datetime import datetime
 from app.database.base import Base
 
@@ -11,3 +11,11 @@ class PostModel(Base):
     author = Column(String, nullable=False)
     createdAt = Column(DateTime, default=datetime.utcnow)
     imageUrl = Column(String, nullable=True)
+    sourceId = Column(String, nullable=True)  # Upstream id or idempotency key from batch ingestion
+
+    __table_args__ = (
+        # Keyset pagination walks (createdAt, id) newest first
+        Index("ix_posts_createdAt_id", "createdAt", "id"),
+        # A retried batch upload finds its posts already stored
+        Index("ix_posts_sourceId", "sourceId", unique=True),
+    )
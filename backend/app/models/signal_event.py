@@ -0,0 +1,18 @@
+
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from datetime import datetime
+from app.database.base import Base
+
+class SignalEventModel(Base):
+    """Append-only log of post changes for the live signal stream.
+
+    Written in the same transaction as the post itself. Every worker tails
+    it by ``id`` to fan new signals out to its own SSE clients, and
+    reconnecting clients resume from it with ``Last-Event-ID``.
+    """
+    __tablename__ = "signal_events"
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String, nullable=False)  # "post", "delete"
+    post_id = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON sent to clients as-is
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
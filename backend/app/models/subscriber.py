@@ -1,9 +1,47 @@
-
-from sqlalchemy import Column, String, DateTime
+import string
+from sqlalchemy import Column, String, DateTime, Index, func
 from datetime import datetime
-from app.database.base import SubscriberBase
+from app.database.base import Base
+
+# SQLite's lower() folds ASCII letters only; email_key() must produce exactly what it does
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def email_key(email: str) -> str:
+    """Canonical form of an address: ``Foo@Example.com`` and ``foo@example.com`` are one subscriber"""
+    return email.strip().translate(_ASCII_LOWER)
 
-class SubscriberModel(SubscriberBase):
+class SubscriberModel(Base):
+    """A subscriber, stored under the address as they typed it.
+
+    Addresses are unique by ``lower(email)``; look subscribers up with
+    ``EMAIL_KEY == email_key(address)`` so the expression index is used.
+    """
     __tablename__ = "subscribers"
     email = Column(String, primary_key=True, index=True)
     subscribed_at = Column(DateTime, default=datetime.utcnow)
+    # Server defaults, so bulk imports and existing rows get them too
+    channel = Column(String, nullable=False, default="email", server_default="email")  # "email", "rss" (feed only, no mail)
+    frequency = Column(String, nullable=False, default="instant", server_default="instant")  # "instant", "daily", "weekly"
+
+    __table_args__ = (
+        # Newsletter targeting reads recipients straight from this index
+        Index("ix_subscribers_channel_frequency_email", "channel", "frequency", "email"),
+        # One subscriber per address whatever its case; app/database/dedupe.py merges older duplicates first
+        Index("ix_subscribers_email_key", func.lower(email), unique=True),
+    )
+
+EMAIL_KEY = func.lower(SubscriberModel.email)
+
+class SubscriberSegmentModel(Base):
+    """Membership of a subscriber in a named segment (``ticker:abcd``, ``vip``).
+
+    The primary key leads with the segment, so the members of a segment
+    are one index range.
+    """
+    __tablename__ = "subscriber_segments"
+    segment = Column(String, primary_key=True)
+    email = Column(String, primary_key=True)
+
+    __table_args__ = (
+        Index("ix_subscriber_segments_email", "email"),
+    )
@@ -1,17 +1,22 @@
 
 from fastapi import APIRouter, Depends, HTTPException
-from app.utils.auth import verify_api_key
+from app.utils.auth import Principal, authenticator, verify_api_key
 
 router = APIRouter()
 
 @router.post("/verify-key")
-async def verify_key(auth_result: bool = Depends(verify_api_key)):
+async def verify_key(principal: Principal = Depends(verify_api_key)):
     """
     Verify if the provided API key is valid
-    This endpoint is used for admin page access verification
+    This endpoint is used for admin page access verification; a key (not a
+    token) also gets a session token to send instead of the key afterwards
     """
-    if auth_result:
-        return {"status": "success", "message": "API key is valid"}
+    if principal:
+        result = {"status": "success", "message": "API key is valid"}
+        if principal.method == "key":
+            result["token"] = authenticator.issue_token(principal.key_name)
+            result["expiresIn"] = authenticator.token_ttl
+        return result
     # This code should never run because verify_api_key raises an HTTPException if invalid
     raise HTTPException(status_code=401, detail="Invalid API key")
 
@@ -23,6 +28,6 @@ async def get_config():
     """
     from app.config import API_KEY
     return {
-        "apiKeyAvailable": bool(API_KEY),
+        "apiKeyAvailable": authenticator.configured,
         "apiKeyLength": len(API_KEY) if API_KEY else 0
     }
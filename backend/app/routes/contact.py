@@ -1,18 +1,28 @@
+import logging
 
-from fastapi import APIRouter, status, HTTPException
+from fastapi import APIRouter, Depends, status, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import EMAIL_RECIPIENT
+from app.database.base import get_async_db
 from app.schemas.contact import ContactForm
-from app.utils.email import send_email
+from app.utils.email import build_contact_message
+from app.utils.outbox import enqueue_email, notify_outbox
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.post("/api/contact", status_code=status.HTTP_200_OK)
-async def contact(contact_data: ContactForm):
-    print(f"Contact form received: {contact_data.name}, {contact_data.email}")
+async def contact(contact_data: ContactForm, db: AsyncSession = Depends(get_async_db)):
+    logger.info("Contact form received", extra={"contact_email": contact_data.email})
     try:
-        send_email(contact_data.name, contact_data.email, contact_data.message)
+        # Stored for background delivery, so the visitor never waits on SMTP
+        text = build_contact_message(contact_data.name, contact_data.email, contact_data.message)
+        enqueue_email(db, "contact", EMAIL_RECIPIENT, text)
+        await db.commit()
+        notify_outbox()
         return {"message": "Message sent successfully! We'll get back to you soon."}
     except Exception as e:
-        print(f"Contact form error: {str(e)}")
+        logger.exception("Contact form error")
         raise HTTPException(
             status_code=500,
             detail=f"Failed to send message: {str(e)}"
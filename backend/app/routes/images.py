@@ -0,0 +1,56 @@
+import os
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.config import IMAGE_MAX_BYTES
+from app.utils import images
+from app.utils.auth import verify_api_key
+from app.utils.http_cache import IMMUTABLE, is_not_modified, validator_headers
+
+router = APIRouter()
+
+@router.post("/images", status_code=status.HTTP_201_CREATED)
+async def upload_image(request: Request, response: Response, auth: bool = Depends(verify_api_key)):
+    """Store the image in the request body and its resized WebP/JPEG variants (requires API key).
+
+    Send the file itself as the body (``curl --data-binary @chart.png``).
+    The same bytes uploaded twice are stored once; the second upload
+    answers 200 with the existing image.
+    """
+    if not images.available():
+        raise HTTPException(status_code=503, detail="Image uploads are not available: Pillow is not installed")
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"Images are limited to {IMAGE_MAX_BYTES} bytes")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > IMAGE_MAX_BYTES:
+            raise HTTPException(status_code=413, detail=f"Images are limited to {IMAGE_MAX_BYTES} bytes")
+    try:
+        manifest, created = await run_in_threadpool(images.store_image, bytes(body))
+    except images.ImageError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not created:
+        response.status_code = status.HTTP_200_OK
+    return images.describe(manifest)
+
+@router.get("/uploads/{digest}/{name}")
+async def get_upload(digest: str, name: str, request: Request):
+    """An uploaded image or one of its variants; content-addressed, so cached forever"""
+    path = images.file_path(digest, name)
+    try:
+        stat_result = os.stat(path) if path else None
+    except FileNotFoundError:
+        stat_result = None
+    if stat_result is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    last_modified = datetime.utcfromtimestamp(stat_result.st_mtime)
+    headers = validator_headers(f'"{digest[:20]}-{name}"', last_modified, IMMUTABLE)
+    headers["X-Content-Type-Options"] = "nosniff"
+    if is_not_modified(request, headers["ETag"], last_modified):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, headers=headers, media_type=images.media_type(name), stat_result=stat_result)
@@ -0,0 +1,15 @@
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+
+from app.utils.auth import verify_api_key
+from app.utils.metrics import render_metrics
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/metrics")
+def get_metrics(auth: bool = Depends(verify_api_key)):
+    """Prometheus scrape endpoint: request, query and SMTP timings summed over all workers"""
+    return PlainTextResponse(render_metrics(), headers={"Content-Type": PROMETHEUS_CONTENT_TYPE})
@@ -1,53 +1,157 @@
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app.database.base import get_subscriber_db
-from app.models.subscriber import SubscriberModel
-from app.utils.newsletter_email import send_newsletter_email
+import logging
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.config import EMAIL_PASSWORD, NEWSLETTER_DIGEST_SUBJECT
+from app.database.base import get_async_db
+from app.utils.newsletter_jobs import (
+    BROADCAST,
+    DIGEST,
+    schedule_newsletter,
+    notify_newsletter_scheduler,
+    list_jobs,
+    job_summary,
+    job_to_dict,
+    cancel_job,
+)
+from app.utils.outbox import outbox_summary, requeue_message, notify_outbox
 from app.utils.auth import verify_api_key
-from pydantic import BaseModel
+from app.utils.segments import count_recipients, normalize_audience
+from pydantic import BaseModel, validator
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+class Audience(BaseModel):
+    """Who a send goes to: members of any of the segments/tickers, limited to the frequencies; empty is everyone"""
+    segments: List[str] = []
+    tickers: List[str] = []
+    frequencies: List[str] = []
+
+    @validator("frequencies", always=True)
+    def check_audience(cls, value, values):
+        normalize_audience(values.get("segments", []), values.get("tickers", []), value)
+        return value
 
-class NewsletterRequest(BaseModel):
+    def normalized(self) -> Optional[dict]:
+        return normalize_audience(self.segments, self.tickers, self.frequencies)
+
+class NewsletterRequest(Audience):
     subject: str
     message: str
+    html: Optional[str] = None  # Sent as multipart/alternative with ``message`` as the text part
+    send_at: Optional[datetime] = None  # Send now if omitted
+
+class DigestRequest(Audience):
+    subject: str = NEWSLETTER_DIGEST_SUBJECT
+    message: str = ""  # Introduction above the list of posts
+    send_at: Optional[datetime] = None
+
+def require_email_config():
+    if not EMAIL_PASSWORD:
+        raise HTTPException(
+            status_code=500,
+            detail="Email configuration error. Please contact the administrator."
+        )
 
-@router.post("/newsletter/send")
+async def queue_job(db: AsyncSession, kind: str, subject: str, message: str, send_at: Optional[datetime],
+                    audience: Optional[dict], html: Optional[str] = None):
+    job = schedule_newsletter(db, kind, subject, message, send_at, audience, html)
+    await db.commit()
+    if job.send_at <= datetime.utcnow():
+        notify_newsletter_scheduler()
+    return job
+
+@router.post("/newsletter/send", status_code=status.HTTP_202_ACCEPTED)
 async def send_newsletter(
     newsletter: NewsletterRequest,
-    db: Session = Depends(get_subscriber_db),
+    db: AsyncSession = Depends(get_async_db),
     auth_result: bool = Depends(verify_api_key)
 ):
-    """Send newsletter to all subscribers"""
+    """Schedule a newsletter to all (or the targeted) subscribers, now or at ``send_at``"""
+    require_email_config()
+    
     try:
-        # Get all subscribers
-        subscribers = db.query(SubscriberModel).all()
+        audience = newsletter.normalized()
+        subscriber_count = await count_recipients(db, audience)
         
-        if not subscribers:
+        if not subscriber_count:
             raise HTTPException(status_code=404, detail="No subscribers found")
         
-        success_count = 0
-        error_count = 0
-        
-        # Send email to each subscriber
-        for subscriber in subscribers:
-            try:
-                send_newsletter_email(subscriber.email, newsletter.subject, newsletter.message)
-                success_count += 1
-            except Exception as e:
-                print(f"Failed to send newsletter to {subscriber.email}: {str(e)}")
-                error_count += 1
+        job = await queue_job(db, BROADCAST, newsletter.subject, newsletter.message, newsletter.send_at, audience,
+                              newsletter.html)
         
         return {
-            "message": f"Newsletter sent successfully to {success_count} subscribers",
-            "success_count": success_count,
-            "error_count": error_count,
-            "total_subscribers": len(subscribers)
+            "message": f"Newsletter scheduled for delivery to {subscriber_count} subscribers",
+            "job_id": job.id,
+            "status": job.status,
+            "send_at": job.send_at.isoformat(),
+            "total_subscribers": subscriber_count
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error sending newsletter: {str(e)}")
+        logger.exception("Error queueing newsletter")
         raise HTTPException(status_code=500, detail=f"Failed to send newsletter: {str(e)}")
+
+@router.post("/newsletter/digest", status_code=status.HTTP_202_ACCEPTED)
+async def send_digest(
+    digest: DigestRequest,
+    db: AsyncSession = Depends(get_async_db),
+    auth_result: bool = Depends(verify_api_key)
+):
+    """Schedule a digest: each subscriber gets the posts published since their last digest"""
+    require_email_config()
+    job = await queue_job(db, DIGEST, digest.subject, digest.message, digest.send_at, digest.normalized())
+    return job_to_dict(job)
+
+@router.post("/newsletter/audience")
+async def preview_audience(
+    audience: Audience,
+    db: AsyncSession = Depends(get_async_db),
+    auth_result: bool = Depends(verify_api_key)
+):
+    """How many subscribers a send with this targeting would reach right now"""
+    normalized = audience.normalized()
+    return {"audience": normalized, "recipients": await count_recipients(db, normalized)}
+
+@router.get("/newsletter/jobs")
+async def get_newsletter_jobs(
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_async_db),
+    auth_result: bool = Depends(verify_api_key)
+):
+    """Scheduled, running and finished newsletter jobs, latest ``send_at`` first"""
+    return await list_jobs(db, limit)
+
+@router.get("/newsletter/jobs/{job_id}")
+async def get_newsletter_job(job_id: str, db: AsyncSession = Depends(get_async_db), auth_result: bool = Depends(verify_api_key)):
+    """Report delivery progress for a scheduled newsletter"""
+    summary = await job_summary(db, job_id)
+    if not summary:
+        raise HTTPException(status_code=404, detail="Newsletter job not found")
+    return summary
+
+@router.post("/newsletter/jobs/{job_id}/cancel")
+async def cancel_newsletter_job(job_id: str, db: AsyncSession = Depends(get_async_db), auth_result: bool = Depends(verify_api_key)):
+    """Cancel a scheduled job, or stop a running one after its current batch"""
+    if not await cancel_job(db, job_id):
+        raise HTTPException(status_code=404, detail="No scheduled or running job with this id")
+    return {"message": f"Newsletter job {job_id} cancelled"}
+
+@router.get("/newsletter/outbox")
+async def get_outbox(db: AsyncSession = Depends(get_async_db), auth_result: bool = Depends(verify_api_key)):
+    """Contact/welcome email queue: counts by status and recent dead letters"""
+    return await outbox_summary(db)
+
+@router.post("/newsletter/outbox/{message_id}/retry")
+async def retry_outbox_message(message_id: str, db: AsyncSession = Depends(get_async_db), auth_result: bool = Depends(verify_api_key)):
+    """Put a dead-lettered message back in the queue"""
+    if not await requeue_message(db, message_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered message not found")
+    notify_outbox()
+    return {"message": f"Message {message_id} queued for delivery"}
@@ -1,60 +1,139 @@
 
-from fastapi import APIRouter, Depends, status, Header, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, BackgroundTasks, Depends, status, Header, HTTPException, Query, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional, Union
 import uuid
 from datetime import datetime
 import os
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse
+import asyncio
 
-from app.schemas.post import Post, PostBase
+from app.schemas.post import Post, PostBase, PostBatch, PostBatchResponse, PostPage, SearchResult
 from app.models.post import PostModel
-from app.database.base import get_db
-from app.utils.auth import verify_api_key
-from app.config import API_KEY
-from sqlalchemy import or_
+from app.database.base import get_async_db, AsyncSessionLocal
+from app.database import fts
+from app.utils.auth import authenticator, verify_api_key
+from app.config import SIGNAL_HEARTBEAT_INTERVAL, SIGNAL_REPLAY_LIMIT
+from app.utils.post_cache import post_cache, bump_posts_version, encode_json, load_post, load_posts, newest_post_time, post_to_dict
+from app.utils.http_cache import make_etag, conditional_response, is_not_modified, validator_headers
+from app.utils.pagination import DEFAULT_PAGE_SIZE, fetch_post_page, parse_fields
+from app.utils.feeds import current_feed_artifacts, publish_feeds
+from app.utils.signal_hub import signal_hub, record_signal, record_signals, events_after
+from app.utils.post_ingest import ingest_posts
 
 router = APIRouter()
 
-@router.get("/posts", response_model=List[Post])
-async def get_posts(db: Session = Depends(get_db)):
-    posts = db.query(PostModel).order_by(PostModel.createdAt.desc()).all()
-    return [
-        Post(
-            id=post.id,
-            title=post.title,
-            content=post.content,
-            author=post.author,
-            createdAt=post.createdAt.isoformat(),
-            imageUrl=post.imageUrl
-        ) for post in posts
-    ]
+async def cached_response(request: Request, key, render, media_type: str = "application/json", pinned: bool = False):
+    """Serve a per-version memoised body with ETag/Last-Modified validators.
+
+    Revalidations are answered from the snapshot alone, without rendering.
+    """
+    snapshot = await post_cache.get()
+    etag = make_etag(snapshot.version, key)
+    last_modified = await snapshot.rendered("newest", newest_post_time)
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    store = snapshot.rendered if pinned else snapshot.memo
+    return Response(content=await store(key, render), media_type=media_type, headers=headers)
+
+@router.get("/posts", response_model=Union[List[Post], PostPage])
+async def get_posts(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size; asking for a page returns {items, next}"),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    summary: bool = False,
+    all: bool = Query(False, description="Every post as a plain list, even with other page parameters"),
+):
+    """Newest-first posts: every post as a plain list, or one keyset page once any page parameter is given"""
+    # Responses are pre-rendered per post-set version; the response_model only documents the shape
+    paged = not all and (limit is not None or cursor is not None or fields is not None or summary)
+    if not paged:
+        async def render_all():
+            return encode_json(await load_posts())
+        return await cached_response(request, "all", render_all, pinned=True)
+    
+    limit = limit or DEFAULT_PAGE_SIZE
+    selected = parse_fields(fields, summary)
+    async def render_page():
+        async with AsyncSessionLocal() as db:
+            items, next_cursor = await fetch_post_page(db, limit, cursor, selected)
+        return encode_json({"items": items, "next": next_cursor})
+    
+    return await cached_response(request, ("page", cursor, limit, selected), render_page)
 
     # Search endpoint
-@router.get("/posts/search", response_model=List[Post])
-async def search_posts(q: str, db: Session = Depends(get_db)):
-    """Search posts by text in title or content."""
-    posts = db.query(PostModel).filter(
-        or_(
-            PostModel.title.ilike(f"%{q}%"),
-            PostModel.content.ilike(f"%{q}%")
-        )
-    ).order_by(PostModel.createdAt.desc()).all()
-    return [
-        Post(
-            id=post.id,
-            title=post.title,
-            content=post.content,
-            author=post.author,
-            createdAt=post.createdAt.isoformat(),
-            imageUrl=post.imageUrl
-        ) for post in posts
-    ]
+@router.get("/posts/search", response_model=List[SearchResult])
+async def search_posts(request: Request, q: str, limit: int = Query(50, ge=1, le=200)):
+    """Ranked full-text search over title and content, with prefix matching."""
+    async def run_search():
+        async with AsyncSessionLocal() as db:
+            results = await fts.search_posts(db, q, limit)
+        for result in results:
+            result["createdAt"] = result["createdAt"].isoformat()
+        return encode_json(results)
+
+    return await cached_response(request, ("search", fts.build_match_query(q), limit), run_search)
+
+# Reconnect delay suggested to EventSource clients (ms)
+STREAM_RETRY_MS = 3000
+
+@router.get("/posts/stream")
+async def stream_posts(request: Request, last_event_id: Optional[str] = Header(None)):
+    """Server-sent events: ``post`` for each new signal, ``delete`` when one is removed.
+
+    EventSource reconnects with Last-Event-ID and is replayed what it missed.
+    """
+    resume_from = request.query_params.get("last_event_id") or last_event_id
+    
+    async def events():
+        client = signal_hub.connect()
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n".encode()
+            last_sent = 0
+            if resume_from and resume_from.isdigit():
+                # Subscribed first, so nothing published during the replay is lost
+                async with AsyncSessionLocal() as db:
+                    missed = await events_after(db, int(resume_from), SIGNAL_REPLAY_LIMIT)
+                for event_id, frame in missed:
+                    yield frame
+                    last_sent = event_id
+            while True:
+                try:
+                    item = await asyncio.wait_for(client.queue.get(), SIGNAL_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                if item is None:
+                    break
+                event_id, frame = item
+                if event_id > last_sent:
+                    yield frame
+        finally:
+            signal_hub.disconnect(client)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Proxies must pass events through as they are written
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/posts/{post_id}", response_model=Post)
+async def get_post(request: Request, post_id: str):
+    """One post by id, for the post page"""
+    async def render_post():
+        post = await load_post(post_id)
+        if post is None:
+            raise HTTPException(status_code=404, detail="Post not found")
+        return encode_json(post)
+
+    return await cached_response(request, ("post", post_id), render_post)
 
 @router.post("/posts", response_model=Post, status_code=status.HTTP_201_CREATED)
-async def create_post(post: PostBase, db: Session = Depends(get_db), authorized: bool = Depends(verify_api_key)):
+async def create_post(post: PostBase, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db), authorized: bool = Depends(verify_api_key)):
     # API key successfully verified at this point
-    print("API key validation passed for POST request")
     
     new_post = PostModel(
         id=str(uuid.uuid4()),
@@ -65,28 +144,54 @@ async def create_post(post: PostBase, db: Session = Depends(get_db), authorized:
         imageUrl=post.imageUrl
     )
     db.add(new_post)
-    db.commit()
-    db.refresh(new_post)
-    return Post(
-        id=new_post.id,
-        title=new_post.title,
-        content=new_post.content,
-        author=new_post.author,
-        createdAt=new_post.createdAt.isoformat(),
-        imageUrl=new_post.imageUrl
-    )
+    created = post_to_dict(new_post)
+    await bump_posts_version(db)
+    record_signal(db, "post", new_post.id, created)
+    await db.commit()
+    post_cache.invalidate()
+    signal_hub.notify()
+    background_tasks.add_task(publish_feeds)
+    # Already in the ``Post`` shape; the response_model only documents it
+    return Response(content=encode_json(created), status_code=status.HTTP_201_CREATED, media_type="application/json")
+
+@router.post("/posts/batch", response_model=PostBatchResponse)
+async def create_posts(batch: PostBatch, background_tasks: BackgroundTasks, idempotency_key: Optional[str] = Header(None, max_length=200),
+                       db: AsyncSession = Depends(get_async_db), authorized: bool = Depends(verify_api_key)):
+    """Create many posts in one transaction; items whose ``sourceId`` is already stored are skipped.
+
+    Items without a ``sourceId`` are keyed ``<Idempotency-Key>:<index>`` when
+    that header is sent, so resending the same body is a no-op.
+    """
+    results, created = await ingest_posts(db, batch.posts, idempotency_key)
+    if created:
+        await bump_posts_version(db)
+        await record_signals(db, "post", [post_to_dict(PostModel(**row)) for row in created])
+    await db.commit()
+    if created:
+        post_cache.invalidate()
+        signal_hub.notify()
+        background_tasks.add_task(publish_feeds)
+    return Response(content=encode_json({
+        "created": len(created),
+        "duplicates": len(results) - len(created),
+        "results": results,
+    }), media_type="application/json")
 
 @router.delete("/posts/{post_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_post(post_id: str, db: Session = Depends(get_db), authorized: bool = Depends(verify_api_key)):
+async def delete_post(post_id: str, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_async_db), authorized: bool = Depends(verify_api_key)):
     # API key successfully verified at this point
-    print("API key validation passed for DELETE request")
     
-    post = db.query(PostModel).filter(PostModel.id == post_id).first()
+    post = await db.get(PostModel, post_id)
     if not post:
         raise HTTPException(status_code=404, detail="Post not found")
     
-    db.delete(post)
-    db.commit()
+    await db.delete(post)
+    await bump_posts_version(db)
+    record_signal(db, "delete", post_id, {"id": post_id})
+    await db.commit()
+    post_cache.invalidate()
+    signal_hub.notify()
+    background_tasks.add_task(publish_feeds)
     return {"status": "success", "message": "Post deleted successfully"}
 
 # New endpoint to provide config info to the frontend
@@ -94,52 +199,35 @@ async def delete_post(post_id: str, db: Session = Depends(get_db), authorized: b
 async def get_config():
     """Get configuration information that the frontend needs"""
     return {
-        "apiKeyAvailable": bool(API_KEY),  # Don't send the actual key, just whether it exists
+        "apiKeyAvailable": authenticator.configured,  # Don't send the actual key, just whether it exists
         #"apiKeyLength": len(API_KEY) if API_KEY else 0  # Send length for debugging
     }
 
+async def feed_response(request: Request, name: str):
+    """Stream a pre-built feed, picking the stored compressed variant the client accepts"""
+    snapshot = await post_cache.get()
+    artifact = (await current_feed_artifacts())[name]
+    encoding, body = artifact.negotiate(request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    last_modified = await snapshot.rendered("newest", newest_post_time)
+    return conditional_response(
+        request, artifact.etag(encoding), last_modified, lambda: body, artifact.media_type, extra_headers=headers
+    )
+
 # New endpoint for RSS feed
 @router.get("/rss", response_class=Response)
-async def get_rss_feed(db: Session = Depends(get_db)):
-    """Generate an RSS feed of the latest blog posts"""
-    posts = db.query(PostModel).order_by(PostModel.createdAt.desc()).limit(20).all()
-    
-    # Create RSS feed XML
-    rss_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
-    rss_content += '<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/">\n'
-    rss_content += '<channel>\n'
-    rss_content += '<title>SMALLCAP Signal Blog</title>\n'
-    rss_content += '<link>https://www.smallcapsignal.com</link>\n'
-    rss_content += '<description>Real-time alerts for Trump\'s market-moving posts</description>\n'
-    rss_content += '<language>en-us</language>\n'
-    rss_content += f'<lastBuildDate>{datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")}</lastBuildDate>\n'
-    rss_content += '<image>\n'
-    rss_content += '<url>https://www.smallcapsignal.com/site-uploads/fd97ccba-8dde-4e7a-9a9e-8bed28b27191.png</url>\n'
-    rss_content += '<title>SMALLCAP Signal</title>\n'
-    rss_content += '<link>https://www.smallcapsignal.com</link>\n'
-    rss_content += '</image>\n'
-    
-    # Add items
-    for post in posts:
-        rss_content += '<item>\n'
-        rss_content += f'<title>{post.title}</title>\n'
-        rss_content += f'<link>https://www.smallcapsignal.com/post/{post.id}</link>\n'
-        rss_content += f'<guid>https://www.smallcapsignal.com/post/{post.id}</guid>\n'
-        rss_content += f'<pubDate>{post.createdAt.strftime("%a, %d %b %Y %H:%M:%S GMT")}</pubDate>\n'
-        
-        # Escape HTML in content
-        content = post.content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-        rss_content += f'<description>{content}</description>\n'
-        
-        if post.author:
-            rss_content += f'<author>{post.author}</author>\n'
-        
-        # Add media:content for the logo
-        rss_content += '<media:content url="https://www.smallcapsignal.com/site-uploads/fd97ccba-8dde-4e7a-9a9e-8bed28b27191.png" medium="image" />\n'
-        
-        rss_content += '</item>\n'
-    
-    rss_content += '</channel>\n'
-    rss_content += '</rss>'
-    
-    return Response(content=rss_content, media_type="application/rss+xml")
+async def get_rss_feed(request: Request):
+    """Serve the RSS feed of the latest blog posts"""
+    return await feed_response(request, "rss")
+
+@router.get("/atom", response_class=Response)
+async def get_atom_feed(request: Request):
+    """Serve the Atom feed of the latest blog posts"""
+    return await feed_response(request, "atom")
+
+@router.get("/feed.json", response_class=Response)
+async def get_json_feed(request: Request):
+    """Serve the JSON Feed of the latest blog posts"""
+    return await feed_response(request, "json")
@@ -0,0 +1,17 @@
+
+from fastapi import APIRouter, Depends
+
+from app.utils.auth import verify_api_key
+from app.utils.static_site import static_index
+
+router = APIRouter()
+
+@router.post("/site/rebuild")
+async def rebuild_site(auth: bool = Depends(verify_api_key)):
+    """Re-index the built frontend after a deploy, in every worker (requires API key)"""
+    await static_index.request_rebuild()
+    assets = static_index.assets
+    return {
+        "files": len(assets),
+        "compressed": sum(1 for asset in assets.values() if asset.variants),
+    }
@@ -1,83 +1,221 @@
 
-from fastapi import APIRouter, Depends, status, HTTPException
-from sqlalchemy.orm import Session
+import html
+import logging
+
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlalchemy import delete, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
-from app.schemas.subscriber import SubscriberBase, SubscriberResponse
-from app.models.subscriber import SubscriberModel
-from app.database.base import get_subscriber_db
+from app.schemas.subscriber import SubscriberBase, SubscriberResponse, SubscriberPreferences, SubscriberPreferencesResponse
+from app.models.subscriber import EMAIL_KEY, SubscriberModel, SubscriberSegmentModel, email_key
+from app.database.base import get_async_db, AsyncSessionLocal
 from app.utils.auth import verify_api_key
-from app.utils.newsletter_email import send_newsletter_email
+from app.utils.coalesce import Coalescer
+from app.utils.email_templates import verify_unsubscribe_token
+from app.utils.newsletter_email import build_welcome_message
+from app.utils.outbox import enqueue_email, notify_outbox
+from app.utils.segments import normalize_segments, replace_segments, segment_counts, split_segments, subscriber_segments
+from app.utils.subscriber_filter import subscriber_filter
+from app.utils.subscriber_io import MEDIA_TYPES, iter_export_async, import_subscribers_async, detect_format
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
+
+# Repeated submits of the same address share one lookup/insert
+subscribe_requests = Coalescer()
 
 @router.post("/subscribe", response_model=SubscriberResponse, status_code=status.HTTP_201_CREATED)
-async def subscribe(subscriber: SubscriberBase, db: Session = Depends(get_subscriber_db)):
-    existing = db.query(SubscriberModel).filter(SubscriberModel.email == subscriber.email).first()
-    if existing:
-        return SubscriberResponse(email=subscriber.email, message="You're already subscribed!")
-    
-    # Add new subscriber to database
-    new_subscriber = SubscriberModel(email=subscriber.email, subscribed_at=datetime.utcnow())
-    db.add(new_subscriber)
-    db.commit()
-    
-    # Send welcome email
-    try:
-        subject = "Welcome to smallCapSIGNAL – Your Edge in the Market Starts Now"
-        body = f"""Dear {subscriber.email},
+async def subscribe(subscriber: SubscriberBase):
+    preferences = SubscriberPreferences(**subscriber.dict(exclude={"email"}))
+    return await subscribe_requests.run(email_key(subscriber.email), lambda: add_subscriber(subscriber.email, preferences))
 
-Welcome to smallCapSIGNAL.com — and thank you for joining a growing community of investors who don't just follow the market… they stay ahead of it.
+async def find_subscriber(db: AsyncSession, email: str) -> Optional[SubscriberModel]:
+    """The subscriber for ``email`` in any letter case"""
+    return await db.scalar(select(SubscriberModel).where(EMAIL_KEY == email_key(email)))
 
-At smallCapSIGNAL, we're laser-focused on giving you real-time trade analysis and actionable insights directly from the most influential posts on Truth Social. Our alerts often beat the mainstream media by more than an hour — so while others are still reading the news, you're already making moves.
+async def add_subscriber(email: str, preferences: Optional[SubscriberPreferences] = None) -> SubscriberResponse:
+    """Its own session: the work may outlive the request that started it"""
+    preferences = preferences or SubscriberPreferences()
+    async with AsyncSessionLocal() as db:
+        # Addresses the filter has never seen skip the lookup; the unique index still catches any it missed
+        if subscriber_filter.might_contain(email) and await find_subscriber(db, email):
+            return SubscriberResponse(email=email, message="You're already subscribed!")
+        try:
+            await _insert_subscriber(db, email, preferences)
+        except IntegrityError:
+            # Added by another worker (or in another letter case) in the meantime
+            subscriber_filter.add([email])
+            return SubscriberResponse(email=email, message="You're already subscribed!")
+    subscriber_filter.add([email])
+    notify_outbox()
+    return SubscriberResponse(email=email, message="Thank you for subscribing!")
 
-How to Stay Ahead:
-You can choose how to receive alerts:
+def describe_preferences(channel: str, frequency: str, tickers: List[str]) -> str:
+    delivery = "RSS feed only" if channel == "rss" else f"{frequency} email"
+    return f"{delivery}, {'tickers ' + ', '.join(tickers) if tickers else 'all tickers'}"
 
-Email notifications – Delivered straight to your inbox, the moment new signals go live.
+async def _insert_subscriber(db: AsyncSession, email: str, preferences: SubscriberPreferences):
+    # Add new subscriber, their segments and the welcome email in one transaction
+    new_subscriber = SubscriberModel(
+        email=email,
+        subscribed_at=datetime.utcnow(),
+        channel=preferences.channel or "email",
+        frequency=preferences.frequency or "instant",
+    )
+    db.add(new_subscriber)
+    segments = normalize_segments(preferences.segments or [], preferences.tickers or [])
+    if segments:
+        await db.flush()
+        await replace_segments(db, email, segments)
+    summary = describe_preferences(new_subscriber.channel, new_subscriber.frequency, split_segments(segments)["tickers"])
 
-RSS feed – Ideal for real-time updates in your preferred news aggregator.
+    # Delivered in the background, so signup latency doesn't depend on the mail provider
+    enqueue_email(db, "welcome", email, build_welcome_message(email, summary))
+    await db.commit()
 
-To set up or customize your alerts, just reply to this email letting us know what works best for you.  
-Always welcome your feedback, don't hesitate to introduce yourself and let us know how smallCapSIGNAL is working for you.
+@router.get("/subscribers")
+async def get_subscribers(auth_result: bool = Depends(verify_api_key)):
+    """Get all subscribers, streamed as a JSON array (requires API key)"""
+    async def body():
+        separator = b"["
+        async for chunk in iter_export_async("ndjson"):
+            if chunk:
+                # NDJSON lines are already JSON objects; join them into an array
+                yield separator + chunk.rstrip(b"\n").replace(b"\n", b",")
+                separator = b","
+        yield b"]" if separator == b"," else b"[]"
+
+    return StreamingResponse(body(), media_type="application/json")
 
-This is more than a subscription — it's your signal advantage.
-We're excited to help you trade smarter, faster, and with more confidence.
+@router.get("/subscribers/export")
+async def export_subscribers(
+    format: str = Query("csv", regex="^(csv|ndjson)$"),
+    auth_result: bool = Depends(verify_api_key)
+):
+    """Stream every subscriber as CSV or NDJSON (requires API key)"""
+    return StreamingResponse(
+        iter_export_async(format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="subscribers.{format}"'},
+    )
 
-Thank you again for joining smallCapSIGNAL.
+@router.post("/subscribers/import")
+async def import_subscribers(
+    request: Request,
+    format: Optional[str] = Query(None, regex="^(csv|ndjson)$"),
+    auth_result: bool = Depends(verify_api_key)
+):
+    """Bulk-add subscribers from a CSV or NDJSON body (requires API key).
 
-Here's to smart trades and strong returns,
-The smallCapSIGNAL Team
-www.smallCapSIGNAL.com"""
-        
-        send_newsletter_email(subscriber.email, subject, body)
-        print(f"Welcome email sent successfully to {subscriber.email}")
+    Rows are validated like POST /subscribe; existing addresses are skipped
+    and no welcome emails are sent.
+    """
+    fmt = format or detect_format(request.headers.get("content-type"))
+    try:
+        return await import_subscribers_async(request.stream(), fmt)
     except Exception as e:
-        print(f"Failed to send welcome email to {subscriber.email}: {str(e)}")
-        # Don't fail the subscription if email fails
-    
-    return SubscriberResponse(email=subscriber.email, message="Thank you for subscribing!")
+        logger.exception("Error importing subscribers")
+        raise HTTPException(status_code=500, detail=f"Failed to import subscribers: {str(e)}")
 
-@router.get("/subscribers")
-async def get_subscribers(db: Session = Depends(get_subscriber_db)):
-    """Get all subscribers"""
-    subscribers = db.query(SubscriberModel).all()
-    return [{"email": sub.email, "subscribed_at": sub.subscribed_at} for sub in subscribers]
+@router.get("/subscribers/segments")
+async def get_segments(db: AsyncSession = Depends(get_async_db), auth_result: bool = Depends(verify_api_key)):
+    """Subscribers per segment and ticker (requires API key)"""
+    return await segment_counts(db)
+
+async def _preferences_response(db: AsyncSession, subscriber: SubscriberModel) -> SubscriberPreferencesResponse:
+    return SubscriberPreferencesResponse(
+        email=subscriber.email,
+        channel=subscriber.channel,
+        frequency=subscriber.frequency,
+        **split_segments(await subscriber_segments(db, subscriber.email)),
+    )
+
+@router.get("/subscribers/{email}/preferences", response_model=SubscriberPreferencesResponse)
+async def get_preferences(email: str, db: AsyncSession = Depends(get_async_db), auth_result: bool = Depends(verify_api_key)):
+    """A subscriber's channel, frequency, tickers and segments (requires API key)"""
+    subscriber = await find_subscriber(db, email)
+    if not subscriber:
+        raise HTTPException(status_code=404, detail="Subscriber not found")
+    return await _preferences_response(db, subscriber)
+
+@router.put("/subscribers/{email}/preferences", response_model=SubscriberPreferencesResponse)
+async def update_preferences(
+    email: str,
+    preferences: SubscriberPreferences,
+    db: AsyncSession = Depends(get_async_db),
+    auth_result: bool = Depends(verify_api_key)
+):
+    """Change a subscriber's preferences; omitted fields are kept (requires API key)"""
+    subscriber = await find_subscriber(db, email)
+    if not subscriber:
+        raise HTTPException(status_code=404, detail="Subscriber not found")
+    if preferences.channel is not None:
+        subscriber.channel = preferences.channel
+    if preferences.frequency is not None:
+        subscriber.frequency = preferences.frequency
+    if preferences.tickers is not None or preferences.segments is not None:
+        current = split_segments(await subscriber_segments(db, subscriber.email))
+        tickers = preferences.tickers if preferences.tickers is not None else current["tickers"]
+        segments = preferences.segments if preferences.segments is not None else current["segments"]
+        try:
+            names = normalize_segments(segments, tickers)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        await replace_segments(db, subscriber.email, names)
+    await db.commit()
+    return await _preferences_response(db, subscriber)
 
 @router.delete("/subscribers/{email}")
-async def delete_subscriber(email: str, db: Session = Depends(get_subscriber_db), auth_result: bool = Depends(verify_api_key)):
+async def delete_subscriber(email: str, db: AsyncSession = Depends(get_async_db), auth_result: bool = Depends(verify_api_key)):
     """Delete a subscriber by email (requires API key)"""
     try:
-        subscriber = db.query(SubscriberModel).filter(SubscriberModel.email == email).first()
-        if not subscriber:
+        if not await _remove_subscriber(db, email):
             raise HTTPException(status_code=404, detail="Subscriber not found")
-        
-        db.delete(subscriber)
-        db.commit()
         return {"message": f"Subscriber {email} deleted successfully"}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error deleting subscriber {email}: {str(e)}")
+        logger.exception("Error deleting subscriber", extra={"email": email})
         raise HTTPException(status_code=500, detail=f"Failed to delete subscriber: {str(e)}")
+
+UNSUBSCRIBE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><meta name="robots" content="noindex"><title>Unsubscribe – smallCapSIGNAL</title></head>
+<body style="font-family:sans-serif;max-width:32em;margin:3em auto">{}</body></html>"""
+
+async def _remove_subscriber(db: AsyncSession, email: str) -> bool:
+    subscriber = await find_subscriber(db, email)
+    if subscriber:
+        await db.delete(subscriber)
+        await db.execute(delete(SubscriberSegmentModel).where(SubscriberSegmentModel.email == subscriber.email))
+        await db.commit()
+    return subscriber is not None
+
+def _check_unsubscribe_link(email: str, token: str):
+    if not verify_unsubscribe_token(email, token):
+        raise HTTPException(status_code=403, detail="Invalid unsubscribe link")
+
+@router.get("/unsubscribe", response_class=HTMLResponse)
+async def unsubscribe_page(email: str, token: str):
+    """Confirmation page for the link in every newsletter; link scanners following it don't unsubscribe anyone"""
+    _check_unsubscribe_link(email, token)
+    address = html.escape(email)
+    return HTMLResponse(UNSUBSCRIBE_PAGE.format(
+        f"<p>Stop sending smallCapSIGNAL emails to <strong>{address}</strong>?</p>"
+        # No action: the form posts back to this URL, query string included
+        '<form method="post">'
+        '<button type="submit">Unsubscribe</button></form>'
+    ), headers={"Cache-Control": "no-store"})
+
+@router.post("/unsubscribe", response_class=HTMLResponse)
+async def unsubscribe(email: str, token: str, db: AsyncSession = Depends(get_async_db)):
+    """Remove the subscriber named in a signed link; also the RFC 8058 one-click target of List-Unsubscribe"""
+    _check_unsubscribe_link(email, token)
+    await _remove_subscriber(db, email)
+    # Unsubscribing twice is not an error: the address is gone either way
+    return HTMLResponse(UNSUBSCRIBE_PAGE.format(
+        f"<p><strong>{html.escape(email)}</strong> has been unsubscribed. You won't receive any more emails from us.</p>"
+    ), headers={"Cache-Control": "no-store"})
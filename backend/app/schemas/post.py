@@ -1,6 +1,8 @@
 
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, conlist, constr
+from typing import Dict, List, Optional, Any
+
+from app.config import POST_BATCH_MAX_ITEMS
 
 class PostBase(BaseModel):
     title: str
@@ -14,3 +16,27 @@ class PostBase(BaseModel):
 class Post(PostBase):
     id: str
     createdAt: str
+
+class SearchResult(Post):
+    snippet: Optional[str] = None  # Matching excerpt with <mark> highlights
+
+class PostPage(BaseModel):
+    items: List[Dict[str, Any]]  # Post fields, limited by ``fields=``/``summary``; ``excerpt`` comes with ``truncated: bool``
+    next: Optional[str] = None  # Opaque cursor for the following page
+
+class PostBatchItem(PostBase):
+    sourceId: Optional[constr(strip_whitespace=True, min_length=1, max_length=200)] = None  # Upstream id; a repeat is a no-op
+
+class PostBatch(BaseModel):
+    posts: conlist(PostBatchItem, min_items=1, max_items=POST_BATCH_MAX_ITEMS)
+
+class PostBatchResult(BaseModel):
+    index: int  # Position in the request
+    id: str
+    sourceId: Optional[str] = None
+    status: str  # "created", "duplicate"
+
+class PostBatchResponse(BaseModel):
+    created: int
+    duplicates: int
+    results: List[PostBatchResult]
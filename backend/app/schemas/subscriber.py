@@ -1,9 +1,46 @@
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, validator
+from typing import List, Optional
 
-class SubscriberBase(BaseModel):
+from app.utils.segments import CHANNELS, FREQUENCIES, normalize_segments, ticker_segment, validate_choice
+
+class SubscriberPreferences(BaseModel):
+    """Delivery preferences; ``None`` leaves a field as it is"""
+    channel: Optional[str] = None  # "email", or "rss" to follow the feed without mail
+    frequency: Optional[str] = None  # "instant", "daily", "weekly"
+    tickers: Optional[List[str]] = None
+    segments: Optional[List[str]] = None
+
+    @validator("channel")
+    def check_channel(cls, value):
+        return validate_choice(value, CHANNELS, "channel")
+
+    @validator("frequency")
+    def check_frequency(cls, value):
+        return validate_choice(value, FREQUENCIES, "frequency")
+
+    @validator("tickers")
+    def check_tickers(cls, value):
+        for ticker in value or []:
+            ticker_segment(ticker)
+        return value
+
+    @validator("segments", always=True)
+    def check_segments(cls, value, values):
+        # Validated together so the per-subscriber cap covers both lists
+        normalize_segments(value or [], values.get("tickers") or [])
+        return value
+
+class SubscriberBase(SubscriberPreferences):
     email: EmailStr
 
 class SubscriberResponse(BaseModel):
     email: str
     message: str
+
+class SubscriberPreferencesResponse(BaseModel):
+    email: str
+    channel: str
+    frequency: str
+    tickers: List[str]
+    segments: List[str]
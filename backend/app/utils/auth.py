@@ -1,31 +1,283 @@
 
-from fastapi import Header, HTTPException, Depends
-from app.config import API_KEY
-import os
+"""API-key and session-token authentication for admin routes.
 
-def verify_api_key(authorization: str = Header(...)):
-    """Verify the API key for protected routes"""
-    if not authorization:
+Keys come from ``API_KEY`` (plain) and ``API_KEY_HASHES`` (named hashes)
+and are loaded once. A presented key is hashed and compared against every
+configured key with ``hmac.compare_digest``; slow ``pbkdf2_sha256`` hashes
+are checked off the event loop, and a key that matched is remembered by
+its SHA-256 so later requests skip the KDF. ``POST /verify-key`` hands out
+a short-lived HS256 session token that the admin UI can send instead of
+the key; a verified token is cached until it expires. Each key is rate
+limited, and so is each client address that keeps presenting bad
+credentials.
+
+    python -m app.utils.auth generate [name]   # new random key and its hash
+    python -m app.utils.auth hash [name]       # hash an existing key (prompted)
+"""
+
+import base64
+import hashlib
+import hmac
+import logging
+import secrets
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from fastapi import Header, HTTPException, Request
+from jose import JWTError, jwt
+from starlette.concurrency import run_in_threadpool
+
+from app.config import (
+    API_KEY,
+    API_KEY_HASHES,
+    SESSION_TOKEN_SECRET,
+    SESSION_TOKEN_TTL,
+    AUTH_RATE_LIMIT,
+    AUTH_FAILURE_LIMIT,
+)
+from app.utils.rate_limit import TokenBucketLimiter
+
+logger = logging.getLogger(__name__)
+
+PBKDF2_ITERATIONS = 200000
+TOKEN_ALGORITHM = "HS256"
+TOKEN_TYPE = "admin-session"
+# Verified tokens and matched key digests remembered per worker
+MAX_CACHED_CREDENTIALS = 1024
+
+
+def _sha256(value: str) -> bytes:
+    return hashlib.sha256(value.encode("utf-8")).digest()
+
+
+class ApiKey:
+    """One configured key: a name and a SHA-256 or PBKDF2 digest, never the key itself"""
+
+    def __init__(self, name: str, scheme: str, digest: bytes, salt: bytes = b"", iterations: int = 0):
+        self.name = name
+        self.scheme = scheme
+        self.digest = digest
+        self.salt = salt
+        self.iterations = iterations
+
+    @classmethod
+    def parse(cls, name: str, encoded: str) -> "ApiKey":
+        """``sha256$<hex>`` or ``pbkdf2_sha256$<iterations>$<salt b64>$<digest b64>``"""
+        scheme, _, rest = encoded.strip().partition("$")
+        if scheme == "sha256":
+            return cls(name, scheme, bytes.fromhex(rest))
+        if scheme == "pbkdf2_sha256":
+            iterations, salt, digest = rest.split("$")
+            return cls(name, scheme, base64.b64decode(digest), base64.b64decode(salt), int(iterations))
+        raise ValueError(f"Unsupported API key hash for {name!r}: {scheme or encoded[:10]}")
+
+    @property
+    def is_slow(self) -> bool:
+        return self.scheme == "pbkdf2_sha256"
+
+    def matches(self, provided: str, provided_sha256: bytes) -> bool:
+        if self.scheme == "sha256":
+            return hmac.compare_digest(provided_sha256, self.digest)
+        candidate = hashlib.pbkdf2_hmac("sha256", provided.encode("utf-8"), self.salt, self.iterations)
+        return hmac.compare_digest(candidate, self.digest)
+
+
+def hash_api_key(key: str, iterations: int = PBKDF2_ITERATIONS) -> str:
+    """Encode ``key`` for API_KEY_HASHES"""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.pbkdf2_hmac("sha256", key.encode("utf-8"), salt, iterations)
+    return f"pbkdf2_sha256${iterations}${base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}"
+
+
+def load_api_keys(plain_key: Optional[str] = API_KEY, hashes: str = API_KEY_HASHES) -> List[ApiKey]:
+    keys = []
+    if plain_key:
+        keys.append(ApiKey("default", "sha256", _sha256(plain_key)))
+    for entry in hashes.split(","):
+        if entry.strip():
+            name, _, encoded = entry.strip().partition(":")
+            keys.append(ApiKey.parse(name, encoded))
+    return keys
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Who made an authenticated request: the key's name and whether a key or a token was shown"""
+    key_name: str
+    method: str
+
+
+class _LRUCache:
+    def __init__(self, size: int):
+        self.size = size
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+class Authenticator:
+    def __init__(self, keys: List[ApiKey], token_secret: Optional[str] = SESSION_TOKEN_SECRET,
+                 token_ttl: int = SESSION_TOKEN_TTL, rate_limit: float = AUTH_RATE_LIMIT,
+                 failure_limit: float = AUTH_FAILURE_LIMIT):
+        self.keys = keys
+        self._by_name: Dict[str, ApiKey] = {key.name: key for key in keys}
+        # Derived from the key digests so every worker agrees and rotating the keys ends old sessions
+        self.token_secret = token_secret or hmac.new(
+            b"smallcap-session", b"".join(key.name.encode() + key.digest for key in keys), hashlib.sha256,
+        ).hexdigest()
+        self.token_ttl = token_ttl
+        self._matched_keys = _LRUCache(MAX_CACHED_CREDENTIALS)
+        self._verified_tokens = _LRUCache(MAX_CACHED_CREDENTIALS)
+        self._key_limiter = TokenBucketLimiter.per_minute(rate_limit)
+        self._failure_limiter = TokenBucketLimiter.per_minute(failure_limit)
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.keys)
+
+    # ------------------- Keys -------------------
+
+    def _match_fast(self, provided: str, provided_sha256: bytes) -> Optional[ApiKey]:
+        """Compare against every SHA-256 key without stopping at the first match"""
+        matched = None
+        for key in self.keys:
+            if not key.is_slow and key.matches(provided, provided_sha256):
+                matched = key
+        return matched
+
+    def _match_slow(self, provided: str, provided_sha256: bytes) -> Optional[ApiKey]:
+        matched = None
+        for key in self.keys:
+            if key.is_slow and key.matches(provided, provided_sha256):
+                matched = key
+        return matched
+
+    async def check_key(self, provided: str) -> Optional[ApiKey]:
+        provided_sha256 = _sha256(provided)
+        cached = self._matched_keys.get(provided_sha256)
+        if cached is not None:
+            return cached
+        matched = self._match_fast(provided, provided_sha256)
+        if matched is None and any(key.is_slow for key in self.keys):
+            matched = await run_in_threadpool(self._match_slow, provided, provided_sha256)
+        if matched is not None:
+            self._matched_keys.put(provided_sha256, matched)
+        return matched
+
+    # ------------------- Session tokens -------------------
+
+    def issue_token(self, key_name: str) -> str:
+        now = int(time.time())
+        claims = {"sub": key_name, "typ": TOKEN_TYPE, "iat": now, "exp": now + self.token_ttl}
+        return jwt.encode(claims, self.token_secret, algorithm=TOKEN_ALGORITHM)
+
+    def check_token(self, token: str) -> Optional[str]:
+        """The key name a valid token was issued to"""
+        now = time.time()
+        cached = self._verified_tokens.get(token)
+        if cached is None:
+            try:
+                claims = jwt.decode(token, self.token_secret, algorithms=[TOKEN_ALGORITHM])
+            except JWTError:
+                return None
+            if claims.get("typ") != TOKEN_TYPE or not isinstance(claims.get("sub"), str):
+                return None
+            cached = (claims["sub"], claims["exp"])
+            self._verified_tokens.put(token, cached)
+        key_name, expires_at = cached
+        # Tokens of keys removed from the config stop working with them
+        if expires_at <= now or key_name not in self._by_name:
+            return None
+        return key_name
+
+    # ------------------- Requests -------------------
+
+    async def authenticate(self, credential: str, client: str) -> Principal:
+        """Accept an API key or a session token, or raise 401/429"""
+        blocked_for = self._failure_limiter.retry_after(client)
+        if blocked_for > 0:
+            self._raise_limited(blocked_for, "Too many failed attempts")
+
+        principal = None
+        if credential.count(".") == 2:
+            key_name = self.check_token(credential)
+            if key_name:
+                principal = Principal(key_name, "token")
+        if principal is None:
+            key = await self.check_key(credential)
+            if key:
+                principal = Principal(key.name, "key")
+
+        if principal is None:
+            self._failure_limiter.acquire(client)
+            logger.warning("Rejected API key", extra={"key_length": len(credential), "client": client})
+            raise HTTPException(status_code=401, detail="Invalid API key.")
+
+        retry_after = self._key_limiter.acquire(principal.key_name)
+        if retry_after > 0:
+            logger.warning("Rate limited admin requests", extra={"key_name": principal.key_name})
+            self._raise_limited(retry_after, "Too many requests")
+        return principal
+
+    @staticmethod
+    def _raise_limited(retry_after: float, detail: str):
+        raise HTTPException(status_code=429, detail=f"{detail}. Try again later.",
+                            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))})
+
+
+authenticator = Authenticator(load_api_keys())
+
+
+def parse_authorization(authorization: str) -> str:
+    """``Bearer <key or token>`` or the bare value"""
+    if authorization[:7].lower() == "bearer ":
+        return authorization[7:].strip()
+    return authorization.strip()
+
+
+async def verify_api_key(request: Request, authorization: str = Header(...)) -> Principal:
+    """Dependency for protected routes: an API key or a session token from POST /verify-key"""
+    credential = parse_authorization(authorization) if authorization else ""
+    if not credential:
         raise HTTPException(status_code=401, detail="API key is required.")
-    
-    # Extract the key from "Bearer XYZ" format
-    if authorization.startswith("Bearer "):
-        provided_key = authorization.replace("Bearer ", "")
-    else:
-        provided_key = authorization
-    
-    # Debug output to check what's being received
-    print(f"Auth header received: {authorization}")
-    print(f"Extracted key: {provided_key}")
-    print(f"API_KEY from config: {API_KEY}")
-    print(f"API_KEY from env direct: {os.getenv('API_KEY')}")
-    print(f"Expected key length: {len(API_KEY) if API_KEY else 0}, Received key length: {len(provided_key)}")
-    
-    if not API_KEY:
+    if not authenticator.configured:
         raise HTTPException(status_code=500, detail="Server API key not configured.")
-    
-    if provided_key != API_KEY:
-        print(f"Key mismatch! Expected: {API_KEY}, Received: {provided_key}")
-        raise HTTPException(status_code=401, detail="Invalid API key.")
-    
-    return True
+    # The socket peer, or what a proxy in FORWARDED_ALLOW_IPS reported; clients can't choose it
+    client = request.client.host if request.client else "unknown"
+    return await authenticator.authenticate(credential, client)
+
+
+def _main(argv: List[str]):
+    import getpass
+
+    if not argv or argv[0] not in ("generate", "hash"):
+        print("Usage: python -m app.utils.auth generate|hash [name]")
+        sys.exit(1)
+    name = argv[1] if len(argv) > 1 else "admin"
+    if argv[0] == "generate":
+        key = secrets.token_urlsafe(30)
+        print(f"API key (give this to the client): {key}")
+    else:
+        key = getpass.getpass("API key: ")
+    print(f"API_KEY_HASHES entry: {name}:{hash_api_key(key)}")
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
@@ -0,0 +1,30 @@
+
+"""Share one in-flight operation between concurrent callers with the same key."""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class Coalescer:
+    """Callers that arrive while ``key`` is running await the first caller's result.
+
+    The work runs as its own task, so it completes (and every waiter gets
+    the result or the exception) even if the caller that started it
+    disconnects. Nothing is cached once the task finishes.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(work())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _, key=key: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
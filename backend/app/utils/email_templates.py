@@ -0,0 +1,172 @@
+"""Email messages encoded once and addressed per recipient.
+
+A ``MessageTemplate`` renders its headers and body parts a single time:
+each part is UTF-8 quoted-printable, cut at its merge fields
+(``{{email}}``, ``{{unsubscribe_url}}`` and any the caller declares).
+Addressing it then costs a ``To`` header, the encoding of each merge value
+and one string join, instead of building and flattening a MIME tree per
+message. Quoted-printable allows a soft line break anywhere, so every value
+is spliced in between two of them and each line stays within 76 characters.
+
+Unsubscribe links carry an HMAC of the address, checked by
+``GET``/``POST /unsubscribe``; messages built with ``unsubscribe=True`` also
+get ``List-Unsubscribe`` headers for one-click unsubscribing in mail clients.
+"""
+
+import hashlib
+import hmac
+import html
+import re
+import uuid
+from email import quoprimime
+from email.header import Header
+from typing import Dict, Iterable, List, Optional, Union
+from urllib.parse import quote
+
+from app.config import API_KEY, API_KEY_HASHES, DOMAIN_SENDER, SITE_URL, UNSUBSCRIBE_SECRET
+from app.models.subscriber import email_key
+
+MERGE_FIELD = re.compile(r"\{\{\s*([a-z_]+)\s*\}\}")
+# Filled in for every recipient; others must be passed to render()
+BUILTIN_FIELDS = ("email", "unsubscribe_url")
+# The line ending Message.as_string() uses; smtplib sends it as CRLF
+NL = "\n"
+SOFT_BREAK = "=" + NL
+MAX_LINE = 76
+
+TEXT_FOOTER = NL + NL + "--" + NL + "You're receiving this because you subscribed at smallCapSIGNAL.com." + NL + \
+    "Unsubscribe: {{unsubscribe_url}}" + NL
+HTML_FOOTER = '<p style="font-size:12px;color:#666">You\'re receiving this because you subscribed at ' \
+    'smallCapSIGNAL.com. <a href="{{unsubscribe_url}}">Unsubscribe</a></p>'
+
+_UNSUBSCRIBE_KEY = (UNSUBSCRIBE_SECRET or hmac.new(
+    b"smallcap-unsubscribe", (API_KEY or "").encode() + API_KEY_HASHES.encode(), hashlib.sha256,
+).hexdigest()).encode()
+
+
+def unsubscribe_token(email: str) -> str:
+    return hmac.new(_UNSUBSCRIBE_KEY, email_key(email).encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+
+
+def verify_unsubscribe_token(email: str, token: str) -> bool:
+    return hmac.compare_digest(unsubscribe_token(email), token or "")
+
+
+def unsubscribe_url(email: str) -> str:
+    return f"{SITE_URL}/api/unsubscribe?email={quote(email, safe='@')}&token={unsubscribe_token(email)}"
+
+
+def qp_encode(text: str) -> str:
+    """UTF-8 quoted-printable, one column short so a soft break can follow the last line"""
+    return quoprimime.body_encode(text.encode("utf-8").decode("latin-1"), maxlinelen=MAX_LINE - 1, eol=NL)
+
+
+def encode_header(name: str, value: str) -> str:
+    """One header line, RFC 2047-encoded and folded when needed"""
+    value = " ".join(value.splitlines())
+    if value.isascii() and len(name) + len(value) + 2 <= 78:
+        return f"{name}: {value}{NL}"
+    charset = "us-ascii" if value.isascii() else "utf-8"
+    return f"{name}: {Header(value, charset, header_name=name).encode(linesep=NL)}{NL}"
+
+
+class _Field:
+    """A merge field in a body part"""
+    __slots__ = ("name", "escape")
+
+    def __init__(self, name: str, escape: bool):
+        self.name = name
+        self.escape = escape
+
+
+def _compile_part(content_type: str, body: str, fields: set) -> List[Union[str, _Field]]:
+    """Part headers and body as encoded literals around the merge fields it uses"""
+    body = body.replace("\r\n", NL).replace("\r", NL)
+    pieces: List[Union[str, _Field]] = [
+        f'Content-Type: {content_type}; charset="utf-8"{NL}Content-Transfer-Encoding: quoted-printable{NL}{NL}'
+    ]
+    position = 0
+    for match in MERGE_FIELD.finditer(body):
+        if match.group(1) not in fields:
+            continue
+        pieces.append(qp_encode(body[position:match.start()]))
+        pieces.append(_Field(match.group(1), escape=content_type == "text/html"))
+        position = match.end()
+    pieces.append(qp_encode(body[position:]))
+    return pieces
+
+
+class MessageTemplate:
+    """A message whose headers and bodies are encoded once; ``render`` addresses a copy.
+
+    ``text`` and, optionally, ``html`` may use ``{{email}}``,
+    ``{{unsubscribe_url}}`` and the names in ``fields``; any other
+    ``{{...}}`` is left as written. With ``unsubscribe`` a footer with the
+    link is appended to each part and ``List-Unsubscribe`` headers are added.
+    """
+
+    def __init__(self, subject: str, text: str, html: Optional[str] = None, sender: Optional[str] = None,
+                 fields: Iterable[str] = (), unsubscribe: bool = False, reply_to: Optional[str] = None):
+        self.unsubscribe = unsubscribe
+        known = set(BUILTIN_FIELDS) | set(fields)
+        if unsubscribe:
+            text += TEXT_FOOTER
+            if html is not None:
+                html = html.replace("</body>", HTML_FOOTER + "</body>") if "</body>" in html else html + HTML_FOOTER
+
+        headers = encode_header("From", sender or DOMAIN_SENDER or "")
+        headers += encode_header("Subject", subject)
+        if reply_to:
+            headers += encode_header("Reply-To", reply_to)
+        headers += f"MIME-Version: 1.0{NL}"
+        if unsubscribe:
+            headers += f"List-Unsubscribe-Post: List-Unsubscribe=One-Click{NL}"
+
+        if html is None:
+            # A single text part: its Content-Type headers become the message's
+            body = _compile_part("text/plain", text, known)
+            pieces = [headers + body[0].rstrip(NL) + NL, None] + body[1:]
+        else:
+            # "=_" never occurs in quoted-printable text, so the boundary can't collide with a part
+            boundary = f"=_{uuid.uuid4().hex}"
+            pieces = [headers + f'Content-Type: multipart/alternative; boundary="{boundary}"{NL}', None,
+                      f"--{boundary}{NL}"]
+            pieces += _compile_part("text/plain", text, known)
+            pieces.append(f"{NL}--{boundary}{NL}")
+            pieces += _compile_part("text/html", html, known)
+            pieces.append(f"{NL}--{boundary}--{NL}")
+        # ``None`` marks where the per-recipient headers and the blank line go
+        self._pieces = self._merge_literals(pieces)
+        self.fields = {piece.name for piece in self._pieces if isinstance(piece, _Field)}
+
+    @staticmethod
+    def _merge_literals(pieces: list) -> list:
+        merged = []
+        for piece in pieces:
+            if isinstance(piece, str) and merged and isinstance(merged[-1], str):
+                merged[-1] += piece
+            else:
+                merged.append(piece)
+        return merged
+
+    def render(self, to: str, values: Optional[Dict[str, str]] = None) -> str:
+        """The full message for ``to``, ready for ``sendmail``"""
+        values = dict(values or ())
+        values.setdefault("email", to)
+        if self.unsubscribe or "unsubscribe_url" in self.fields:
+            values.setdefault("unsubscribe_url", unsubscribe_url(to))
+        out = []
+        for piece in self._pieces:
+            if piece.__class__ is str:
+                out.append(piece)
+            elif piece is None:
+                out.append(encode_header("To", to))
+                if self.unsubscribe:
+                    out.append(f"List-Unsubscribe: <{values['unsubscribe_url']}>{NL}")
+                out.append(NL)
+            else:
+                value = values[piece.name]
+                if piece.escape:
+                    value = html.escape(value)
+                out.append(SOFT_BREAK + qp_encode(value) + SOFT_BREAK)
+        return "".join(out)
@@ -0,0 +1,30 @@
+"""JSON encoding for responses: orjson when it is installed, the standard library otherwise.
+
+Both produce the bytes FastAPI's ``JSONResponse`` would (compact, UTF-8,
+non-ASCII unescaped) for the data we serve; orjson is several times faster
+on long lists of posts. Handlers that already have plain dicts encode them
+with ``dumps`` and skip the pydantic round trip; ``FastJSONResponse`` is the
+app's default response class, so everything else gets the faster encoder
+too.
+"""
+
+import json
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # The standard library encoder is used when the package is missing
+    orjson = None
+
+
+def dumps(data) -> bytes:
+    if orjson is not None:
+        # Non-string keys are turned into strings, as json.dumps does
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,337 @@
+
+"""Pre-built RSS 2.0, Atom and JSON Feed documents.
+
+Feeds are generated once per post-set version (after a post is created or
+deleted), compressed ahead of time and written under
+``DATA_DIR/feeds/v<version>-<fingerprint>`` so every worker can serve the
+stored bytes instead of rendering per request. The fingerprint covers the
+feed settings, ``FEED_FORMAT_VERSION`` and the posts themselves, so files
+left by other settings, an older renderer or another database are never
+taken for the current ones.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from datetime import datetime
+from typing import Dict, Optional
+from xml.sax.saxutils import escape, quoteattr
+
+from starlette.concurrency import run_in_threadpool
+
+from app.config import DATA_DIR, SITE_URL, FEED_ITEM_COUNT, FEED_FULL_CONTENT, FEED_IMAGE_WIDTH
+from app.utils.http_cache import accepted_encodings
+from app.utils.images import absolute_url, pick_variant
+from app.utils.pagination import excerpt
+from app.utils.post_cache import post_cache, load_posts
+
+logger = logging.getLogger(__name__)
+
+try:
+    import brotli
+except ImportError:  # Brotli variants are skipped when the package is missing
+    brotli = None
+
+FEEDS_DIR = os.path.join(DATA_DIR, "feeds")
+
+FEED_TITLE = "SMALLCAP Signal Blog"
+FEED_DESCRIPTION = "Real-time alerts for Trump's market-moving posts"
+LOGO_URL = f"{SITE_URL}/site-uploads/fd97ccba-8dde-4e7a-9a9e-8bed28b27191.png"
+
+FEED_MEDIA_TYPES = {
+    "rss": "application/rss+xml",
+    "atom": "application/atom+xml",
+    "json": "application/feed+json",
+}
+FEED_FILENAMES = {"rss": "rss.xml", "atom": "atom.xml", "json": "feed.json"}
+# v<version>-<fingerprint>; plain v<version> directories are from before fingerprints
+VERSION_DIR = re.compile(r"v(\d+)(?:-([0-9a-f]+))?")
+
+# Preferred first when the client accepts several
+ENCODINGS = ("br", "gzip")
+VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# Bump when a renderer's output changes so stored feeds are rebuilt
+FEED_FORMAT_VERSION = 3
+# Quality 11 saves ~1% over 9 at ~10x the CPU, which competes with request handling on every write
+BROTLI_QUALITY = 9
+
+
+def _rfc822(value: datetime) -> str:
+    return value.strftime("%a, %d %b %Y %H:%M:%S GMT")
+
+
+def _rfc3339(value: datetime) -> str:
+    return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _post_url(post: dict) -> str:
+    return f"{SITE_URL}/post/{post['id']}"
+
+
+def _body(post: dict, full_content: bool) -> str:
+    """The post's HTML content, or the plain-text excerpt of it"""
+    return post["content"] if full_content else excerpt(post["content"])
+
+
+def _image(post: dict) -> dict:
+    """A post's feed image: the JPEG variant of an uploaded image, any other URL as is, else the logo"""
+    url = post.get("imageUrl")
+    if not url:
+        return {"url": LOGO_URL}
+    variant = pick_variant(url, FEED_IMAGE_WIDTH)
+    if variant is None:
+        return {"url": absolute_url(url)}
+    return {**variant, "url": absolute_url(variant["url"])}
+
+
+def render_rss(posts: list, full_content: bool = FEED_FULL_CONTENT) -> bytes:
+    """RSS 2.0 document from the newest-first post dicts"""
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        '<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/">\n',
+        '<channel>\n',
+        f'<title>{escape(FEED_TITLE)}</title>\n',
+        f'<link>{SITE_URL}</link>\n',
+        f'<description>{escape(FEED_DESCRIPTION)}</description>\n',
+        '<language>en-us</language>\n',
+    ]
+    if posts:
+        # Stable for a given post set so the document (and its ETag) only changes with the posts
+        parts.append(f'<lastBuildDate>{_rfc822(datetime.fromisoformat(posts[0]["createdAt"]))}</lastBuildDate>\n')
+    parts.append(f'<image>\n<url>{LOGO_URL}</url>\n<title>SMALLCAP Signal</title>\n<link>{SITE_URL}</link>\n</image>\n')
+
+    for post in posts:
+        url = escape(_post_url(post))
+        parts.append('<item>\n')
+        parts.append(f'<title>{escape(post["title"])}</title>\n')
+        parts.append(f'<link>{url}</link>\n')
+        parts.append(f'<guid>{url}</guid>\n')
+        parts.append(f'<pubDate>{_rfc822(datetime.fromisoformat(post["createdAt"]))}</pubDate>\n')
+        parts.append(f'<description>{escape(_body(post, full_content))}</description>\n')
+        if post["author"]:
+            parts.append(f'<author>{escape(post["author"])}</author>\n')
+        image = _image(post)
+        attributes = "".join(
+            f' {name}={quoteattr(str(image[key]))}'
+            for name, key in (("type", "type"), ("width", "width"), ("height", "height"), ("fileSize", "bytes")) if key in image
+        )
+        parts.append(f'<media:content url={quoteattr(image["url"])} medium="image"{attributes} />\n')
+        parts.append('</item>\n')
+
+    parts.append('</channel>\n</rss>')
+    return "".join(parts).encode("utf-8")
+
+
+def render_atom(posts: list, full_content: bool = FEED_FULL_CONTENT) -> bytes:
+    """Atom 1.0 document from the newest-first post dicts"""
+    updated = _rfc3339(datetime.fromisoformat(posts[0]["createdAt"])) if posts else _rfc3339(datetime(1970, 1, 1))
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n',
+        '<feed xmlns="http://www.w3.org/2005/Atom">\n',
+        f'<title>{escape(FEED_TITLE)}</title>\n',
+        f'<subtitle>{escape(FEED_DESCRIPTION)}</subtitle>\n',
+        f'<id>{SITE_URL}/</id>\n',
+        f'<link href="{SITE_URL}/" />\n',
+        f'<link rel="self" href="{SITE_URL}/atom" />\n',
+        f'<logo>{LOGO_URL}</logo>\n',
+        f'<updated>{updated}</updated>\n',
+    ]
+    for post in posts:
+        url = escape(_post_url(post))
+        published = _rfc3339(datetime.fromisoformat(post["createdAt"]))
+        parts.append('<entry>\n')
+        parts.append(f'<title>{escape(post["title"])}</title>\n')
+        parts.append(f'<id>{url}</id>\n')
+        parts.append(f'<link href="{url}" />\n')
+        parts.append(f'<published>{published}</published>\n')
+        parts.append(f'<updated>{published}</updated>\n')
+        parts.append(f'<author><name>{escape(post["author"] or "SMALLCAP Signal")}</name></author>\n')
+        tag, kind = ("content", "html") if full_content else ("summary", "text")
+        parts.append(f'<{tag} type="{kind}">{escape(_body(post, full_content))}</{tag}>\n')
+        image = _image(post)
+        if "type" in image:
+            # Only uploaded images have a known type and size
+            parts.append(f'<link rel="enclosure" href={quoteattr(image["url"])} type="{image["type"]}" length="{image["bytes"]}" />\n')
+        parts.append('</entry>\n')
+    parts.append('</feed>')
+    return "".join(parts).encode("utf-8")
+
+
+def render_json_feed(posts: list, full_content: bool = FEED_FULL_CONTENT) -> bytes:
+    """JSON Feed 1.1 document from the newest-first post dicts"""
+    items = []
+    for post in posts:
+        item = {
+            "id": post["id"],
+            "url": _post_url(post),
+            "title": post["title"],
+            "content_html" if full_content else "content_text": _body(post, full_content),
+            "date_published": _rfc3339(datetime.fromisoformat(post["createdAt"])),
+            "image": _image(post)["url"],
+        }
+        if post["author"]:
+            item["authors"] = [{"name": post["author"]}]
+        items.append(item)
+    feed = {
+        "version": "https://jsonfeed.org/version/1.1",
+        "title": FEED_TITLE,
+        "description": FEED_DESCRIPTION,
+        "home_page_url": SITE_URL,
+        "feed_url": f"{SITE_URL}/feed.json",
+        "icon": LOGO_URL,
+        "items": items,
+    }
+    return json.dumps(feed, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+RENDERERS = {"rss": render_rss, "atom": render_atom, "json": render_json_feed}
+
+
+class FeedArtifact:
+    """One finished feed document and its pre-compressed variants"""
+
+    def __init__(self, name: str, body: bytes, variants: Optional[Dict[str, bytes]] = None):
+        self.name = name
+        self.media_type = FEED_MEDIA_TYPES[name]
+        self.body = body
+        self.digest = hashlib.sha1(body).hexdigest()[:20]
+        self.variants = variants if variants is not None else compress(body)
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        # Each representation needs its own strong validator
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def negotiate(self, accept_encoding: str):
+        """Pick the best stored variant for an Accept-Encoding header"""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ENCODINGS:
+            if encoding in accepted and encoding in self.variants:
+                return encoding, self.variants[encoding]
+        return None, self.body
+
+
+def compress(body: bytes) -> Dict[str, bytes]:
+    variants = {"gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return variants
+
+
+def build_feed_artifacts(posts: list, full_content: bool = FEED_FULL_CONTENT) -> Dict[str, FeedArtifact]:
+    return {name: FeedArtifact(name, render(posts, full_content)) for name, render in RENDERERS.items()}
+
+
+def feed_fingerprint(posts: list, full_content: bool = FEED_FULL_CONTENT) -> str:
+    """Everything the documents depend on besides the code: settings, renderer version and posts"""
+    inputs = [FEED_FORMAT_VERSION, SITE_URL, FEED_ITEM_COUNT, full_content, FEED_IMAGE_WIDTH, posts]
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _version_dir(version: int, fingerprint: str) -> str:
+    return f"v{version}-{fingerprint}"
+
+
+def write_feed_artifacts(version: int, fingerprint: str, artifacts: Dict[str, FeedArtifact],
+                         directory: str = FEEDS_DIR):
+    """Store a version's artifacts in their own directory, renamed into place when complete"""
+    os.makedirs(directory, exist_ok=True)
+    target = os.path.join(directory, _version_dir(version, fingerprint))
+    staging = tempfile.mkdtemp(prefix=".build-", dir=directory)
+    for name, artifact in artifacts.items():
+        filename = FEED_FILENAMES[name]
+        with open(os.path.join(staging, filename), "wb") as f:
+            f.write(artifact.body)
+        for encoding, data in artifact.variants.items():
+            with open(os.path.join(staging, filename + VARIANT_SUFFIXES[encoding]), "wb") as f:
+                f.write(data)
+    if os.path.isdir(target):
+        shutil.rmtree(target, ignore_errors=True)
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # Another worker published the same version first
+        shutil.rmtree(staging, ignore_errors=True)
+    _prune_versions(directory, keep=version, current=_version_dir(version, fingerprint))
+
+
+def read_feed_artifacts(version: int, fingerprint: str, directory: str = FEEDS_DIR) -> Optional[Dict[str, FeedArtifact]]:
+    """Load stored artifacts if they were built for ``version`` from the same inputs"""
+    source = os.path.join(directory, _version_dir(version, fingerprint))
+    artifacts = {}
+    try:
+        for name, filename in FEED_FILENAMES.items():
+            path = os.path.join(source, filename)
+            with open(path, "rb") as f:
+                body = f.read()
+            variants = {}
+            for encoding, suffix in VARIANT_SUFFIXES.items():
+                if os.path.exists(path + suffix):
+                    with open(path + suffix, "rb") as f:
+                        variants[encoding] = f.read()
+            artifacts[name] = FeedArtifact(name, body, variants)
+    except OSError:
+        return None
+    return artifacts
+
+
+def _prune_versions(directory: str, keep: int, current: str):
+    """Drop artifact directories older than the previous version, and other builds of this one"""
+    for entry in os.listdir(directory):
+        match = VERSION_DIR.fullmatch(entry)
+        if match is None or entry == current:
+            continue
+        version = int(match.group(1))
+        # Workers that haven't seen the new version yet may still read the previous one
+        if version < keep - 1 or version == keep or match.group(2) is None:
+            shutil.rmtree(os.path.join(directory, entry), ignore_errors=True)
+
+
+async def current_feed_artifacts() -> Dict[str, FeedArtifact]:
+    """Artifacts for the current post-set version: from memory, disk, or built once"""
+    snapshot = await post_cache.get()
+
+    async def load_or_build():
+        # A few rows once per version and worker; the stored files are only trusted if they match them
+        posts = await load_posts(FEED_ITEM_COUNT)
+        fingerprint = feed_fingerprint(posts)
+        # File I/O and compression stay off the event loop
+        artifacts = await run_in_threadpool(read_feed_artifacts, snapshot.version, fingerprint)
+        if artifacts is None:
+            artifacts = await run_in_threadpool(build_feed_artifacts, posts)
+            await run_in_threadpool(write_feed_artifacts, snapshot.version, fingerprint, artifacts)
+        return artifacts
+
+    return await snapshot.rendered("feeds", load_or_build)
+
+
+_publish_running = False
+_publish_pending = False
+
+
+async def publish_feeds():
+    """Feed generation stage: run after a post is created or deleted.
+
+    Bursts of writes are coalesced: while a build runs, further calls only
+    request one more pass, which then builds whatever version is current.
+    """
+    global _publish_running, _publish_pending
+    if _publish_running:
+        _publish_pending = True
+        return
+    _publish_running = True
+    try:
+        while True:
+            _publish_pending = False
+            try:
+                await current_feed_artifacts()
+            except Exception:
+                logger.exception("Failed to publish feeds")
+            if not _publish_pending:
+                break
+    finally:
+        _publish_running = False
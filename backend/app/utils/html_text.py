@@ -0,0 +1,32 @@
+"""Readable text from the HTML stored in post bodies.
+
+Excerpts, feed summaries and search snippets are cut by character count,
+which only makes sense on the text a reader sees; cutting the markup leaves
+half a tag behind.
+"""
+
+import html
+import re
+
+# Comments and script/style contents are not text at all
+_HIDDEN = re.compile(r"<!--.*?(?:-->|$)|<(script|style)\b.*?(?:</\1\s*>|$)", re.IGNORECASE | re.DOTALL)
+# Block-level tags separate words; inline ones (<b>, <a>) sit inside them
+_BLOCK_TAG = re.compile(r"</?(?:p|div|br|hr|li|ul|ol|h[1-6]|blockquote|pre|table|tr|td|th)\b[^>]*(?:>|$)", re.IGNORECASE)
+# "a < b" is text; a tag starts with a name, "/" or "!". One cut off by the end of the input still counts
+_TAG = re.compile(r"<[A-Za-z/!?][^>]*(?:>|$)")
+# The rest of a tag whose "<" was cut off by the start of the input
+_TAG_TAIL = re.compile(r"^[^<>]*>")
+
+
+def plain_text(markup: str, fragment: bool = False) -> str:
+    """The text of ``markup`` with entities decoded and whitespace collapsed.
+
+    ``fragment`` is for a slice of a body that may start inside a tag,
+    such as a search snippet.
+    """
+    if fragment:
+        markup = _TAG_TAIL.sub("", markup, count=1)
+    markup = _HIDDEN.sub(" ", markup)
+    markup = _BLOCK_TAG.sub(" ", markup)
+    markup = _TAG.sub("", markup)
+    return " ".join(html.unescape(markup).split())
@@ -0,0 +1,238 @@
+"""Content-addressed store for uploaded images, with variants made at upload time.
+
+Each upload lives in ``UPLOADS_DIR/<sha256 of the bytes>/``: the original
+file, a WebP and a JPEG rendition for every width in ``IMAGE_VARIANT_WIDTHS``
+narrower than the image (plus one at its own width, capped at the widest),
+and ``manifest.json`` listing them. Uploading the same bytes again finds the
+directory and does no work. A file never changes under its name, so
+everything is served with immutable cache headers.
+"""
+
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+from typing import Dict, List, Optional, Tuple
+
+from app.config import (
+    IMAGE_MAX_PIXELS,
+    IMAGE_QUALITY,
+    IMAGE_VARIANT_WIDTHS,
+    SITE_URL,
+    UPLOADS_DIR,
+)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Uploads are refused when the package is missing; stored images are still served
+    Image = ImageOps = None
+
+URL_PREFIX = "/uploads/"
+MANIFEST_NAME = "manifest.json"
+
+# Formats accepted for upload, and the extension their original is stored under
+ORIGINAL_FORMATS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "GIF": "gif"}
+MEDIA_TYPES = {"jpg": "image/jpeg", "png": "image/png", "webp": "image/webp", "gif": "image/gif"}
+# Variant extension -> Pillow format; WebP first, it is what pages show
+VARIANT_FORMATS = {"webp": "WEBP", "jpg": "JPEG"}
+
+_DIGEST = re.compile(r"[0-9a-f]{64}\Z")
+_FILE_NAME = re.compile(r"(?:original|\d{1,5})\.(?:jpg|png|webp|gif)\Z")
+
+# Manifests never change once written
+_manifests: Dict[str, dict] = {}
+
+
+class ImageError(ValueError):
+    """The upload is not an image we accept"""
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def image_url(digest: str, name: str) -> str:
+    return f"{URL_PREFIX}{digest}/{name}"
+
+
+def file_path(digest: str, name: str) -> Optional[str]:
+    """Where a stored file lives, or None if the name can't be one of ours"""
+    if not _DIGEST.match(digest) or not _FILE_NAME.match(name):
+        return None
+    return os.path.join(UPLOADS_DIR, digest, name)
+
+
+def media_type(name: str) -> str:
+    return MEDIA_TYPES[name.rsplit(".", 1)[1]]
+
+
+def read_manifest(digest: str) -> Optional[dict]:
+    manifest = _manifests.get(digest)
+    if manifest is None and _DIGEST.match(digest):
+        try:
+            with open(os.path.join(UPLOADS_DIR, digest, MANIFEST_NAME)) as f:
+                manifest = _manifests[digest] = json.load(f)
+        except FileNotFoundError:
+            return None
+    return manifest
+
+
+def variant_widths(width: int) -> List[int]:
+    widths = {w for w in IMAGE_VARIANT_WIDTHS if w < width}
+    widths.add(min(width, IMAGE_VARIANT_WIDTHS[-1]))
+    return sorted(widths)
+
+
+def _open(data: bytes):
+    try:
+        image = Image.open(io.BytesIO(data))
+    except Image.DecompressionBombError as e:
+        raise ImageError(f"Image is larger than {IMAGE_MAX_PIXELS} pixels") from e
+    except (OSError, SyntaxError) as e:
+        raise ImageError("Not a recognised image") from e
+    if image.format not in ORIGINAL_FORMATS:
+        raise ImageError(f"Unsupported image format: {image.format}")
+    # Checked from the header, before any pixels are decoded
+    if image.width * image.height > IMAGE_MAX_PIXELS:
+        raise ImageError(f"Image is larger than {IMAGE_MAX_PIXELS} pixels")
+    try:
+        image.load()
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ImageError("Image data is damaged or truncated") from e
+    return image
+
+
+def _upright(image):
+    """RGB or RGBA copy, rotated per its EXIF orientation"""
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+    return image.convert("RGBA" if has_alpha else "RGB")
+
+
+def _without_alpha(image):
+    """JPEG has no transparency: composite onto white"""
+    if image.mode != "RGBA":
+        return image
+    background = Image.new("RGB", image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel("A"))
+    return background
+
+
+SAVE_OPTIONS = {
+    "WEBP": {"quality": IMAGE_QUALITY, "method": 4},
+    "JPEG": {"quality": IMAGE_QUALITY, "optimize": True, "progressive": True},
+}
+
+
+def _write_variants(source, directory: str) -> List[dict]:
+    """Resize once per width and save every format from it; listed by width, narrowest first"""
+    variants = []
+    for width in variant_widths(source.width):
+        height = max(1, round(source.height * width / source.width))
+        resized = source if width == source.width else source.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+        for ext, image_format in VARIANT_FORMATS.items():
+            name = f"{width}.{ext}"
+            path = os.path.join(directory, name)
+            (resized if image_format == "WEBP" else _without_alpha(resized)).save(path, image_format, **SAVE_OPTIONS[image_format])
+            variants.append({
+                "name": name,
+                "width": width,
+                "height": height,
+                "type": MEDIA_TYPES[ext],
+                "bytes": os.path.getsize(path),
+            })
+    return variants
+
+
+def store_image(data: bytes) -> Tuple[dict, bool]:
+    """Store ``data`` and its variants; returns the manifest and whether it was new.
+
+    Decoding and resizing are CPU-bound: call it from a worker thread.
+    """
+    if Image is None:
+        raise RuntimeError("Image uploads need Pillow")
+    digest = hashlib.sha256(data).hexdigest()
+    existing = read_manifest(digest)
+    if existing is not None:
+        return existing, False
+
+    image = _open(data)
+    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    # Built in a scratch directory and renamed into place, so a half-written image is never served
+    scratch = tempfile.mkdtemp(prefix=".upload-", dir=UPLOADS_DIR)
+    try:
+        os.chmod(scratch, 0o755)
+        original = f"original.{ORIGINAL_FORMATS[image.format]}"
+        with open(os.path.join(scratch, original), "wb") as f:
+            f.write(data)
+        source = _upright(image)
+        manifest = {
+            "id": digest,
+            "original": original,
+            "type": MEDIA_TYPES[ORIGINAL_FORMATS[image.format]],
+            "width": source.width,
+            "height": source.height,
+            "bytes": len(data),
+            "variants": _write_variants(source, scratch),
+        }
+        with open(os.path.join(scratch, MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+        try:
+            os.rename(scratch, os.path.join(UPLOADS_DIR, digest))
+        except OSError:
+            # Another worker stored the same bytes first
+            shutil.rmtree(scratch, ignore_errors=True)
+            return read_manifest(digest), False
+    except BaseException:
+        shutil.rmtree(scratch, ignore_errors=True)
+        raise
+    _manifests[digest] = manifest
+    return manifest, True
+
+
+def describe(manifest: dict) -> dict:
+    """The upload API's view of a stored image; ``url`` is what a post's ``imageUrl`` should be"""
+    digest = manifest["id"]
+    variants = [dict(variant, url=image_url(digest, variant["name"])) for variant in manifest["variants"]]
+    webp = [variant for variant in variants if variant["type"] == "image/webp"]
+    return {
+        "id": digest,
+        "url": webp[-1]["url"],
+        "thumbnail": webp[0]["url"],
+        "original": image_url(digest, manifest["original"]),
+        "width": manifest["width"],
+        "height": manifest["height"],
+        "srcset": ", ".join(f'{variant["url"]} {variant["width"]}w' for variant in webp),
+        "variants": variants,
+    }
+
+
+def parse_image_url(url: str) -> Optional[Tuple[str, str]]:
+    """(digest, file name) if ``url`` points into the upload store, relative or on SITE_URL"""
+    if url.startswith(SITE_URL + URL_PREFIX):
+        url = url[len(SITE_URL):]
+    if not url.startswith(URL_PREFIX):
+        return None
+    digest, _, name = url[len(URL_PREFIX):].partition("/")
+    return (digest, name) if file_path(digest, name) else None
+
+
+def pick_variant(url: str, max_width: int, ext: str = "jpg") -> Optional[dict]:
+    """The widest ``ext`` variant of an uploaded image no wider than ``max_width`` (else the narrowest)"""
+    parsed = parse_image_url(url)
+    manifest = read_manifest(parsed[0]) if parsed else None
+    if manifest is None:
+        return None
+    candidates = [variant for variant in manifest["variants"] if variant["name"].endswith("." + ext)]
+    if not candidates:
+        return None
+    fitting = [variant for variant in candidates if variant["width"] <= max_width]
+    variant = fitting[-1] if fitting else candidates[0]
+    return dict(variant, url=image_url(manifest["id"], variant["name"]))
+
+
+def absolute_url(url: str) -> str:
+    return SITE_URL + url if url.startswith("/") else url
@@ -0,0 +1,213 @@
+
+"""Structured logging written by a background thread.
+
+Every module logs through ``logging.getLogger(__name__)``. The root logger
+only has a ``QueueHandler``, so a log call on the request path renders its
+message and enqueues the record; a ``QueueListener`` thread does the JSON
+encoding, secret redaction and the write to stdout. Records carry the id of
+the request they were logged under (``X-Request-ID``, set by
+``RequestIdMiddleware``).
+
+    LOG_LEVEL=INFO
+    LOG_LEVELS=app.utils.outbox=DEBUG,uvicorn.access=WARNING
+    LOG_FORMAT=json   # or text
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import queue
+import re
+import sys
+import threading
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from app.config import API_KEY, EMAIL_PASSWORD, LOG_LEVEL, LOG_LEVELS, LOG_FORMAT
+
+REDACTED = "[REDACTED]"
+REQUEST_ID_HEADER = b"x-request-id"
+
+_VALID_REQUEST_ID = re.compile(rb"[A-Za-z0-9._-]{1,64}\Z")
+_BEARER = re.compile(r"(Bearer\s+)[A-Za-z0-9._~+/=-]+", re.IGNORECASE)
+
+# LogRecord attributes that are not user-supplied ``extra`` fields (uvicorn adds an ANSI-coloured copy of its messages)
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id", "color_message"}
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+_secrets = set()
+_secrets_lock = threading.Lock()
+
+
+def register_secret(value: Optional[str]):
+    """Never let ``value`` reach the log output"""
+    if value and len(value) >= 4:
+        with _secrets_lock:
+            _secrets.add(value)
+
+
+def redact(text: str) -> str:
+    text = _BEARER.sub(r"\1" + REDACTED, text)
+    for secret in _secrets:
+        if secret in text:
+            text = text.replace(secret, REDACTED)
+    return text
+
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request id in the calling thread, before they are queued"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Render the message and traceback now but leave JSON encoding to the listener"""
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def _extra_fields(record) -> dict:
+    return {
+        key: redact(value) if isinstance(value, str) else value
+        for key, value in record.__dict__.items()
+        if key not in _RESERVED and not key.startswith("_")
+    }
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(_extra_fields(record))
+        if record.exc_text:
+            entry["exception"] = redact(record.exc_text)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if getattr(record, "request_id", None):
+            fields["request_id"] = record.request_id
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return redact(line)
+
+
+def _parse_levels(spec: str) -> dict:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener = None
+_output_handler = None
+
+
+def configure_logging():
+    """Route all logging (uvicorn's included) through the queue; safe to call more than once"""
+    global _listener, _output_handler
+    if _listener is not None:
+        return
+    register_secret(API_KEY)
+    register_secret(EMAIL_PASSWORD)
+
+    _output_handler = logging.StreamHandler(sys.stdout)
+    _output_handler.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+    log_queue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    queue_handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL.upper())
+    for name, level in _parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+    # When started as `uvicorn app.main:app`, uvicorn's own handlers would write synchronously;
+    # send their records to the root instead (loggers it disabled, like access_log=False, stay off)
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        if uvicorn_logger.handlers:
+            uvicorn_logger.handlers.clear()
+            uvicorn_logger.propagate = True
+
+    _listener = logging.handlers.QueueListener(log_queue, _output_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records; anything logged afterwards is written directly"""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    _listener = None
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            root.removeHandler(handler)
+    _output_handler.addFilter(RequestIdFilter())
+    root.addHandler(_output_handler)
+
+
+class RequestIdMiddleware:
+    """Adopt a well-formed incoming ``X-Request-ID`` or make one, and echo it in the response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER and _VALID_REQUEST_ID.match(value):
+                request_id = value.decode("ascii")
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER, request_id.encode("ascii")),
+                ])
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
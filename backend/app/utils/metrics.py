@@ -0,0 +1,401 @@
+
+"""Request, database and SMTP metrics in Prometheus text format.
+
+Each worker keeps its own counters and histograms in memory and writes a
+snapshot to ``DATA_DIR/metrics/<pid>.json`` every ``METRICS_FLUSH_INTERVAL``;
+``/metrics`` merges the snapshots of all live workers, so a scrape gives the
+same totals whichever worker answers it. Per-request query counts and times
+are gathered through a context variable and returned in ``Server-Timing``.
+"""
+
+import bisect
+import contextvars
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.config import DATA_DIR, METRICS_FLUSH_INTERVAL
+from app.utils import profiler as profiling
+
+logger = logging.getLogger(__name__)
+
+METRICS_DIR = os.path.join(DATA_DIR, "metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5)
+SMTP_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_OPERATION = re.compile(r"\s*(\w+)")
+_OPERATIONS = {"select", "insert", "update", "delete"}
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            values = [[list(key), value if isinstance(value, float) else list(value)]
+                      for key, value in self._values.items()]
+        return {"type": self.kind, "help": self.description, "labels": list(self.labels), "values": values}
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Per-bucket (not cumulative) counts followed by the sum and the count"""
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            values = self._values.get(key)
+            if values is None:
+                values = self._values[key] = [0.0] * (len(self.buckets) + 3)
+            values[index] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def snapshot(self) -> dict:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def snapshot(self) -> dict:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+REGISTRY = Registry()
+
+http_request_duration = REGISTRY.register(Histogram(
+    "http_request_duration_seconds", "Time to the end of the response body, by route template",
+    ("method", "route", "status"),
+))
+http_requests_in_progress = REGISTRY.register(Gauge(
+    "http_requests_in_progress", "Requests being handled, including open event streams",
+))
+db_query_duration = REGISTRY.register(Histogram(
+    "db_query_duration_seconds", "SQL statement execution time", ("database", "operation"), QUERY_BUCKETS,
+))
+db_query_errors = REGISTRY.register(Counter(
+    "db_query_errors_total", "SQL statements that raised", ("database",),
+))
+smtp_send_duration = REGISTRY.register(Histogram(
+    "smtp_send_duration_seconds", "Time to hand one message to the SMTP server, including any reconnect",
+    ("kind", "result"), SMTP_BUCKETS,
+))
+smtp_connect_duration = REGISTRY.register(Histogram(
+    "smtp_connect_duration_seconds", "Time to open and authenticate an SMTP session", (), SMTP_BUCKETS,
+))
+
+
+# ------------------- Per-request timings -------------------
+
+class RequestTimings:
+    """Database work done on behalf of the current request"""
+    __slots__ = ("db_count", "db_time")
+
+    def __init__(self):
+        self.db_count = 0
+        self.db_time = 0.0
+
+    def server_timing(self, total: float) -> str:
+        return f'db;dur={self.db_time * 1000:.2f};desc="{self.db_count} queries", app;dur={total * 1000:.2f}'
+
+
+# Work in threadpool handlers and SQLAlchemy's greenlets is attributed through the copied context
+current_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def instrument_engine(engine, database: str):
+    """Time every statement run through ``engine`` (a sync engine or an async engine's ``sync_engine``)"""
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        match = _OPERATION.match(statement)
+        operation = match.group(1).lower() if match else ""
+        db_query_duration.observe(elapsed, database=database,
+                                  operation=operation if operation in _OPERATIONS else "other")
+        timings = current_timings.get()
+        if timings is not None:
+            timings.db_count += 1
+            timings.db_time += elapsed
+
+    def handle_error(exception_context):
+        starts = exception_context.connection.info.get("query_start") if exception_context.connection else None
+        if starts:
+            starts.pop()
+        db_query_errors.inc(database=database)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+# ------------------- Middleware -------------------
+
+class MetricsMiddleware:
+    """Latency per route template, ``Server-Timing`` and the slow-request profiler hook.
+
+    Plain ASGI rather than ``BaseHTTPMiddleware`` so streamed responses pass
+    straight through. Event streams are only counted as in progress; their
+    lifetime would swamp the latency histogram.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._route_paths = None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        start = time.perf_counter()
+        response = {"status": 500, "stream": False}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                headers = list(message.get("headers", []))
+                response["stream"] = any(name == b"content-type" and value.startswith(b"text/event-stream")
+                                         for name, value in headers)
+                headers.append((b"server-timing", timings.server_timing(time.perf_counter() - start).encode()))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        http_requests_in_progress.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_progress.dec()
+            current_timings.reset(token)
+            if not response["stream"]:
+                end = time.perf_counter()
+                route = self._route_label(scope)
+                http_request_duration.observe(end - start, method=scope["method"], route=route,
+                                              status=response["status"])
+                if profiling.profiler is not None:
+                    profiling.profiler.request_finished(scope["method"], route, start, end)
+
+    def _route_label(self, scope) -> str:
+        """The matched route's template (``/posts/{post_id}``), never the raw path"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        if self._route_paths is None:
+            self._route_paths = {}
+            for route in scope["app"].routes:
+                target = getattr(route, "endpoint", None) or getattr(route, "app", None)
+                self._route_paths.setdefault(id(target), []).append(route)
+        for route in self._route_paths.get(id(endpoint), ()):
+            if route.path_regex.match(scope["path"]):
+                return route.path_format
+        return "unmatched"
+
+
+# ------------------- Exposition -------------------
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(METRICS_DIR, f"{pid}.json")
+
+
+def write_snapshot():
+    """Publish this worker's metrics for whichever worker serves the next scrape"""
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    path = _snapshot_path(os.getpid())
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(REGISTRY.snapshot(), file, separators=(",", ":"))
+    os.replace(temp_path, path)
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def load_snapshots() -> List[dict]:
+    """Snapshots of every live worker; files left by dead ones are removed"""
+    snapshots = []
+    try:
+        names = os.listdir(METRICS_DIR)
+    except FileNotFoundError:
+        return snapshots
+    for name in names:
+        pid, _, extension = name.partition(".")
+        if extension != "json" or not pid.isdigit():
+            continue
+        if not _is_alive(int(pid)):
+            try:
+                os.remove(os.path.join(METRICS_DIR, name))
+            except OSError:
+                pass
+            continue
+        try:
+            with open(os.path.join(METRICS_DIR, name)) as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            pass
+    return snapshots
+
+
+def _merge(snapshots: List[dict]) -> Dict[str, dict]:
+    merged = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            target = merged.setdefault(name, dict(data, values={}))
+            for key, value in data["values"]:
+                key = tuple(key)
+                if isinstance(value, list):
+                    current = target["values"].get(key)
+                    target["values"][key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    target["values"][key] = target["values"].get(key, 0.0) + value
+    return merged
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra: Tuple[str, str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def render(snapshots: List[dict]) -> str:
+    """Prometheus text exposition format 0.0.4"""
+    lines = []
+    for name, data in sorted(_merge(snapshots).items()):
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        labels = data["labels"]
+        for key, value in sorted(data["values"].items()):
+            if data["type"] != "histogram":
+                lines.append(f"{name}{_labels(labels, key)} {_number(value)}")
+                continue
+            cumulative = 0.0
+            for bound, count in zip(data["buckets"] + ["+Inf"], value[:-2]):
+                cumulative += count
+                le = bound if isinstance(bound, str) else _number(bound)
+                lines.append(f"{name}_bucket{_labels(labels, key, ('le', le))} {_number(cumulative)}")
+            lines.append(f"{name}_sum{_labels(labels, key)} {value[-2]!r}")
+            lines.append(f"{name}_count{_labels(labels, key)} {_number(value[-1])}")
+    return "\n".join(lines) + "\n"
+
+
+def render_metrics() -> str:
+    """Current totals across all workers, this one's counted up to now"""
+    write_snapshot()
+    return render(load_snapshots())
+
+
+class _SnapshotWriter:
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        try:
+            os.remove(_snapshot_path(os.getpid()))
+        except OSError:
+            pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                write_snapshot()
+            except Exception:
+                logger.exception("Failed to write metrics snapshot")
+
+
+_writer = None
+
+
+def start_metrics():
+    global _writer
+    if _writer is None:
+        _writer = _SnapshotWriter(METRICS_FLUSH_INTERVAL)
+        _writer.start()
+
+
+def shutdown_metrics():
+    """Stop publishing; this worker's counts leave the merged totals"""
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
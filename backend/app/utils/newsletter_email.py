@@ -1,57 +1,107 @@
 
-import smtplib
-import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import html
+import logging
+from functools import lru_cache
+from typing import Optional
 from fastapi import HTTPException
-from app.config import EMAIL_PASSWORD, EMAIL_SENDER, DOMAIN_SENDER
+from app.config import EMAIL_PASSWORD, DOMAIN_SENDER, SITE_URL
+from app.utils.email_templates import MessageTemplate
+from app.utils.pagination import excerpt
+from app.utils.smtp_pool import get_smtp_pool
+
+logger = logging.getLogger(__name__)
+
+WELCOME_SUBJECT = "Welcome to smallCapSIGNAL – Your Edge in the Market Starts Now"
+WELCOME_TEXT = """Dear {{email}},
+
+Welcome to smallCapSIGNAL.com — and thank you for joining a growing community of investors who don't just follow the market… they stay ahead of it.
+
+At smallCapSIGNAL, we're laser-focused on giving you real-time trade analysis and actionable insights directly from the most influential posts on Truth Social. Our alerts often beat the mainstream media by more than an hour — so while others are still reading the news, you're already making moves.
+
+How to Stay Ahead:
+You can choose how to receive alerts:
+
+Email notifications – Delivered straight to your inbox, the moment new signals go live.
+
+RSS feed – Ideal for real-time updates in your preferred news aggregator.
+
+Your alerts are set to: {{preferences}}. To change them, just reply to this email letting us know what works best for you.  
+Always welcome your feedback, don't hesitate to introduce yourself and let us know how smallCapSIGNAL is working for you.
+
+This is more than a subscription — it's your signal advantage.
+We're excited to help you trade smarter, faster, and with more confidence.
+
+Thank you again for joining smallCapSIGNAL.
+
+Here's to smart trades and strong returns,
+The smallCapSIGNAL Team
+www.smallCapSIGNAL.com"""
+
+def newsletter_template(subject: str, message: str, html_message: Optional[str] = None) -> MessageTemplate:
+    """A newsletter encoded once for a whole job, with an unsubscribe footer and headers"""
+    return MessageTemplate(subject, message, html_message, sender=DOMAIN_SENDER, unsubscribe=True)
+
+@lru_cache(maxsize=1)
+def welcome_template() -> MessageTemplate:
+    return MessageTemplate(WELCOME_SUBJECT, WELCOME_TEXT, sender=DOMAIN_SENDER, fields=("preferences",), unsubscribe=True)
+
+def build_welcome_message(subscriber_email: str, preferences: str) -> str:
+    return welcome_template().render(subscriber_email, {"preferences": preferences})
+
+def build_newsletter_message(subscriber_email: str, subject: str, message: str, html_message: Optional[str] = None) -> str:
+    """Render a newsletter email for a single subscriber; jobs reuse one ``newsletter_template`` instead"""
+    return newsletter_template(subject, message, html_message).render(subscriber_email)
+
+def build_digest_body(introduction: str, posts: list) -> str:
+    """Plain-text digest of ``posts`` (dicts with id, title, content, createdAt), newest first"""
+    parts = [introduction.strip() + "\n\n"] if introduction.strip() else []
+    parts.append(f"{len(posts)} new signal{'s' if len(posts) != 1 else ''} since your last digest:\n\n")
+    for post in posts:
+        parts.append(
+            f"{post['title']}\n"
+            f"{post['createdAt']:%b %d, %H:%M} UTC\n"
+            f"{excerpt(post['content'])}\n"
+            f"{SITE_URL}/post/{post['id']}\n\n"
+        )
+    parts.append(f"Read every signal as it happens at {SITE_URL}\n")
+    return "".join(parts)
+
+def build_digest_html(introduction: str, posts: list) -> str:
+    """The HTML alternative of ``build_digest_body``"""
+    parts = ["<html><body>"]
+    if introduction.strip():
+        parts.append(f"<p>{html.escape(introduction.strip())}</p>")
+    parts.append(f"<p>{len(posts)} new signal{'s' if len(posts) != 1 else ''} since your last digest:</p>")
+    for post in posts:
+        url = html.escape(f"{SITE_URL}/post/{post['id']}")
+        parts.append(
+            f'<h3><a href="{url}">{html.escape(post["title"])}</a></h3>'
+            f'<p style="color:#666">{post["createdAt"]:%b %d, %H:%M} UTC</p>'
+            f"<p>{html.escape(excerpt(post['content']))}</p>"
+        )
+    parts.append(f'<p>Read every signal as it happens at <a href="{html.escape(SITE_URL)}">{html.escape(SITE_URL)}</a></p>')
+    parts.append("</body></html>")
+    return "".join(parts)
 
 def send_newsletter_email(subscriber_email: str, subject: str, message: str):
-    """Send newsletter email directly to subscriber using Gmail SMTP server"""
+    """Send newsletter email directly to subscriber over the pooled SMTP connection"""
     
     if not EMAIL_PASSWORD:
-        print("ERROR: EMAIL_PASSWORD environment variable is not set")
+        logger.error("EMAIL_PASSWORD environment variable is not set")
         raise HTTPException(
             status_code=500, 
             detail="Email configuration error. Please contact the administrator."
         )
     
-    # Create message
-    msg = MIMEMultipart()
-    msg['From'] = DOMAIN_SENDER
-    msg['To'] = subscriber_email
-    msg['Subject'] = subject
-    
-    # Build email body
-    body = message
-    
-    msg.attach(MIMEText(body, 'plain'))
+    text = build_newsletter_message(subscriber_email, subject, message)
     
     # Send email
     try:
-        print(f"Attempting to send newsletter email from {EMAIL_SENDER} to {subscriber_email}")
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.set_debuglevel(1)  # Add debug information
-        print("SMTP connection established")
-        
-        server.ehlo()
-        server.starttls()
-        print("TLS started")
-        
-        server.ehlo()
-        print(f"Logging in as {EMAIL_SENDER}")
-        server.login(EMAIL_SENDER, EMAIL_PASSWORD)
-        print("Login successful")
-        
-        text = msg.as_string()
-        print("Sending newsletter email...")
-        server.sendmail(DOMAIN_SENDER, subscriber_email, text)
-        print(f"Newsletter email sent successfully to {subscriber_email}")
-        
-        server.quit()
+        get_smtp_pool().send(DOMAIN_SENDER, subscriber_email, text, kind="newsletter")
+        logger.info("Newsletter email sent", extra={"recipient": subscriber_email})
         return True
     except Exception as e:
-        print(f"NEWSLETTER EMAIL ERROR: {str(e)}")
+        logger.error("Newsletter email failed: %s", e, extra={"recipient": subscriber_email})
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to send newsletter email: {str(e)}"
@@ -0,0 +1,662 @@
+"""Scheduled newsletter and digest delivery, persisted in the database.
+
+``schedule_newsletter`` stores a job with its ``send_at`` and audience;
+nothing else happens in the request. Every uvicorn worker runs a
+``NewsletterScheduler`` thread, and the first to find a due job claims it
+with a lease, so one job is sent at a time across all workers. On start the
+job copies the subscribers its audience selects (``app/utils/segments.py``)
+into ``newsletter_deliveries``. Recipients are then sent
+``NEWSLETTER_BATCH_SIZE`` at a time over the SMTP pool, and each batch's
+results are committed together with the job's counters.
+
+If the worker dies, its lease runs out and another worker resumes the job
+with the recipients still ``pending``. Only the batch in flight can be sent
+twice. At most ``NEWSLETTER_RATE_LIMIT`` messages go out per sliding
+``NEWSLETTER_RATE_WINDOW``: before each batch the scheduler counts the
+deliveries whose ``sent_at`` falls in the window, whichever worker or job
+sent them, and shrinks the batch to what is left. Once the window is full it
+waits for the oldest of those sends to leave it. Within the budget, messages
+go out as fast as the pool allows.
+
+A digest sends each subscriber the posts created since the newest post of
+their previous digest (or since they subscribed), capped at
+``NEWSLETTER_DIGEST_MAX_POSTS``. With ``NEWSLETTER_DIGEST_INTERVAL_HOURS``
+set, digests are scheduled automatically.
+"""
+
+import bisect
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import bindparam, delete, func, insert, literal, or_, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import (
+    DOMAIN_SENDER,
+    EMAIL_PASSWORD,
+    SMTP_POOL_SIZE,
+    NEWSLETTER_POLL_INTERVAL,
+    NEWSLETTER_BATCH_SIZE,
+    NEWSLETTER_RATE_LIMIT,
+    NEWSLETTER_RATE_WINDOW,
+    NEWSLETTER_MAX_ATTEMPTS,
+    NEWSLETTER_LEASE_SECONDS,
+    NEWSLETTER_RETENTION_DAYS,
+    NEWSLETTER_DIGEST_INTERVAL_HOURS,
+    NEWSLETTER_DIGEST_MAX_POSTS,
+    NEWSLETTER_DIGEST_SUBJECT,
+)
+from app.database.base import SessionLocal
+from app.models.newsletter import NewsletterJobModel, NewsletterDeliveryModel, DigestCursorModel
+from app.models.post import PostModel
+from app.models.subscriber import SubscriberModel
+from app.utils.email_templates import MessageTemplate
+from app.utils.newsletter_email import build_digest_body, build_digest_html, newsletter_template
+from app.utils.outbox import is_permanent_failure, retry_delay
+from app.utils.segments import select_recipients
+from app.utils.smtp_pool import get_smtp_pool
+
+logger = logging.getLogger(__name__)
+
+BROADCAST = "broadcast"
+DIGEST = "digest"
+
+# Job statuses
+SCHEDULED = "scheduled"
+RUNNING = "running"
+COMPLETED = "completed"
+CANCELLED = "cancelled"
+
+# Delivery statuses
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+# Failed recipients listed by the status endpoint
+MAX_REPORTED_ERRORS = 20
+# Per-recipient rows of old jobs are deleted at most this often
+PRUNE_INTERVAL = 3600
+# Subscribers without a subscription date get every post in the digest window
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_utc(value: Optional[datetime]) -> datetime:
+    """Naive UTC, as stored everywhere else; ``None`` means now"""
+    if value is None:
+        return datetime.utcnow()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def schedule_newsletter(db: AsyncSession, kind: str, subject: str, message: str,
+                        send_at: Optional[datetime] = None, audience: Optional[dict] = None,
+                        html: Optional[str] = None) -> NewsletterJobModel:
+    """Add a job for ``audience`` (see ``segments.normalize_audience``); it is scheduled when the caller commits"""
+    job = NewsletterJobModel(
+        id=str(uuid.uuid4()),
+        kind=kind,
+        subject=subject,
+        message=message,
+        html=html,
+        audience=json.dumps(audience) if audience else None,
+        status=SCHEDULED,
+        send_at=to_utc(send_at),
+        sent=0,
+        failed=0,
+        created_at=datetime.utcnow(),
+    )
+    db.add(job)
+    return job
+
+
+def job_to_dict(job: NewsletterJobModel) -> dict:
+    total = job.total
+    return {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "subject": job.subject,
+        "audience": json.loads(job.audience) if job.audience else None,
+        "send_at": job.send_at.isoformat(),
+        "total": total,
+        "sent": job.sent,
+        "failed": job.failed,
+        "pending": total - job.sent - job.failed if total is not None else None,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+async def list_jobs(db: AsyncSession, limit: int = 50) -> List[dict]:
+    jobs = await db.scalars(select(NewsletterJobModel).order_by(NewsletterJobModel.send_at.desc()).limit(limit))
+    return [job_to_dict(job) for job in jobs]
+
+
+async def job_summary(db: AsyncSession, job_id: str) -> Optional[dict]:
+    """Progress of one job with a sample of failed recipients"""
+    job = await db.get(NewsletterJobModel, job_id)
+    if job is None:
+        return None
+    summary = job_to_dict(job)
+    errors = await db.execute(
+        select(NewsletterDeliveryModel.email, NewsletterDeliveryModel.last_error)
+        .where(NewsletterDeliveryModel.job_id == job_id, NewsletterDeliveryModel.status == FAILED)
+        .limit(MAX_REPORTED_ERRORS)
+    )
+    summary["errors"] = [{"email": email, "error": error} for email, error in errors]
+    return summary
+
+
+async def cancel_job(db: AsyncSession, job_id: str) -> bool:
+    """Stop a scheduled or running job; a running one stops after its current batch"""
+    result = await db.execute(
+        update(NewsletterJobModel)
+        .where(NewsletterJobModel.id == job_id, NewsletterJobModel.status.in_((SCHEDULED, RUNNING)))
+        .values(status=CANCELLED, finished_at=datetime.utcnow(), lease_until=None)
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+class DigestRenderer:
+    """Digest messages for one job: every recipient gets a prefix of the same newest-first post list.
+
+    The newest ``max_posts`` posts up to ``until`` include the newest
+    ``max_posts`` after any ``since``, so one query serves the whole job,
+    and there are at most ``max_posts`` distinct templates.
+    """
+
+    def __init__(self, subject: str, introduction: str, posts: List[dict]):
+        self.subject = subject
+        self.introduction = introduction
+        self.posts = posts
+        # Ascending, for bisect
+        self._created = [post["createdAt"] for post in reversed(posts)]
+        self._templates: Dict[int, MessageTemplate] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, db, subject: str, introduction: str, until: datetime, max_posts: int = NEWSLETTER_DIGEST_MAX_POSTS):
+        rows = db.execute(
+            select(PostModel.id, PostModel.title, PostModel.content, PostModel.createdAt)
+            .where(PostModel.createdAt <= until)
+            .order_by(PostModel.createdAt.desc(), PostModel.id.desc())
+            .limit(max_posts)
+        ).mappings().all()
+        return cls(subject, introduction, [dict(row) for row in rows])
+
+    def template(self, since: Optional[datetime]) -> Optional[MessageTemplate]:
+        """``None`` if nothing is new since ``since``"""
+        count = len(self._created) - bisect.bisect_right(self._created, since or EPOCH)
+        if count == 0:
+            return None
+        template = self._templates.get(count)
+        if template is None:
+            # Delivery threads ask for the same prefixes at once; encode each one once
+            with self._lock:
+                template = self._templates.get(count)
+                if template is None:
+                    posts = self.posts[:count]
+                    template = self._templates[count] = newsletter_template(
+                        self.subject,
+                        build_digest_body(self.introduction, posts),
+                        build_digest_html(self.introduction, posts),
+                    )
+        return template
+
+
+class NewsletterScheduler:
+    """Background thread that starts due newsletter jobs and sends them in rate-limited batches"""
+
+    def __init__(self, pool=None, workers: int = SMTP_POOL_SIZE, session_factory=SessionLocal,
+                 poll_interval: float = NEWSLETTER_POLL_INTERVAL, batch_size: int = NEWSLETTER_BATCH_SIZE,
+                 rate_limit: int = NEWSLETTER_RATE_LIMIT, rate_window: float = NEWSLETTER_RATE_WINDOW,
+                 sender: str = DOMAIN_SENDER, digest_interval_hours: float = NEWSLETTER_DIGEST_INTERVAL_HOURS):
+        self.pool = pool
+        self.workers = max(1, workers)
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.sender = sender
+        self.digest_interval = timedelta(hours=digest_interval_hours) if digest_interval_hours > 0 else None
+        self.worker_id = str(uuid.uuid4())
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="newsletter")
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pruned_at = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="newsletter-scheduler", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Look for due jobs now, e.g. after one was scheduled for immediate sending"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                ran = self.run_once()
+            except Exception:
+                logger.exception("Newsletter scheduler error")
+                ran = False
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_once(self) -> bool:
+        """Claim one due job and send it to the end (or until stopped); returns whether there was one"""
+        if time.monotonic() - self._pruned_at > PRUNE_INTERVAL:
+            self._prune()
+        if self.digest_interval is not None:
+            self._schedule_digest()
+        job = self._claim()
+        if job is None:
+            return False
+        self._send_job(job)
+        return True
+
+    # ------------------- Claiming -------------------
+
+    def _claim(self) -> Optional[dict]:
+        now = datetime.utcnow()
+        other_running = (
+            select(NewsletterJobModel.id)
+            .where(NewsletterJobModel.status == RUNNING, NewsletterJobModel.lease_until >= now)
+            .exists()
+        )
+        due = (
+            select(NewsletterJobModel.id)
+            .where(
+                NewsletterJobModel.status.in_((SCHEDULED, RUNNING)),
+                NewsletterJobModel.send_at <= now,
+                or_(NewsletterJobModel.lease_until.is_(None), NewsletterJobModel.lease_until < now),
+            )
+            .order_by(NewsletterJobModel.send_at)
+            .limit(1)
+            .scalar_subquery()
+        )
+        db = self.session_factory()
+        try:
+            # One statement, so two workers can't both see "nothing running" and start a job each
+            row = db.execute(
+                update(NewsletterJobModel)
+                .where(NewsletterJobModel.id == due, ~other_running)
+                .values(
+                    status=RUNNING,
+                    lease_until=now + timedelta(seconds=NEWSLETTER_LEASE_SECONDS),
+                    claimed_by=self.worker_id,
+                    started_at=func.coalesce(NewsletterJobModel.started_at, now),
+                )
+                .returning(
+                    NewsletterJobModel.id,
+                    NewsletterJobModel.kind,
+                    NewsletterJobModel.subject,
+                    NewsletterJobModel.message,
+                    NewsletterJobModel.html,
+                    NewsletterJobModel.audience,
+                    NewsletterJobModel.total,
+                    NewsletterJobModel.digest_until,
+                )
+            ).mappings().first()
+            db.commit()
+            return dict(row) if row is not None else None
+        finally:
+            db.close()
+
+    def _renew_lease(self, db, job_id: str, extra: float = 0.0) -> bool:
+        """False once the job was cancelled or taken over"""
+        result = db.execute(
+            update(NewsletterJobModel)
+            .where(
+                NewsletterJobModel.id == job_id,
+                NewsletterJobModel.status == RUNNING,
+                NewsletterJobModel.claimed_by == self.worker_id,
+            )
+            .values(lease_until=datetime.utcnow() + timedelta(seconds=NEWSLETTER_LEASE_SECONDS + extra))
+        )
+        return result.rowcount == 1
+
+    def _snapshot_recipients(self, job: dict):
+        """Copy the audience into the job on its first start; a resumed job keeps its list"""
+        audience = json.loads(job["audience"]) if job["audience"] else None
+        db = self.session_factory()
+        try:
+            columns = ["job_id", "email", "status", "attempts", "since"]
+            if job["kind"] == DIGEST:
+                job["digest_until"] = db.scalar(select(func.max(PostModel.createdAt))) or EPOCH
+                since = func.coalesce(DigestCursorModel.last_post_at, SubscriberModel.subscribed_at, EPOCH)
+                recipients = (
+                    select_recipients(
+                        literal(job["id"]), SubscriberModel.email, literal(PENDING), literal(0), since,
+                        audience=audience,
+                    )
+                    .outerjoin(DigestCursorModel, DigestCursorModel.email == SubscriberModel.email)
+                    # Subscribers with nothing new get no mail
+                    .where(since < job["digest_until"])
+                )
+            else:
+                recipients = select_recipients(
+                    literal(job["id"]), SubscriberModel.email, literal(PENDING), literal(0), literal(None),
+                    audience=audience,
+                )
+            db.execute(insert(NewsletterDeliveryModel).from_select(columns, recipients))
+            total = db.scalar(select(func.count()).where(NewsletterDeliveryModel.job_id == job["id"]))
+            db.execute(
+                update(NewsletterJobModel)
+                .where(NewsletterJobModel.id == job["id"])
+                .values(total=total, digest_until=job["digest_until"])
+            )
+            db.commit()
+            job["total"] = total
+        finally:
+            db.close()
+        logger.info("Newsletter job started", extra={"job_id": job["id"], "kind": job["kind"], "recipients": total})
+
+    # ------------------- Sending -------------------
+
+    def _send_job(self, job: dict):
+        if job["total"] is None:
+            self._snapshot_recipients(job)
+        if job["kind"] == DIGEST:
+            db = self.session_factory()
+            try:
+                template_for = DigestRenderer.load(db, job["subject"], job["message"], job["digest_until"]).template
+            finally:
+                db.close()
+        else:
+            # Encoded once here; each delivery only adds its recipient
+            template = newsletter_template(job["subject"], job["message"], job["html"])
+            template_for = lambda since: template
+
+        # Each pass walks the pending recipients once; transient failures wait for the next pass
+        attempt = self._first_attempt(job["id"])
+        while attempt <= NEWSLETTER_MAX_ATTEMPTS:
+            after = ""
+            while True:
+                if self._stopping.is_set():
+                    self._release(job["id"])
+                    return
+                budget = self._wait_for_budget(job["id"])
+                if not budget:
+                    self._release(job["id"])
+                    return
+                batch = self._next_batch(job["id"], attempt, after, budget)
+                if not batch:
+                    break
+                after = batch[-1]["email"]
+                results = list(self._executor.map(lambda row: self._deliver(job, template_for, row), batch))
+                if not self._record(job, results):
+                    logger.info("Newsletter job stopped", extra={"job_id": job["id"]})
+                    return
+            if not self._has_pending(job["id"]):
+                break
+            attempt += 1
+            delay = retry_delay(attempt - 1)
+            db = self.session_factory()
+            try:
+                alive = self._renew_lease(db, job["id"], extra=delay)
+                db.commit()
+            finally:
+                db.close()
+            if not alive or self._stopping.wait(delay):
+                self._release(job["id"])
+                return
+        self._finish(job["id"])
+
+    def _first_attempt(self, job_id: str) -> int:
+        db = self.session_factory()
+        try:
+            attempts = db.scalar(
+                select(func.min(NewsletterDeliveryModel.attempts))
+                .where(NewsletterDeliveryModel.job_id == job_id, NewsletterDeliveryModel.status == PENDING)
+            )
+            return (attempts or 0) + 1
+        finally:
+            db.close()
+
+    def _next_batch(self, job_id: str, attempt: int, after: str, limit: int) -> List[dict]:
+        db = self.session_factory()
+        try:
+            # Keyset over the primary key, so each batch starts where the last one ended
+            return [dict(row) for row in db.execute(
+                select(NewsletterDeliveryModel.email, NewsletterDeliveryModel.attempts, NewsletterDeliveryModel.since)
+                .where(
+                    NewsletterDeliveryModel.job_id == job_id,
+                    NewsletterDeliveryModel.email > after,
+                    NewsletterDeliveryModel.status == PENDING,
+                    NewsletterDeliveryModel.attempts < attempt,
+                )
+                .order_by(NewsletterDeliveryModel.email)
+                .limit(limit)
+            ).mappings()]
+        finally:
+            db.close()
+
+    def _has_pending(self, job_id: str) -> bool:
+        db = self.session_factory()
+        try:
+            return db.scalar(
+                select(NewsletterDeliveryModel.email)
+                .where(NewsletterDeliveryModel.job_id == job_id, NewsletterDeliveryModel.status == PENDING)
+                .limit(1)
+            ) is not None
+        finally:
+            db.close()
+
+    def _wait_for_budget(self, job_id: str) -> int:
+        """Size allowed for the next batch, waiting while the rate window is full; 0 if the job should stop"""
+        if self.rate_limit <= 0:
+            return self.batch_size
+        while True:
+            db = self.session_factory()
+            try:
+                window_start = datetime.utcnow() - timedelta(seconds=self.rate_window)
+                # Every worker records its sends here, so this is the budget shared between them
+                recent, oldest = db.execute(
+                    select(func.count(), func.min(NewsletterDeliveryModel.sent_at))
+                    .where(NewsletterDeliveryModel.sent_at >= window_start)
+                ).one()
+                if recent < self.rate_limit:
+                    return min(self.batch_size, self.rate_limit - recent)
+                # Room opens up when the oldest send in the window leaves it
+                wait = max((oldest - window_start).total_seconds(), 0.0)
+                alive = self._renew_lease(db, job_id, extra=wait)
+                db.commit()
+            finally:
+                db.close()
+            if not alive or self._stopping.wait(wait):
+                return 0
+
+    def _deliver(self, job: dict, template_for: Callable[[Optional[datetime]], Optional[MessageTemplate]],
+                 row: dict) -> dict:
+        result = {"email": row["email"], "attempts": row["attempts"] + 1, "status": SENT, "error": None}
+        template = template_for(row["since"])
+        if template is None:
+            # The posts were deleted after the job started
+            result["status"] = FAILED
+            result["error"] = "No new posts"
+            return result
+        try:
+            text = template.render(row["email"])
+            (self.pool or get_smtp_pool()).send(self.sender, row["email"], text, kind="newsletter")
+        except Exception as e:
+            permanent = is_permanent_failure(e) or result["attempts"] >= NEWSLETTER_MAX_ATTEMPTS
+            logger.warning("Failed to send newsletter: %s", e, extra={"job_id": job["id"], "recipient": row["email"]})
+            result["status"] = FAILED if permanent else PENDING
+            result["error"] = str(e)
+        return result
+
+    def _record(self, job: dict, results: List[dict]) -> bool:
+        """Save a batch's outcomes and the job's counters in one transaction; False if the job should stop"""
+        now = datetime.utcnow()
+        sent = [result["email"] for result in results if result["status"] == SENT]
+        failed = sum(1 for result in results if result["status"] == FAILED)
+        db = self.session_factory()
+        try:
+            db.connection().execute(
+                update(NewsletterDeliveryModel.__table__)
+                .where(
+                    NewsletterDeliveryModel.job_id == job["id"],
+                    NewsletterDeliveryModel.email == bindparam("b_email"),
+                )
+                .values(
+                    status=bindparam("b_status"),
+                    attempts=bindparam("b_attempts"),
+                    last_error=bindparam("b_error"),
+                    sent_at=bindparam("b_sent_at"),
+                ),
+                [
+                    {
+                        "b_email": result["email"],
+                        "b_status": result["status"],
+                        "b_attempts": result["attempts"],
+                        "b_error": result["error"],
+                        "b_sent_at": now if result["status"] == SENT else None,
+                    }
+                    for result in results
+                ],
+            )
+            if job["kind"] == DIGEST and sent:
+                statement = sqlite_insert(DigestCursorModel)
+                db.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=["email"],
+                        set_={"last_post_at": statement.excluded.last_post_at, "delivered_at": now},
+                    ),
+                    [{"email": email, "last_post_at": job["digest_until"], "delivered_at": now} for email in sent],
+                )
+            db.execute(
+                update(NewsletterJobModel)
+                .where(NewsletterJobModel.id == job["id"])
+                .values(sent=NewsletterJobModel.sent + len(sent), failed=NewsletterJobModel.failed + failed)
+            )
+            alive = self._renew_lease(db, job["id"])
+            db.commit()
+            return alive
+        finally:
+            db.close()
+
+    def _finish(self, job_id: str):
+        db = self.session_factory()
+        try:
+            job = db.execute(
+                update(NewsletterJobModel)
+                .where(NewsletterJobModel.id == job_id, NewsletterJobModel.status == RUNNING)
+                .values(status=COMPLETED, finished_at=datetime.utcnow(), lease_until=None)
+                .returning(NewsletterJobModel.sent, NewsletterJobModel.failed)
+            ).first()
+            db.commit()
+        finally:
+            db.close()
+        if job is not None:
+            logger.info("Newsletter job finished", extra={"job_id": job_id, "sent": job.sent, "failed": job.failed})
+
+    def _release(self, job_id: str):
+        """Give the job up on shutdown so the next worker can resume it without waiting for the lease"""
+        db = self.session_factory()
+        try:
+            db.execute(
+                update(NewsletterJobModel)
+                .where(NewsletterJobModel.id == job_id, NewsletterJobModel.claimed_by == self.worker_id)
+                .values(lease_until=None)
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    # ------------------- Housekeeping -------------------
+
+    def _schedule_digest(self):
+        """Keep one digest scheduled, ``digest_interval`` after the previous one"""
+        open_digest = (
+            select(NewsletterJobModel.id)
+            .where(NewsletterJobModel.kind == DIGEST, NewsletterJobModel.status.in_((SCHEDULED, RUNNING)))
+            .exists()
+        )
+        db = self.session_factory()
+        try:
+            if db.scalar(select(open_digest)):
+                return
+            last = db.scalar(
+                select(func.max(NewsletterJobModel.send_at))
+                .where(NewsletterJobModel.kind == DIGEST, NewsletterJobModel.status != CANCELLED)
+            )
+            send_at = max(last + self.digest_interval, datetime.utcnow()) if last else datetime.utcnow()
+            # Conditional in one statement, so workers racing here add a single job
+            db.execute(
+                insert(NewsletterJobModel).from_select(
+                    ["id", "kind", "subject", "message", "status", "send_at", "sent", "failed", "created_at"],
+                    select(
+                        literal(str(uuid.uuid4())), literal(DIGEST), literal(NEWSLETTER_DIGEST_SUBJECT), literal(""),
+                        literal(SCHEDULED), literal(send_at), literal(0), literal(0), literal(datetime.utcnow()),
+                    ).where(~open_digest),
+                )
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _prune(self):
+        cutoff = datetime.utcnow() - timedelta(days=NEWSLETTER_RETENTION_DAYS)
+        finished = (
+            select(NewsletterJobModel.id)
+            .where(NewsletterJobModel.status.in_((COMPLETED, CANCELLED)), NewsletterJobModel.finished_at < cutoff)
+        )
+        db = self.session_factory()
+        try:
+            db.execute(delete(NewsletterDeliveryModel).where(NewsletterDeliveryModel.job_id.in_(finished)))
+            db.commit()
+        finally:
+            db.close()
+        self._pruned_at = time.monotonic()
+
+    def shutdown(self):
+        """Stop after the batch in flight; the job stays running and is resumed on the next start"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def start_newsletter_scheduler():
+    """Start this process's scheduler; without SMTP credentials jobs just stay scheduled"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            return
+        if not EMAIL_PASSWORD:
+            logger.warning("EMAIL_PASSWORD is not set; newsletter jobs will be scheduled but not sent")
+            return
+        _scheduler = NewsletterScheduler()
+        _scheduler.start()
+
+
+def notify_newsletter_scheduler():
+    if _scheduler is not None:
+        _scheduler.notify()
+
+
+def shutdown_newsletter_scheduler():
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.shutdown()
+            _scheduler = None
@@ -0,0 +1,291 @@
+
+"""Durable outbox for transactional emails (contact form, welcome mail).
+
+Request handlers only insert a rendered message into ``email_outbox`` and
+return; ``OutboxDispatcher`` drains due rows in a background thread over the
+shared SMTP pool. Failures are retried with exponential backoff and moved to
+``dead`` after ``OUTBOX_MAX_ATTEMPTS`` or on a permanent (5xx) rejection.
+Every uvicorn worker runs a dispatcher; rows are claimed with a conditional
+UPDATE so each message is sent by one of them.
+"""
+
+import logging
+import random
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import (
+    DOMAIN_SENDER,
+    EMAIL_PASSWORD,
+    SMTP_POOL_SIZE,
+    OUTBOX_POLL_INTERVAL,
+    OUTBOX_BATCH_SIZE,
+    OUTBOX_MAX_ATTEMPTS,
+    OUTBOX_RETRY_BASE,
+    OUTBOX_RETRY_MAX,
+    OUTBOX_LEASE_SECONDS,
+    OUTBOX_RETENTION_DAYS,
+)
+from app.database.base import SessionLocal
+from app.models.outbox import OutboxMessageModel
+from app.utils.smtp_pool import get_smtp_pool
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+SENT = "sent"
+DEAD = "dead"
+
+# Sent rows older than the retention period are deleted at most this often
+PRUNE_INTERVAL = 3600
+
+
+def enqueue_email(db: AsyncSession, kind: str, recipient: str, message: str,
+                  sender: Optional[str] = DOMAIN_SENDER) -> OutboxMessageModel:
+    """Add a rendered message to the outbox; it is queued when the caller commits"""
+    row = OutboxMessageModel(
+        id=str(uuid.uuid4()),
+        kind=kind,
+        sender=sender,
+        recipient=recipient,
+        message=message,
+        status=PENDING,
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+        created_at=datetime.utcnow(),
+    )
+    db.add(row)
+    return row
+
+
+def retry_delay(attempts: int) -> float:
+    """Exponential backoff with a little jitter so retries don't arrive together"""
+    delay = min(OUTBOX_RETRY_BASE * 2 ** max(0, attempts - 1), OUTBOX_RETRY_MAX)
+    return delay * random.uniform(1.0, 1.1)
+
+
+def is_permanent_failure(exc: Exception) -> bool:
+    """5xx replies won't succeed on retry (bad address, rejected content)"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(500 <= code < 600 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        # A failed login is a configuration problem that may be fixed before the retries run out
+        return 500 <= exc.smtp_code < 600 and not isinstance(exc, smtplib.SMTPAuthenticationError)
+    return False
+
+
+class OutboxDispatcher:
+    """Background thread that delivers due outbox messages"""
+
+    def __init__(self, pool=None, workers: int = SMTP_POOL_SIZE, session_factory=SessionLocal,
+                 poll_interval: float = OUTBOX_POLL_INTERVAL, batch_size: int = OUTBOX_BATCH_SIZE):
+        self.pool = pool
+        self.workers = max(1, workers)
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.sent = 0
+        self.failed = 0
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="outbox")
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pruned_at = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="outbox-dispatcher", daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        """Wake the dispatcher after a commit instead of waiting for the next poll"""
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                delivered = self.run_once()
+            except Exception:
+                logger.exception("Outbox dispatcher error")
+                delivered = 0
+            if delivered < self.batch_size:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_once(self) -> int:
+        """Claim and deliver one batch of due messages; returns how many were claimed"""
+        if time.monotonic() - self._pruned_at > PRUNE_INTERVAL:
+            self._prune()
+        claimed = self._claim()
+        if claimed:
+            list(self._executor.map(self._deliver, claimed))
+        return len(claimed)
+
+    def _claim(self) -> List[dict]:
+        now = datetime.utcnow()
+        lease = now + timedelta(seconds=OUTBOX_LEASE_SECONDS)
+        db = self.session_factory()
+        try:
+            due = db.execute(
+                select(OutboxMessageModel.id)
+                .where(OutboxMessageModel.status == PENDING, OutboxMessageModel.next_attempt_at <= now)
+                .order_by(OutboxMessageModel.next_attempt_at)
+                .limit(self.batch_size)
+            ).scalars().all()
+            claimed = []
+            for message_id in due:
+                # Loses quietly if another worker claimed the row in between
+                row = db.execute(
+                    update(OutboxMessageModel)
+                    .where(
+                        OutboxMessageModel.id == message_id,
+                        OutboxMessageModel.status == PENDING,
+                        OutboxMessageModel.next_attempt_at <= now,
+                    )
+                    .values(next_attempt_at=lease, attempts=OutboxMessageModel.attempts + 1)
+                    .returning(
+                        OutboxMessageModel.id,
+                        OutboxMessageModel.kind,
+                        OutboxMessageModel.sender,
+                        OutboxMessageModel.recipient,
+                        OutboxMessageModel.message,
+                        OutboxMessageModel.attempts,
+                    )
+                ).mappings().first()
+                if row is not None:
+                    claimed.append(dict(row))
+            db.commit()
+            return claimed
+        finally:
+            db.close()
+
+    def _deliver(self, message: dict):
+        pool = self.pool or get_smtp_pool()
+        try:
+            pool.send(message["sender"] or DOMAIN_SENDER, message["recipient"], message["message"],
+                      kind=message["kind"])
+        except Exception as e:
+            self.failed += 1
+            self._record_failure(message, e)
+        else:
+            self.sent += 1
+            self._update(message["id"], status=SENT, sent_at=datetime.utcnow(), last_error=None)
+
+    def _record_failure(self, message: dict, error: Exception):
+        if is_permanent_failure(error) or message["attempts"] >= OUTBOX_MAX_ATTEMPTS:
+            logger.error("Outbox message dead-lettered: %s", error,
+                         extra={"message_id": message["id"], "recipient": message["recipient"]})
+            self._update(message["id"], status=DEAD, last_error=str(error))
+            return
+        delay = retry_delay(message["attempts"])
+        logger.warning("Outbox message failed, retrying in %.0fs: %s", delay, error,
+                       extra={"message_id": message["id"], "recipient": message["recipient"]})
+        self._update(
+            message["id"],
+            next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+            last_error=str(error),
+        )
+
+    def _update(self, message_id: str, **values):
+        db = self.session_factory()
+        try:
+            db.execute(update(OutboxMessageModel).where(OutboxMessageModel.id == message_id).values(**values))
+            db.commit()
+        finally:
+            db.close()
+
+    def _prune(self):
+        cutoff = datetime.utcnow() - timedelta(days=OUTBOX_RETENTION_DAYS)
+        db = self.session_factory()
+        try:
+            db.execute(
+                delete(OutboxMessageModel)
+                .where(OutboxMessageModel.status == SENT, OutboxMessageModel.sent_at < cutoff)
+            )
+            db.commit()
+        finally:
+            db.close()
+        self._pruned_at = time.monotonic()
+
+    def shutdown(self):
+        """Finish the batch in flight; undelivered rows stay queued for the next start"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._executor.shutdown(wait=True)
+
+
+async def outbox_summary(db: AsyncSession, dead_limit: int = 50) -> dict:
+    """Message counts by status and the most recent dead letters"""
+    counts = dict((await db.execute(
+        select(OutboxMessageModel.status, func.count()).group_by(OutboxMessageModel.status)
+    )).all())
+    dead = await db.execute(
+        select(
+            OutboxMessageModel.id,
+            OutboxMessageModel.kind,
+            OutboxMessageModel.recipient,
+            OutboxMessageModel.attempts,
+            OutboxMessageModel.last_error,
+            OutboxMessageModel.created_at,
+        )
+        .where(OutboxMessageModel.status == DEAD)
+        .order_by(OutboxMessageModel.created_at.desc())
+        .limit(dead_limit)
+    )
+    return {
+        "pending": counts.get(PENDING, 0),
+        "sent": counts.get(SENT, 0),
+        "dead": counts.get(DEAD, 0),
+        "dead_letters": [dict(row) for row in dead.mappings()],
+    }
+
+
+async def requeue_message(db: AsyncSession, message_id: str) -> bool:
+    """Give a dead-lettered message a fresh set of attempts"""
+    result = await db.execute(
+        update(OutboxMessageModel)
+        .where(OutboxMessageModel.id == message_id, OutboxMessageModel.status == DEAD)
+        .values(status=PENDING, attempts=0, next_attempt_at=datetime.utcnow())
+    )
+    await db.commit()
+    return result.rowcount == 1
+
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def start_outbox_dispatcher():
+    """Start this process's dispatcher; without SMTP credentials messages just stay queued"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            return
+        if not EMAIL_PASSWORD:
+            logger.warning("EMAIL_PASSWORD is not set; outbox messages will be queued but not sent")
+            return
+        _dispatcher = OutboxDispatcher()
+        _dispatcher.start()
+
+
+def notify_outbox():
+    """Ask the dispatcher to look for new messages now"""
+    if _dispatcher is not None:
+        _dispatcher.notify()
+
+
+def shutdown_outbox_dispatcher():
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is not None:
+            _dispatcher.shutdown()
+            _dispatcher = None
@@ -0,0 +1,118 @@
+
+import base64
+import json
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.post import PostModel
+from app.utils.html_text import plain_text
+
+# Fields a client may ask for with ``fields=``; ``excerpt`` is the text of ``content`` cut to
+# EXCERPT_LENGTH characters and comes with a ``truncated`` flag
+POST_FIELDS = ("title", "content", "excerpt", "author", "imageUrl", "id", "createdAt")
+SUMMARY_FIELDS = ("title", "excerpt", "author", "imageUrl", "id", "createdAt")
+EXCERPT_LENGTH = 280
+# Bodies are HTML, so a page reads this much of each to find EXCERPT_LENGTH characters of text
+EXCERPT_SOURCE_LENGTH = EXCERPT_LENGTH * 8
+DEFAULT_PAGE_SIZE = 20
+
+
+def encode_cursor(created_at: str, post_id: str) -> str:
+    """Opaque cursor pointing just past the given post"""
+    raw = json.dumps([created_at, post_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, post_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(post_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_fields(fields: Optional[str], summary: bool) -> Tuple[str, ...]:
+    """Validate a ``fields=`` projection, keeping the public field order"""
+    if not fields:
+        return SUMMARY_FIELDS if summary else tuple(f for f in POST_FIELDS if f != "excerpt")
+    requested = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = requested - set(POST_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(f for f in POST_FIELDS if f in requested)
+
+
+def summarize(content: str) -> Tuple[str, bool]:
+    """The text of a post body cut to EXCERPT_LENGTH, and whether anything was cut"""
+    text = plain_text(content)
+    if len(text) <= EXCERPT_LENGTH:
+        return text, False
+    return text[:EXCERPT_LENGTH].rstrip() + "…", True
+
+
+def excerpt(content: str) -> str:
+    return summarize(content)[0]
+
+
+# Fields whose stored value is converted before it is sent
+FORMATTERS = {"createdAt": datetime.isoformat}
+
+
+async def page_excerpts(db: AsyncSession, rows) -> List[Tuple[str, bool]]:
+    """Excerpts from the body prefixes read with a page; a body whose prefix is mostly markup is read whole"""
+    excerpts = [summarize(row.excerpt) for row in rows]
+    short = {
+        row.id: index for index, row in enumerate(rows)
+        if row.contentLength > EXCERPT_SOURCE_LENGTH and not excerpts[index][1]
+    }
+    if short:
+        result = await db.execute(select(PostModel.id, PostModel.content).where(PostModel.id.in_(short)))
+        for post_id, content in result.all():
+            excerpts[short[post_id]] = summarize(content)
+    return excerpts
+
+
+async def fetch_post_page(db: AsyncSession, limit: int, cursor: Optional[str], fields: Tuple[str, ...]) -> Tuple[List[dict], Optional[str]]:
+    """Keyset page over ``(createdAt, id)`` newest first, served by ``ix_posts_createdAt_id``"""
+    columns = [PostModel.createdAt, PostModel.id]
+    position = {"createdAt": 0, "id": 1}
+    for field in fields:
+        if field in position:
+            continue
+        position[field] = len(columns)
+        if field == "excerpt":
+            # Only read enough of the body for the excerpt, and its length to know whether that was all of it
+            columns.append(func.substr(PostModel.content, 1, EXCERPT_SOURCE_LENGTH).label("excerpt"))
+            columns.append(func.length(PostModel.content).label("contentLength"))
+        else:
+            columns.append(getattr(PostModel, field))
+
+    query = select(*columns)
+    if cursor:
+        created_at, post_id = decode_cursor(cursor)
+        query = query.where(tuple_(PostModel.createdAt, PostModel.id) < tuple_(created_at, post_id))
+    result = await db.execute(query.order_by(PostModel.createdAt.desc(), PostModel.id.desc()).limit(limit + 1))
+    rows = result.all()
+    page = rows[:limit]
+
+    # Resolved once per page, so each row is read by position
+    readers = [(field, position[field], FORMATTERS.get(field)) for field in fields]
+    items = [
+        {field: format_value(row[index]) if format_value else row[index] for field, index, format_value in readers}
+        for row in page
+    ]
+    if "excerpt" in position:
+        for item, (text, truncated) in zip(items, await page_excerpts(db, page)):
+            item["excerpt"] = text
+            item["truncated"] = truncated
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = encode_cursor(last.createdAt.isoformat(), last.id)
+    return items, next_cursor
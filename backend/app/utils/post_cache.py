@@ -0,0 +1,172 @@
+
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import POST_CACHE_CHECK_INTERVAL
+from app.database.base import AsyncSessionLocal
+from app.models.cache_version import CacheVersionModel
+from app.models.post import PostModel
+from app.utils.fast_json import dumps
+
+POSTS_CACHE_NAME = "posts"
+
+# Distinct search/page responses remembered per snapshot
+MAX_CACHED_RESPONSES = 256
+
+
+def encode_json(data) -> bytes:
+    """Encode exactly like FastAPI's JSONResponse"""
+    return dumps(data)
+
+
+# The public ``Post`` fields, read as plain columns so no ORM objects are built
+POST_COLUMNS = (PostModel.title, PostModel.content, PostModel.author, PostModel.imageUrl, PostModel.id, PostModel.createdAt)
+
+
+def post_dict(title, content, author, imageUrl, id, createdAt) -> dict:
+    """The public ``Post`` shape from the values of ``POST_COLUMNS``"""
+    return {
+        "title": title,
+        "content": content,
+        "author": author,
+        "imageUrl": imageUrl,
+        "id": id,
+        "createdAt": createdAt.isoformat(),
+    }
+
+
+def post_to_dict(post: PostModel) -> dict:
+    """Map an ORM row to the public ``Post`` shape"""
+    return post_dict(post.title, post.content, post.author, post.imageUrl, post.id, post.createdAt)
+
+
+async def load_posts(limit: Optional[int] = None) -> list:
+    """Newest-first posts as dicts, in the same order as the paginated API"""
+    query = select(*POST_COLUMNS).order_by(PostModel.createdAt.desc(), PostModel.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(query)
+        return [post_dict(*row) for row in result]
+
+
+async def load_post(post_id: str) -> Optional[dict]:
+    """One post in the public ``Post`` shape, or ``None``"""
+    async with AsyncSessionLocal() as db:
+        row = (await db.execute(select(*POST_COLUMNS).where(PostModel.id == post_id))).first()
+    return post_dict(*row) if row else None
+
+
+async def newest_post_time() -> Optional[datetime]:
+    """``createdAt`` of the newest post, used as the post set's Last-Modified"""
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.max(PostModel.createdAt)))
+
+
+def version_bump_statements(name: str = POSTS_CACHE_NAME) -> list:
+    """Statements that mark a cached data set as changed; run them in the writing transaction"""
+    return [
+        sqlite_insert(CacheVersionModel).values(name=name, version=0).on_conflict_do_nothing(index_elements=["name"]),
+        update(CacheVersionModel)
+        .where(CacheVersionModel.name == name)
+        .values(version=CacheVersionModel.version + 1),
+    ]
+
+
+async def bump_posts_version(db: AsyncSession):
+    """Mark the post set as changed; call inside the writing transaction before commit"""
+    for statement in version_bump_statements():
+        await db.execute(statement)
+
+
+async def read_posts_version(db: AsyncSession) -> int:
+    version = await db.scalar(select(CacheVersionModel.version).where(CacheVersionModel.name == POSTS_CACHE_NAME))
+    return version or 0
+
+
+class PostSnapshot:
+    """Responses rendered for one version of the post set.
+
+    Fixed values (the full list, feeds, newest timestamp) are kept for the
+    life of the snapshot; parameterised ones (search, pages) go through a
+    bounded LRU. Concurrent misses for the same key share one render, so a
+    traffic spike after a new post costs one query per response.
+    """
+
+    def __init__(self, version: int):
+        self.version = version
+        self._rendered = {}
+        self._responses = OrderedDict()
+        self._inflight = {}
+
+    async def rendered(self, key, render):
+        """Memoise a fixed value (e.g. the RSS document) for this version"""
+        if key in self._rendered:
+            return self._rendered[key]
+        value = await self._render_once(("rendered", key), render)
+        self._rendered[key] = value
+        return value
+
+    async def memo(self, key, compute) -> bytes:
+        """Memoise a parameterised response for this version in a bounded LRU"""
+        cached = self._responses.get(key)
+        if cached is not None:
+            self._responses.move_to_end(key)
+            return cached
+        body = await self._render_once(("memo", key), compute)
+        self._responses[key] = body
+        if len(self._responses) > MAX_CACHED_RESPONSES:
+            self._responses.popitem(last=False)
+        return body
+
+    async def _render_once(self, key, render):
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            return await asyncio.shield(inflight)
+        task = asyncio.ensure_future(render())
+        self._inflight[key] = task
+        task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so a disconnecting client doesn't cancel the render for everyone else
+        return await asyncio.shield(task)
+
+
+class PostCache:
+    """Per-worker cache of post responses, invalidated through a DB version counter.
+
+    Writes in this worker invalidate immediately; writes in other workers are
+    noticed within ``check_interval`` seconds. Between checks reads never
+    touch SQLite.
+    """
+
+    def __init__(self, check_interval: float = POST_CACHE_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._snapshot: Optional[PostSnapshot] = None
+        self._checked_at = 0.0
+
+    def invalidate(self):
+        self._snapshot = None
+
+    async def get(self) -> PostSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+            return snapshot
+        # Responses are rendered after this read, so a concurrent write
+        # can only make a snapshot fresher than its label, never staler
+        async with AsyncSessionLocal() as db:
+            version = await read_posts_version(db)
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.version != version:
+            snapshot = PostSnapshot(version)
+            self._snapshot = snapshot
+        self._checked_at = time.monotonic()
+        return snapshot
+
+
+post_cache = PostCache()
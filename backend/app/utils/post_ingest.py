@@ -0,0 +1,78 @@
+"""Batch post ingestion with idempotent retries.
+
+An item's ``sourceId`` is its upstream id; items without one inherit
+``<Idempotency-Key>:<index>`` when the request carries that header.
+``posts.sourceId`` is uniquely indexed, so an item whose source id is
+already stored (or repeated earlier in the same batch) comes back as
+``duplicate`` with the existing post's id and nothing is written for it. A
+retried upload therefore costs one indexed lookup per item.
+"""
+
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.batch import MAX_IN_LIST, chunked, insert_many
+from app.models.post import PostModel
+from app.schemas.post import PostBatchItem
+
+CREATED = "created"
+DUPLICATE = "duplicate"
+
+
+async def ids_by_source(db: AsyncSession, source_ids: Iterable[str]) -> Dict[str, str]:
+    """Stored post id for each of ``source_ids`` that exists"""
+    found = {}
+    for chunk in chunked(set(source_ids), MAX_IN_LIST):
+        rows = await db.execute(select(PostModel.sourceId, PostModel.id).where(PostModel.sourceId.in_(chunk)))
+        found.update(rows.all())
+    return found
+
+
+def source_id_for(item: PostBatchItem, index: int, idempotency_key: Optional[str]) -> Optional[str]:
+    if item.sourceId:
+        return item.sourceId
+    return f"{idempotency_key}:{index}" if idempotency_key else None
+
+
+async def ingest_posts(db: AsyncSession, items: List[PostBatchItem],
+                       idempotency_key: Optional[str] = None) -> Tuple[List[dict], List[dict]]:
+    """Insert the new posts of a batch; the caller commits.
+
+    Returns one result per item, in request order, and the rows that were
+    actually created (for signals and caches).
+    """
+    source_ids = [source_id_for(item, index, idempotency_key) for index, item in enumerate(items)]
+    known = await ids_by_source(db, [source_id for source_id in source_ids if source_id])
+    now = datetime.utcnow()
+    results, rows = [], []
+    for index, (item, source_id) in enumerate(zip(items, source_ids)):
+        if source_id in known:
+            results.append({"index": index, "id": known[source_id], "sourceId": source_id, "status": DUPLICATE})
+            continue
+        post_id = str(uuid.uuid4())
+        if source_id:
+            known[source_id] = post_id
+        rows.append({
+            "id": post_id,
+            "title": item.title,
+            "content": item.content,
+            "author": item.author,
+            "createdAt": now,
+            "imageUrl": item.imageUrl,
+            "sourceId": source_id,
+        })
+        results.append({"index": index, "id": post_id, "sourceId": source_id, "status": CREATED})
+
+    if rows and await insert_many(db, PostModel, rows) < len(rows):
+        # A concurrent request stored some of the same source ids between the lookup and the insert
+        stored = await ids_by_source(db, [row["sourceId"] for row in rows if row["sourceId"]])
+        lost = {row["id"] for row in rows if row["sourceId"] and stored[row["sourceId"]] != row["id"]}
+        rows = [row for row in rows if row["id"] not in lost]
+        for result in results:
+            if result["id"] in lost:
+                result.update(id=stored[result["sourceId"]], status=DUPLICATE)
+    return results, rows
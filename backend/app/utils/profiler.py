@@ -0,0 +1,128 @@
+
+"""Opt-in sampling profiler for slow requests.
+
+With ``PROFILE_SLOW_REQUEST_MS`` set, a background thread records every
+thread's Python stack each ``PROFILE_SAMPLE_INTERVAL_MS`` into a short ring
+buffer. When a request takes longer than the threshold, the samples taken
+while it ran are written to ``DATA_DIR/profiles`` in collapsed-stack format
+(``thread;outer;...;inner count``), ready for flamegraph.pl or speedscope.
+Requests overlapping on the event loop share its samples, so a profile
+shows everything the worker was doing during the slow request, not only
+that request's own frames.
+"""
+
+import collections
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+
+from app.config import DATA_DIR, PROFILE_SLOW_REQUEST_MS, PROFILE_SAMPLE_INTERVAL_MS, PROFILE_MAX_FILES
+
+logger = logging.getLogger(__name__)
+
+PROFILES_DIR = os.path.join(DATA_DIR, "profiles")
+# Longest request whose samples are all kept (seconds)
+MAX_WINDOW = 60.0
+
+_UNSAFE_FILENAME = re.compile(r"[^A-Za-z0-9_.-]+")
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class SlowRequestProfiler:
+    def __init__(self, threshold_ms: float, interval_ms: float, max_files: int = PROFILE_MAX_FILES,
+                 directory: str = PROFILES_DIR):
+        self.threshold = threshold_ms / 1000
+        self.interval = max(interval_ms, 1.0) / 1000
+        self.max_files = max_files
+        self.directory = directory
+        self.written = 0
+        self._samples = collections.deque(maxlen=int(MAX_WINDOW / self.interval))
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            now = time.perf_counter()
+            stacks = [
+                f"{names.get(thread_id, thread_id)};{_collapse(frame)}"
+                for thread_id, frame in sys._current_frames().items()
+                if thread_id != own_id
+            ]
+            self._samples.append((now, stacks))
+
+    def request_finished(self, method: str, route: str, start: float, end: float):
+        """Called by the metrics middleware for every completed request"""
+        if end - start < self.threshold:
+            return
+        counts = collections.Counter()
+        for taken_at, stacks in list(self._samples):
+            if start <= taken_at <= end:
+                counts.update(stacks)
+        if not counts:
+            return
+        try:
+            self._write(method, route, end - start, counts)
+        except OSError as e:
+            logger.warning("Failed to write slow request profile: %s", e)
+
+    def _write(self, method: str, route: str, duration: float, counts: collections.Counter):
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        name = _UNSAFE_FILENAME.sub("_", f"{stamp}-{os.getpid()}-{method}{route}").strip("_")
+        path = os.path.join(self.directory, f"{name}-{duration * 1000:.0f}ms.collapsed")
+        with open(path, "w") as file:
+            file.writelines(f"{stack} {count}\n" for stack, count in counts.most_common())
+        self.written += 1
+        logger.info("Slow request %s %s took %.0f ms; profile written to %s", method, route, duration * 1000, path)
+        self._prune()
+
+    def _prune(self):
+        files = sorted(name for name in os.listdir(self.directory) if name.endswith(".collapsed"))
+        for name in files[:max(0, len(files) - self.max_files)]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+profiler = None
+
+
+def start_profiler():
+    """Start sampling if ``PROFILE_SLOW_REQUEST_MS`` is set"""
+    global profiler
+    if PROFILE_SLOW_REQUEST_MS > 0 and profiler is None:
+        profiler = SlowRequestProfiler(PROFILE_SLOW_REQUEST_MS, PROFILE_SAMPLE_INTERVAL_MS)
+        profiler.start()
+    return profiler
+
+
+def shutdown_profiler():
+    global profiler
+    if profiler is not None:
+        profiler.stop()
+        profiler = None
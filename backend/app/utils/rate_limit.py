@@ -0,0 +1,178 @@
+
+"""In-memory token buckets keyed by client, API key or address.
+
+Limits are per worker process: with N workers a client can get up to N
+times the configured rate in the worst case, which is acceptable for the
+abuse cases these guard against and needs no shared store. Each bucket is
+one ``(tokens, updated_at)`` tuple in an LRU-ordered dict, so memory is
+constant per active key and bounded overall.
+"""
+
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from app.config import RATE_LIMIT_IP_PER_MINUTE, RATE_LIMIT_EMAIL_PER_HOUR, RATE_LIMIT_MAX_KEYS
+
+# Buckets remembered per limiter; the least recently used are forgotten first
+DEFAULT_MAX_KEYS = 10000
+
+
+class TokenBucketLimiter:
+    """``rate`` tokens per second refill each key's bucket, up to ``burst``"""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = DEFAULT_MAX_KEYS):
+        self.rate = rate
+        self.burst = max(burst, 1.0)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def per_minute(cls, limit: float, max_keys: int = DEFAULT_MAX_KEYS) -> "TokenBucketLimiter":
+        """``limit`` requests a minute, all of which may arrive at once"""
+        return cls(limit / 60.0, limit, max_keys)
+
+    def acquire(self, key, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens; returns 0 if allowed, else seconds until it would be"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = self.burst
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                self._buckets.move_to_end(key)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / self.rate
+
+    def retry_after(self, key, cost: float = 1.0) -> float:
+        """Like ``acquire`` but without taking anything"""
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                return 0.0
+            tokens = min(self.burst, bucket[0] + (time.monotonic() - bucket[1]) * self.rate)
+        return max(0.0, (cost - tokens) / self.rate)
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+# Bodies larger than this are passed through without an email check
+MAX_INSPECTED_BODY = 64 * 1024
+
+# Rate-limited public write endpoints and the budget each one draws from
+PUBLIC_WRITE_ENDPOINTS = {
+    "/subscribe": "subscribe",
+    "/api/subscribe": "subscribe",
+    "/api/contact": "contact",
+    "/api/api/contact": "contact",
+}
+
+
+def _too_many_requests(retry_after: float):
+    body = json.dumps({"detail": "Too many requests. Please try again later."}).encode()
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+    ]
+    return headers, body
+
+
+def _body_email(body: bytes) -> Optional[str]:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return None
+    email = data.get("email") if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+class PublicWriteRateLimitMiddleware:
+    """Token buckets per client address and per submitted email on ``POST`` to the public write endpoints.
+
+    Other requests pass straight through after one dict lookup. For limited
+    endpoints the (small) JSON body is read once to find the email and then
+    replayed to the route unchanged.
+    """
+
+    def __init__(self, app, endpoints: Dict[str, str] = PUBLIC_WRITE_ENDPOINTS,
+                 ip_per_minute: float = RATE_LIMIT_IP_PER_MINUTE,
+                 email_per_hour: float = RATE_LIMIT_EMAIL_PER_HOUR,
+                 max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.app = app
+        self.endpoints = endpoints
+        self.by_ip = TokenBucketLimiter(ip_per_minute / 60.0, ip_per_minute, max_keys)
+        self.by_email = TokenBucketLimiter(email_per_hour / 3600.0, email_per_hour, max_keys)
+
+    async def __call__(self, scope, receive, send):
+        group = self.endpoints.get(scope["path"]) if scope["type"] == "http" else None
+        if group is None or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        client = scope["client"][0] if scope.get("client") else "unknown"
+        retry_after = self.by_ip.acquire((group, client))
+        if retry_after > 0:
+            await self._reject(send, retry_after)
+            return
+
+        if self.by_email.rate > 0:
+            messages, body, complete = await self._read_body(receive)
+            email = _body_email(body) if complete else None
+            if email is not None:
+                retry_after = self.by_email.acquire((group, email))
+                if retry_after > 0:
+                    await self._reject(send, retry_after)
+                    return
+            receive = self._replay(messages, receive)
+
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def _read_body(receive):
+        messages, chunks, size = [], [], 0
+        while True:
+            message = await receive()
+            messages.append(message)
+            if message["type"] != "http.request":
+                return messages, b"", False
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > MAX_INSPECTED_BODY:
+                return messages, b"", False
+            chunks.append(chunk)
+            if not message.get("more_body", False):
+                return messages, b"".join(chunks), True
+
+    @staticmethod
+    def _replay(messages: Iterable[dict], receive):
+        pending = list(messages)
+
+        async def replay_receive():
+            if pending:
+                return pending.pop(0)
+            return await receive()
+
+        return replay_receive
+
+    @staticmethod
+    async def _reject(send, retry_after: float):
+        headers, body = _too_many_requests(retry_after)
+        await send({"type": "http.response.start", "status": 429, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,138 @@
+"""Subscriber preferences, segments and the recipient queries built from them.
+
+A subscriber has a ``channel`` and a ``frequency`` on its own row and any
+number of segments in ``subscriber_segments``. Tickers of interest are
+segments named ``ticker:<symbol>``. An audience (segments and/or
+frequencies) resolves to a SELECT that starts from an index:
+``subscriber_segments``' primary key for segments,
+``ix_subscribers_channel_frequency_email`` otherwise. Jobs feed it to
+``INSERT ... SELECT``, so a recipient list never passes through Python.
+"""
+
+import re
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database.batch import insert_many
+from app.models.subscriber import SubscriberModel, SubscriberSegmentModel
+
+EMAIL = "email"
+RSS = "rss"
+CHANNELS = (EMAIL, RSS)
+FREQUENCIES = ("instant", "daily", "weekly")
+TICKER_PREFIX = "ticker:"
+
+# Keeps a single subscriber from creating unbounded rows
+MAX_SEGMENTS_PER_SUBSCRIBER = 50
+_SEGMENT_NAME = re.compile(r"[a-z0-9][a-z0-9:._-]{0,63}\Z")
+_TICKER = re.compile(r"[A-Z0-9.\-]{1,10}\Z")
+
+
+def normalize_segment(name: str) -> str:
+    segment = name.strip().lower()
+    if not _SEGMENT_NAME.match(segment):
+        raise ValueError(f"invalid segment: {name[:70]}")
+    return segment
+
+
+def ticker_segment(ticker: str) -> str:
+    symbol = ticker.strip().lstrip("$").upper()
+    if not _TICKER.match(symbol):
+        raise ValueError(f"invalid ticker: {ticker[:20]}")
+    return TICKER_PREFIX + symbol.lower()
+
+
+def normalize_segments(segments: Iterable[str] = (), tickers: Iterable[str] = ()) -> List[str]:
+    """Validated, de-duplicated segment names, tickers included"""
+    names = {normalize_segment(name) for name in segments}
+    names.update(ticker_segment(ticker) for ticker in tickers)
+    if len(names) > MAX_SEGMENTS_PER_SUBSCRIBER:
+        raise ValueError(f"at most {MAX_SEGMENTS_PER_SUBSCRIBER} segments and tickers per subscriber")
+    return sorted(names)
+
+
+def validate_choice(value: Optional[str], allowed: tuple, label: str) -> Optional[str]:
+    if value is None:
+        return None
+    value = value.strip().lower()
+    if value not in allowed:
+        raise ValueError(f"{label} must be one of: {', '.join(allowed)}")
+    return value
+
+
+def split_segments(segments: Iterable[str]) -> Dict[str, List[str]]:
+    """Stored names back to the API's ``tickers`` and ``segments``"""
+    tickers, others = [], []
+    for segment in segments:
+        if segment.startswith(TICKER_PREFIX):
+            tickers.append(segment[len(TICKER_PREFIX):].upper())
+        else:
+            others.append(segment)
+    return {"tickers": tickers, "segments": others}
+
+
+async def subscriber_segments(db: AsyncSession, email: str) -> List[str]:
+    return list(await db.scalars(
+        select(SubscriberSegmentModel.segment)
+        .where(SubscriberSegmentModel.email == email)
+        .order_by(SubscriberSegmentModel.segment)
+    ))
+
+
+async def replace_segments(db: AsyncSession, email: str, segments: List[str]):
+    """Make ``segments`` the subscriber's full set; the caller commits"""
+    await db.execute(delete(SubscriberSegmentModel).where(SubscriberSegmentModel.email == email))
+    await insert_many(db, SubscriberSegmentModel, [{"segment": segment, "email": email} for segment in segments])
+
+
+async def segment_counts(db: AsyncSession) -> Dict[str, int]:
+    """Members per segment, counted off the primary key index"""
+    rows = await db.execute(
+        select(SubscriberSegmentModel.segment, func.count())
+        .group_by(SubscriberSegmentModel.segment)
+        .order_by(SubscriberSegmentModel.segment)
+    )
+    return dict(rows.all())
+
+
+def normalize_audience(segments: Iterable[str] = (), tickers: Iterable[str] = (),
+                       frequencies: Iterable[str] = ()) -> Optional[dict]:
+    """The stored form of a newsletter's targeting; ``None`` means every email subscriber"""
+    names = sorted({normalize_segment(name) for name in segments} | {ticker_segment(t) for t in tickers})
+    chosen = sorted({validate_choice(value, FREQUENCIES, "frequency") for value in frequencies})
+    if not names and not chosen:
+        return None
+    return {"segments": names, "frequencies": chosen}
+
+
+def select_recipients(*columns, audience: Optional[dict] = None):
+    """SELECT ``columns`` for every subscriber a newsletter with ``audience`` goes to.
+
+    Subscribers on the feed-only channel never get mail. With segments the
+    query is driven by the segment index and joins each member's row;
+    otherwise it reads the (channel, frequency, email) index.
+    """
+    audience = audience or {}
+    segments = audience.get("segments") or []
+    frequencies = audience.get("frequencies") or []
+    if segments:
+        members = (
+            select(SubscriberSegmentModel.email)
+            .where(SubscriberSegmentModel.segment.in_(segments))
+            .distinct()
+            .subquery()
+        )
+        statement = select(*columns).select_from(members).join(SubscriberModel, SubscriberModel.email == members.c.email)
+    else:
+        statement = select(*columns).select_from(SubscriberModel)
+    statement = statement.where(SubscriberModel.channel == EMAIL)
+    if frequencies:
+        statement = statement.where(SubscriberModel.frequency.in_(frequencies))
+    return statement
+
+
+async def count_recipients(db: AsyncSession, audience: Optional[dict] = None) -> int:
+    recipients = select_recipients(SubscriberModel.email, audience=audience).subquery()
+    return await db.scalar(select(func.count()).select_from(recipients))
@@ -0,0 +1,184 @@
+
+"""In-process broadcast of new signals to live SSE clients.
+
+``create_post``/``delete_post`` append a row to ``signal_events`` in their
+own transaction. Each worker's ``SignalHub`` tails that table by id (woken
+immediately after a local commit, otherwise every ``SIGNAL_POLL_INTERVAL``)
+and pushes the pre-encoded event to every connected client, so a post
+created on one worker reaches clients connected to all of them. Clients
+that reconnect with ``Last-Event-ID`` are replayed what they missed from the
+same table.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import List, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import SIGNAL_POLL_INTERVAL, SIGNAL_CLIENT_BUFFER, SIGNAL_EVENT_RETENTION
+from app.database.base import AsyncSessionLocal
+from app.database.batch import insert_many
+from app.models.signal_event import SignalEventModel
+
+logger = logging.getLogger(__name__)
+
+# Most events read from the log per poll
+POLL_BATCH = 500
+# Old events are pruned at most this often (seconds)
+PRUNE_INTERVAL = 60
+
+
+def encode_payload(payload: dict) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def record_signal(db: AsyncSession, kind: str, post_id: str, payload: dict):
+    """Append an event; it is published when the caller's transaction commits"""
+    db.add(SignalEventModel(kind=kind, post_id=post_id, payload=encode_payload(payload)))
+
+
+async def record_signals(db: AsyncSession, kind: str, payloads: List[dict]):
+    """``record_signal`` for many posts in one ``executemany``, in list order"""
+    await insert_many(db, SignalEventModel, [
+        {"kind": kind, "post_id": payload["id"], "payload": encode_payload(payload)} for payload in payloads
+    ], ignore_conflicts=False)
+
+
+def encode_event(event_id: int, kind: str, payload: str) -> bytes:
+    """One SSE frame; JSON payloads never contain raw newlines"""
+    return f"id: {event_id}\nevent: {kind}\ndata: {payload}\n\n".encode("utf-8")
+
+
+async def events_after(db: AsyncSession, after_id: int, limit: int) -> List[Tuple[int, bytes]]:
+    result = await db.execute(
+        select(SignalEventModel.id, SignalEventModel.kind, SignalEventModel.payload)
+        .where(SignalEventModel.id > after_id)
+        .order_by(SignalEventModel.id)
+        .limit(limit)
+    )
+    return [(event_id, encode_event(event_id, kind, payload)) for event_id, kind, payload in result]
+
+
+class SignalClient:
+    """One connected stream: a bounded queue of (id, frame), ``None`` to close"""
+
+    def __init__(self, buffer: int):
+        self.queue = asyncio.Queue(maxsize=buffer)
+
+    def close(self):
+        # Make room for the sentinel; the client resumes from Last-Event-ID
+        while True:
+            try:
+                self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+        self.queue.put_nowait(None)
+
+
+class SignalHub:
+    """Per-worker set of SSE clients fed from the shared event log.
+
+    Publishing costs one ``put_nowait`` per client with a shared, already
+    encoded frame, so thousands of idle connections are cheap. A client
+    whose buffer fills up is disconnected rather than slowing the others.
+    """
+
+    def __init__(self, poll_interval: float = SIGNAL_POLL_INTERVAL, buffer: int = SIGNAL_CLIENT_BUFFER):
+        self.poll_interval = poll_interval
+        self.buffer = buffer
+        self.published = 0
+        self.dropped = 0
+        self._clients = set()
+        self._last_id = 0
+        self._wake = None
+        self._task = None
+        self._pruned_at = 0.0
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    @property
+    def last_event_id(self) -> int:
+        return self._last_id
+
+    def connect(self) -> SignalClient:
+        client = SignalClient(self.buffer)
+        self._clients.add(client)
+        return client
+
+    def disconnect(self, client: SignalClient):
+        self._clients.discard(client)
+
+    def publish(self, event_id: int, frame: bytes):
+        for client in list(self._clients):
+            try:
+                client.queue.put_nowait((event_id, frame))
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._clients.discard(client)
+                client.close()
+        self.published += 1
+
+    def notify(self):
+        """Check the log now instead of at the next poll (after a local commit)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self):
+        self._wake = asyncio.Event()
+        # New clients only get events from now on; history is for Last-Event-ID replays
+        async with AsyncSessionLocal() as db:
+            self._last_id = await db.scalar(select(func.max(SignalEventModel.id))) or 0
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for client in list(self._clients):
+            client.close()
+        self._clients.clear()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self._poll()
+                if time.monotonic() - self._pruned_at > PRUNE_INTERVAL:
+                    await self._prune()
+            except Exception:
+                logger.exception("Signal hub poll failed")
+
+    async def _poll(self):
+        while True:
+            async with AsyncSessionLocal() as db:
+                events = await events_after(db, self._last_id, POLL_BATCH)
+            for event_id, frame in events:
+                self.publish(event_id, frame)
+                self._last_id = event_id
+            if len(events) < POLL_BATCH:
+                return
+
+    async def _prune(self):
+        self._pruned_at = time.monotonic()
+        if self._last_id <= SIGNAL_EVENT_RETENTION:
+            return
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(SignalEventModel).where(SignalEventModel.id <= self._last_id - SIGNAL_EVENT_RETENTION))
+            await db.commit()
+
+
+signal_hub = SignalHub()
@@ -0,0 +1,148 @@
+
+import queue
+import smtplib
+import threading
+import time
+
+from app.config import (
+    EMAIL_PASSWORD,
+    EMAIL_SENDER,
+    SMTP_HOST,
+    SMTP_PORT,
+    SMTP_USE_TLS,
+    SMTP_TIMEOUT,
+    SMTP_POOL_SIZE,
+    SMTP_MAX_MESSAGES_PER_CONNECTION,
+)
+from app.utils.metrics import smtp_connect_duration, smtp_send_duration
+
+
+def _is_connection_error(exc: Exception) -> bool:
+    """True if the session itself is unusable and should be reopened"""
+    if isinstance(exc, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    # SMTPException subclasses OSError, so protocol errors must be excluded explicitly
+    return isinstance(exc, OSError) and not isinstance(exc, smtplib.SMTPException)
+
+
+class _PooledConnection:
+    """A single SMTP session slot in the pool"""
+
+    def __init__(self):
+        self.server = None
+        self.sent = 0
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except Exception:
+                try:
+                    self.server.close()
+                except Exception:
+                    pass
+        self.server = None
+        self.sent = 0
+
+
+class SMTPConnectionPool:
+    """Bounded pool of long-lived, authenticated SMTP sessions
+
+    Each slot opens its connection lazily, is recycled after
+    ``max_messages`` sends and is reopened once if the server drops it.
+    """
+
+    def __init__(self, host=SMTP_HOST, port=SMTP_PORT, username=EMAIL_SENDER, password=EMAIL_PASSWORD,
+                 use_tls=SMTP_USE_TLS, size=SMTP_POOL_SIZE, max_messages=SMTP_MAX_MESSAGES_PER_CONNECTION,
+                 timeout=SMTP_TIMEOUT):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self.size = max(1, size)
+        self.max_messages = max(1, max_messages)
+        self.timeout = timeout
+        self.connects = 0
+        self._closed = False
+        self._slots = queue.LifoQueue(maxsize=self.size)
+        self._all_slots = []
+        self._lock = threading.Lock()
+        for _ in range(self.size):
+            slot = _PooledConnection()
+            self._all_slots.append(slot)
+            self._slots.put(slot)
+
+    def _connect(self):
+        start = time.perf_counter()
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.use_tls:
+                server.starttls()
+                server.ehlo()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        smtp_connect_duration.observe(time.perf_counter() - start)
+        with self._lock:
+            self.connects += 1
+        return server
+
+    def send(self, from_addr: str, to_addrs, message: str, kind: str = "other"):
+        """Send a pre-rendered message over a pooled session; ``kind`` labels its timing"""
+        if self._closed:
+            raise RuntimeError("SMTP pool is closed")
+        slot = self._slots.get()
+        start = time.perf_counter()
+        result = "error"
+        try:
+            for attempt in range(2):
+                try:
+                    if slot.server is None:
+                        slot.server = self._connect()
+                    slot.server.sendmail(from_addr, to_addrs, message)
+                    slot.sent += 1
+                    result = "sent"
+                    break
+                except Exception as e:
+                    if not _is_connection_error(e):
+                        raise
+                    slot.close()
+                    if attempt:
+                        raise
+            if slot.sent >= self.max_messages:
+                slot.close()
+        finally:
+            self._slots.put(slot)
+            smtp_send_duration.observe(time.perf_counter() - start, kind=kind, result=result)
+
+    def close(self):
+        """Quit every open session"""
+        self._closed = True
+        for slot in self._all_slots:
+            slot.close()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """Return the process-wide SMTP pool, creating it on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool._closed:
+            _pool = SMTPConnectionPool()
+        return _pool
+
+
+def close_smtp_pool():
+    """Close the process-wide SMTP pool if it was opened"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,281 @@
+
+"""The built frontend, indexed once and served from memory.
+
+``StaticIndex`` walks ``STATIC_DIR`` at startup and keeps every file up to
+``STATIC_MAX_MEMORY_FILE`` bytes in memory together with its gzip/brotli
+variants (the build's own ``.gz``/``.br`` siblings when present), media
+type and validators. A request is a dict lookup: no ``stat``, ``open`` or
+path joining, and a path can never resolve outside the tree. Unknown
+paths get the in-memory ``index.html`` shell for client-side routing.
+
+After a frontend deploy, ``POST /site/rebuild`` (or, from ``backend/``,
+``python -m app.utils.static_site rebuild``) bumps the ``static`` entry in
+``cache_versions``; every worker re-indexes within
+``STATIC_CHECK_INTERVAL`` seconds.
+"""
+
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import sys
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, PlainTextResponse, Response
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app.config import STATIC_DIR, STATIC_MAX_MEMORY_FILE, STATIC_CHECK_INTERVAL
+from app.database.base import AsyncSessionLocal
+from app.models.cache_version import CacheVersionModel
+from app.utils.feeds import ENCODINGS, VARIANT_SUFFIXES, compress
+from app.utils.http_cache import REVALIDATE, IMMUTABLE, accepted_encodings, make_etag, validator_headers, is_not_modified
+from app.utils.post_cache import version_bump_statements
+
+logger = logging.getLogger(__name__)
+
+STATIC_CACHE_NAME = "static"
+SHELL_PATH = "index.html"
+# Hashed build output under here never changes under the same name
+IMMUTABLE_PREFIX = "assets/"
+
+# Smaller files gain nothing from compression once headers are counted
+MIN_COMPRESSED_SIZE = 1024
+# A variant is only kept if it saves at least this fraction
+MIN_COMPRESSION_SAVING = 0.1
+COMPRESSIBLE_TYPES = {
+    "application/javascript", "application/json", "application/manifest+json", "application/xml",
+    "application/wasm", "image/svg+xml", "image/x-icon", "image/vnd.microsoft.icon", "font/ttf", "font/otf",
+}
+
+
+def _is_compressible(media_type: str) -> bool:
+    return media_type.startswith("text/") or media_type in COMPRESSIBLE_TYPES
+
+
+class StaticAsset:
+    """One file of the build: its bytes (or, if large, its path) and ready-made response headers"""
+
+    def __init__(self, path: str, file_path: str, stat_result: os.stat_result, body: Optional[bytes],
+                 variants: Dict[str, bytes]):
+        self.path = path
+        self.file_path = file_path
+        self.stat_result = stat_result
+        self.body = body
+        self.variants = variants
+        # Starlette appends "; charset=utf-8" to text types
+        self.media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.last_modified = datetime.utcfromtimestamp(stat_result.st_mtime)
+        if body is not None:
+            self.digest = hashlib.sha1(body).hexdigest()[:20]
+        else:
+            self.digest = make_etag(file_path, stat_result.st_mtime_ns, stat_result.st_size).strip('"')
+        cache_control = IMMUTABLE if path.startswith(IMMUTABLE_PREFIX) else REVALIDATE
+        # Headers per representation, built once
+        self.headers = {
+            encoding: self._headers(encoding, cache_control) for encoding in (None, *variants)
+        }
+
+    def _headers(self, encoding: Optional[str], cache_control: str) -> dict:
+        headers = validator_headers(self.etag(encoding), self.last_modified, cache_control)
+        if self.variants:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return headers
+
+    def etag(self, encoding: Optional[str] = None) -> str:
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def negotiate(self, accept_encoding: str):
+        if self.variants and accept_encoding:
+            accepted = accepted_encodings(accept_encoding)
+            for encoding in ENCODINGS:
+                if encoding in accepted and encoding in self.variants:
+                    return encoding, self.variants[encoding]
+        return None, self.body
+
+    def response(self, request: Request, status_code: int = 200) -> Response:
+        """The best variant for the client, or 304 if its copy is current"""
+        encoding, body = self.negotiate(request.headers.get("accept-encoding", ""))
+        headers = self.headers[encoding]
+        if status_code == 200 and is_not_modified(request, headers["ETag"], self.last_modified):
+            return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Encoding"})
+        if body is None:
+            return FileResponse(self.file_path, status_code=status_code, headers=headers,
+                                media_type=self.media_type, stat_result=self.stat_result)
+        return Response(content=body, status_code=status_code, headers=headers, media_type=self.media_type)
+
+
+def load_asset(path: str, file_path: str, siblings: set, max_memory_file: int = STATIC_MAX_MEMORY_FILE) -> StaticAsset:
+    stat_result = os.stat(file_path)
+    if stat_result.st_size > max_memory_file:
+        return StaticAsset(path, file_path, stat_result, None, {})
+    with open(file_path, "rb") as f:
+        body = f.read()
+
+    variants = {}
+    media_type = mimetypes.guess_type(path)[0] or ""
+    if len(body) >= MIN_COMPRESSED_SIZE and _is_compressible(media_type):
+        prebuilt = {}
+        for encoding, suffix in VARIANT_SUFFIXES.items():
+            if os.path.basename(file_path) + suffix in siblings:
+                with open(file_path + suffix, "rb") as f:
+                    prebuilt[encoding] = f.read()
+        candidates = prebuilt or compress(body)
+        variants = {
+            encoding: data for encoding, data in candidates.items()
+            if len(data) <= len(body) * (1 - MIN_COMPRESSION_SAVING)
+        }
+    return StaticAsset(path, file_path, stat_result, body, variants)
+
+
+def _is_prebuilt_variant(name: str, siblings: set) -> bool:
+    """``x.js.gz`` next to ``x.js`` is served as a variant of it, not as a file of its own"""
+    return any(name.endswith(suffix) and name[:-len(suffix)] in siblings for suffix in VARIANT_SUFFIXES.values())
+
+
+def build_index(directory: str = STATIC_DIR) -> Dict[str, StaticAsset]:
+    """Every regular file under ``directory``, keyed by its URL path (``assets/index-abc.js``)"""
+    assets = {}
+    for root, dirs, files in os.walk(directory, followlinks=True):
+        dirs[:] = [name for name in dirs if not name.startswith(".")]
+        siblings = set(files)
+        for name in files:
+            if name.startswith(".") or _is_prebuilt_variant(name, siblings):
+                continue
+            file_path = os.path.join(root, name)
+            path = os.path.relpath(file_path, directory).replace(os.sep, "/")
+            try:
+                assets[path] = load_asset(path, file_path, siblings)
+            except OSError:
+                logger.warning("Skipping unreadable static file", extra={"path": path})
+    return assets
+
+
+class StaticIndex:
+    def __init__(self, directory: str = STATIC_DIR, check_interval: float = STATIC_CHECK_INTERVAL):
+        self.directory = directory
+        self.check_interval = check_interval
+        self._assets: Optional[Dict[str, StaticAsset]] = None
+        self._build_lock = threading.Lock()
+        self._version = None
+        self._task = None
+
+    @property
+    def assets(self) -> Dict[str, StaticAsset]:
+        if self._assets is None:
+            self.rebuild()
+        return self._assets
+
+    def get(self, path: str) -> Optional[StaticAsset]:
+        return self.assets.get(path)
+
+    @property
+    def shell(self) -> Optional[StaticAsset]:
+        return self.assets.get(SHELL_PATH)
+
+    def rebuild(self):
+        """Re-read the tree; requests keep using the old index until the new one is complete"""
+        with self._build_lock:
+            assets = build_index(self.directory)
+            self._assets = assets
+        in_memory = sum(len(asset.body) for asset in assets.values() if asset.body is not None)
+        logger.info("Indexed static files", extra={"files": len(assets), "bytes_in_memory": in_memory})
+
+    async def rebuild_async(self):
+        await run_in_threadpool(self.rebuild)
+
+    # ------------------- Cross-worker refresh -------------------
+
+    async def start(self):
+        self._version = await read_static_version()
+        await self.rebuild_async()
+        if self.check_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            try:
+                version = await read_static_version()
+                if version != self._version:
+                    self._version = version
+                    await self.rebuild_async()
+            except Exception:
+                logger.exception("Static index refresh failed")
+
+    async def request_rebuild(self):
+        """Re-index here now and tell the other workers to do the same"""
+        async with AsyncSessionLocal() as db:
+            for statement in version_bump_statements(STATIC_CACHE_NAME):
+                await db.execute(statement)
+            await db.commit()
+            self._version = await _read_version(db)
+        await self.rebuild_async()
+
+
+async def _read_version(db) -> int:
+    version = await db.scalar(select(CacheVersionModel.version).where(CacheVersionModel.name == STATIC_CACHE_NAME))
+    return version or 0
+
+
+async def read_static_version() -> int:
+    async with AsyncSessionLocal() as db:
+        return await _read_version(db)
+
+
+static_index = StaticIndex()
+
+
+class IndexedStaticFiles:
+    """ASGI app for a mount (``/assets``, ``/static``) that only serves files from the index"""
+
+    def __init__(self, index: StaticIndex, prefix: str = ""):
+        self.index = index
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            path = scope["path"][len(scope.get("root_path", "")):].lstrip("/")
+            asset = self.index.get(self.prefix + path)
+            if asset is None:
+                response = PlainTextResponse("Not Found", status_code=404)
+            else:
+                response = asset.response(Request(scope))
+        await response(scope, receive, send)
+
+
+def _main(argv):
+    from app.database.base import SessionLocal
+
+    if argv != ["rebuild"]:
+        print("Usage: python -m app.utils.static_site rebuild")
+        sys.exit(1)
+    db = SessionLocal()
+    try:
+        for statement in version_bump_statements(STATIC_CACHE_NAME):
+            db.execute(statement)
+        db.commit()
+    finally:
+        db.close()
+    print(f"Workers will re-index {STATIC_DIR} within {STATIC_CHECK_INTERVAL:g}s")
+
+
+if __name__ == "__main__":
+    _main(sys.argv[1:])
@@ -0,0 +1,166 @@
+"""Per-worker Bloom filter of subscribed addresses.
+
+``POST /subscribe`` used to look every address up before inserting it. The
+filter answers "definitely not subscribed" for almost every new address, so
+those go straight to the insert; anything it might contain is still looked
+up. A Bloom filter can't forget an address and can return false positives,
+so it never decides that someone *is* subscribed: an unsubscribed address,
+or one of the ``SUBSCRIBER_FILTER_ERROR_RATE`` share of new ones that
+collide, only costs the lookup that used to happen anyway.
+
+Each worker loads the filter in a thread at startup and adds the addresses
+it inserts. Addresses added by other workers or scripts are missing, which
+is safe too: the insert hits the unique index on ``lower(email)`` and the
+signup is answered as a duplicate. The filter is sized for twice the
+subscribers found at load and rebuilt once it fills up, so the
+false-positive rate stays at or below about the configured one.
+"""
+
+import hashlib
+import logging
+import math
+import struct
+import threading
+from typing import Iterable, List, Optional
+
+from sqlalchemy import func, select
+
+from app.config import SUBSCRIBER_FILTER_ERROR_RATE, SUBSCRIBER_FILTER_MIN_CAPACITY
+from app.database.base import engine
+from app.models.subscriber import EMAIL_KEY, SubscriberModel, email_key
+
+logger = logging.getLogger(__name__)
+
+LOAD_BATCH_SIZE = 10000
+# One BLAKE2b digest (at most 64 bytes) holds every hash
+MAX_HASHES = 16
+MAX_BITS = 2 ** 32
+
+
+class BloomFilter:
+    """``capacity`` strings with a false-positive rate of about ``error_rate`` once full.
+
+    The bit positions of a key are independent 32-bit hashes cut from one
+    BLAKE2b digest, which caps the filter at 16 hashes and 2**32 bits.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        bits = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.size = min((bits + 7) // 8 * 8, MAX_BITS)
+        self.hashes = min(MAX_HASHES, max(1, round(self.size / self.capacity * math.log(2))))
+        self.bits = bytearray(self.size // 8)
+        self.count = 0
+        self._unpack = struct.Struct(f"<{self.hashes}I").unpack
+
+    def _positions(self, key: str) -> tuple:
+        return self._unpack(hashlib.blake2b(key.encode("utf-8"), digest_size=4 * self.hashes).digest())
+
+    def add(self, key: str):
+        bits, size = self.bits, self.size
+        for position in self._positions(key):
+            position %= size
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, keys: Iterable[str]):
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        bits, size = self.bits, self.size
+        for position in self._positions(key):
+            position %= size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.bits)
+
+
+class SubscriberFilter:
+    """The filter for this worker; until it has loaded, every address may be subscribed"""
+
+    def __init__(self, error_rate: float = SUBSCRIBER_FILTER_ERROR_RATE,
+                 min_capacity: int = SUBSCRIBER_FILTER_MIN_CAPACITY, bind=engine):
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self.bind = bind
+        self.bloom: Optional[BloomFilter] = None
+        # Keys added while a load is running, replayed into the new filter
+        self._pending: Optional[List[str]] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.bloom is not None
+
+    def start(self):
+        if self.error_rate > 0:
+            self._reload()
+
+    def _reload(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._pending = []
+            self._thread = threading.Thread(target=self._load, name="subscriber-filter", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None):
+        """For scripts and benchmarks: block until the current load has finished"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _load(self):
+        try:
+            # A Core connection rather than a session: half the per-row overhead on a million rows
+            with self.bind.connect() as conn:
+                count = conn.scalar(select(func.count()).select_from(SubscriberModel))
+                bloom = BloomFilter(max(self.min_capacity, 2 * count), self.error_rate)
+                # lower(email) is what email_key() gives for stored addresses
+                result = conn.execute(select(EMAIL_KEY).execution_options(yield_per=LOAD_BATCH_SIZE))
+                for keys in result.scalars().partitions():
+                    bloom.update(keys)
+        except Exception:
+            logger.exception("Failed to load the subscriber filter; signups look every address up")
+            with self._lock:
+                self._pending = None
+            return
+        with self._lock:
+            bloom.update(self._pending)
+            self._pending = None
+            self.bloom = bloom
+        logger.info("Subscriber filter loaded",
+                    extra={"subscribers": bloom.count, "capacity": bloom.capacity, "bytes": bloom.nbytes})
+
+    def might_contain(self, email: str) -> bool:
+        """False only if ``email`` is certainly not subscribed"""
+        bloom = self.bloom
+        return bloom is None or email_key(email) in bloom
+
+    def add(self, emails: Iterable[str]):
+        """Record addresses this worker has just stored"""
+        if self.error_rate <= 0:
+            return
+        keys = [email_key(email) for email in emails]
+        with self._lock:
+            if self._pending is not None:
+                self._pending.extend(keys)
+            bloom = self.bloom
+            if bloom is not None:
+                bloom.update(keys)
+        if bloom is not None and bloom.count > bloom.capacity:
+            self._reload()
+
+
+subscriber_filter = SubscriberFilter()
+
+
+def start_subscriber_filter():
+    subscriber_filter.start()
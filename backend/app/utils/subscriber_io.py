@@ -0,0 +1,270 @@
+
+"""Streaming subscriber export and batched import.
+
+Exports page through ``subscribers`` with a server-side cursor and yield one
+encoded chunk per page; imports parse line by line and write
+``IMPORT_BATCH_SIZE`` rows per transaction. Neither side holds more than one
+batch in memory, whatever the size of the table or the upload.
+"""
+
+import codecs
+import csv
+import io
+import json
+import re
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import AsyncIterator, Iterable, Iterator, List, Optional
+
+from pydantic import EmailStr
+from sqlalchemy import select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.database.base import SessionLocal, AsyncSessionLocal
+from app.database.batch import insert_many, stream_batches
+from app.models.subscriber import SubscriberModel, email_key
+from app.utils.subscriber_filter import subscriber_filter
+
+EXPORT_BATCH_SIZE = 1000
+IMPORT_BATCH_SIZE = 5000
+
+FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+CSV_COLUMNS = ("email", "subscribed_at")
+
+# How many rejected rows to echo back in the import report
+MAX_REPORTED_ERRORS = 20
+
+# Plain RFC 5322 dot-atom local parts; anything else goes through the full validator
+_SIMPLE_LOCAL_PART = re.compile(r"[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[A-Za-z0-9!#$%&'*+/=?^_`{|}~-]+)*\Z")
+
+
+def _export_query():
+    return select(SubscriberModel.email, SubscriberModel.subscribed_at).order_by(SubscriberModel.email)
+
+
+def export_header(fmt: str) -> str:
+    return ",".join(CSV_COLUMNS) + "\r\n" if fmt == "csv" else ""
+
+
+def format_rows(rows, fmt: str) -> str:
+    """Encode one page of (email, subscribed_at) rows"""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows((email, subscribed_at.isoformat() if subscribed_at else "") for email, subscribed_at in rows)
+        return buffer.getvalue()
+    return "".join(
+        json.dumps({"email": email, "subscribed_at": subscribed_at.isoformat() if subscribed_at else None}) + "\n"
+        for email, subscribed_at in rows
+    )
+
+
+def iter_export(fmt: str, batch_size: int = EXPORT_BATCH_SIZE, session_factory=SessionLocal) -> Iterator[str]:
+    """Export chunks for scripts, one per page of rows"""
+    yield export_header(fmt)
+    with session_factory() as db:
+        result = db.execute(_export_query().execution_options(yield_per=batch_size))
+        for rows in result.partitions():
+            yield format_rows(rows, fmt)
+
+
+async def iter_export_async(fmt: str, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[bytes]:
+    """Export chunks for a StreamingResponse; opens its own session since it outlives the request's"""
+    yield export_header(fmt).encode("utf-8")
+    async with AsyncSessionLocal() as db:
+        async for rows in stream_batches(db, _export_query(), batch_size):
+            yield format_rows(rows, fmt).encode("utf-8")
+
+
+@lru_cache(maxsize=4096)
+def _normalized_domain(domain: str) -> str:
+    return EmailStr.validate(f"postmaster@{domain}").rpartition("@")[2]
+
+
+def validate_email_address(value: str) -> str:
+    """Validate and normalise like POST /subscribe (EmailStr).
+
+    Domain checks (IDNA) are most of EmailStr's cost and imports repeat a
+    few domains many times, so for simple addresses the domain result is
+    cached and only the local part is checked per row.
+    """
+    local, at, domain = value.rpartition("@")
+    if at and len(local) <= 64 and len(value) <= 254 and _SIMPLE_LOCAL_PART.match(local):
+        return f"{local}@{_normalized_domain(domain)}"
+    return EmailStr.validate(value)
+
+
+class SubscriberImport:
+    """Parse, validate and de-duplicate import rows into write batches.
+
+    Duplicates inside a batch are dropped here; duplicates across batches or
+    against existing subscribers are skipped by the insert itself.
+    """
+
+    def __init__(self, fmt: str, batch_size: int = IMPORT_BATCH_SIZE):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.format = fmt
+        self.batch_size = batch_size
+        self.received = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.invalid = 0
+        self.errors = []
+        self._line = 0
+        self._columns = None
+        self._batch = {}
+
+    def parse(self, lines: Iterable[str]) -> Iterator[List[dict]]:
+        """Consume lines, yielding a batch whenever one fills up"""
+        for line in lines:
+            self._line += 1
+            line = line.rstrip("\r\n")
+            if not line.strip():
+                continue
+            try:
+                row = self._parse_line(line)
+                if row is None:
+                    continue
+                self.received += 1
+                email, subscribed_at = self._validate(*row)
+            except ValueError as e:
+                self.invalid += 1
+                if len(self.errors) < MAX_REPORTED_ERRORS:
+                    self.errors.append({"line": self._line, "error": str(e)})
+                continue
+            key = email_key(email)
+            if key in self._batch:
+                self.duplicates += 1
+                continue
+            self._batch[key] = (email, subscribed_at)
+            if len(self._batch) >= self.batch_size:
+                yield self.flush()
+
+    def flush(self) -> List[dict]:
+        batch = [{"email": email, "subscribed_at": subscribed_at} for email, subscribed_at in self._batch.values()]
+        self._batch = {}
+        return batch
+
+    def record(self, batch: List[dict], inserted: int):
+        self.imported += inserted
+        self.duplicates += len(batch) - inserted
+
+    def _parse_line(self, line: str):
+        if self.format == "ndjson":
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                raise ValueError("invalid JSON")
+            if not isinstance(data, dict):
+                raise ValueError("expected a JSON object")
+            return data.get("email"), data.get("subscribed_at")
+
+        fields = next(csv.reader([line]))
+        if self._columns is None:
+            header = [field.strip().lower() for field in fields]
+            if "email" in header:
+                self._columns = (header.index("email"),
+                                 header.index("subscribed_at") if "subscribed_at" in header else None)
+                return None
+            # No header: email first, optional subscription date second
+            self._columns = (0, 1)
+        email_index, date_index = self._columns
+        email = fields[email_index] if email_index < len(fields) else None
+        subscribed_at = fields[date_index] if date_index is not None and date_index < len(fields) else None
+        return email, subscribed_at
+
+    @staticmethod
+    def _validate(email, subscribed_at):
+        if not isinstance(email, str) or not email.strip():
+            raise ValueError("missing email")
+        try:
+            email = validate_email_address(email.strip())
+        except Exception:
+            raise ValueError(f"invalid email: {email.strip()[:100]}")
+        if subscribed_at:
+            try:
+                subscribed_at = datetime.fromisoformat(str(subscribed_at).strip().replace("Z", "+00:00"))
+            except ValueError:
+                raise ValueError(f"invalid subscribed_at: {str(subscribed_at)[:40]}")
+            if subscribed_at.tzinfo is not None:
+                subscribed_at = subscribed_at.astimezone(timezone.utc).replace(tzinfo=None)
+        else:
+            subscribed_at = datetime.utcnow()
+        return email, subscribed_at
+
+    def report(self) -> dict:
+        return {
+            "received": self.received,
+            "imported": self.imported,
+            "duplicates": self.duplicates,
+            "invalid": self.invalid,
+            "errors": list(self.errors),
+        }
+
+
+def _insert_statement():
+    # Core insert so executemany reports a rowcount; existing subscribers (in any letter case) keep their original date
+    return sqlite_insert(SubscriberModel.__table__).on_conflict_do_nothing()
+
+
+def import_subscribers(lines: Iterable[str], fmt: str, batch_size: int = IMPORT_BATCH_SIZE,
+                       session_factory=SessionLocal) -> dict:
+    """Import from an iterable of text lines (e.g. an open file); one transaction per batch"""
+    job = SubscriberImport(fmt, batch_size)
+    with session_factory() as db:
+        def write(batch):
+            if batch:
+                inserted = db.execute(_insert_statement(), batch).rowcount
+                db.commit()
+                job.record(batch, inserted)
+
+        for batch in job.parse(lines):
+            write(batch)
+        write(job.flush())
+    return job.report()
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[List[str]]:
+    """Split a byte stream into complete UTF-8 lines, one list per received chunk"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        lines = text.split("\n")
+        pending = lines.pop()
+        if lines:
+            yield lines
+    tail = pending + decoder.decode(b"", final=True)
+    if tail:
+        yield [tail]
+
+
+async def import_subscribers_async(chunks: AsyncIterator[bytes], fmt: str,
+                                   batch_size: int = IMPORT_BATCH_SIZE) -> dict:
+    """Import from a request body stream without buffering the upload"""
+    job = SubscriberImport(fmt, batch_size)
+    async with AsyncSessionLocal() as db:
+        async def write(batch):
+            if batch:
+                inserted = await insert_many(db, SubscriberModel, batch, batch_size)
+                await db.commit()
+                job.record(batch, inserted)
+                # Skipped rows were subscribed already; adding them again changes nothing
+                subscriber_filter.add(row["email"] for row in batch)
+
+        async for lines in iter_lines(chunks):
+            for batch in job.parse(lines):
+                await write(batch)
+        await write(job.flush())
+    return job.report()
+
+
+def detect_format(content_type: Optional[str], default: str = "csv") -> str:
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        return "ndjson"
+    if content_type in ("text/csv", "application/csv"):
+        return "csv"
+    return default
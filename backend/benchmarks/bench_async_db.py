@@ -0,0 +1,208 @@
+"""Read latency under load, with and without a concurrent writer.
+
+Seeds a throwaway database, starts the app in a uvicorn subprocess and runs
+concurrent keep-alive readers against ``/posts/search`` and ``/posts``
+pages (varied so most requests miss the response cache), first alone and
+then while a writer creates posts at a fixed rate:
+
+    python -m benchmarks.bench_async_db --posts 5000 --readers 32 --duration 10
+
+``--backend`` points the server at another checkout's ``backend/`` (e.g. a
+``git worktree`` of an older revision) to compare against the same data.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-async-db-")
+
+from app.database.base import SessionLocal, create_tables, SKIP_MIGRATIONS_ENV  # noqa: E402
+from app.models.post import PostModel  # noqa: E402
+from app.utils.post_cache import version_bump_statements  # noqa: E402
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORDS = [
+    "tariff", "market", "rally", "crypto", "energy", "china", "deal", "trade", "stocks", "oil",
+    "bank", "rates", "fed", "tech", "chips", "steel", "auto", "pharma", "defense", "gold",
+    "dollar", "bond", "yield", "merger", "earnings", "guidance", "surge", "plunge", "ban", "order",
+]
+# Bodies draw from a larger vocabulary so searches match a realistic slice of posts
+VOCABULARY = [f"{word}{n}" for word in WORDS for n in range(100)]
+
+
+def seed(count: int):
+    db = SessionLocal()
+    now = datetime.utcnow()
+    rng = random.Random(1)
+    for i in range(count):
+        words = " ".join(rng.choice(VOCABULARY) for _ in range(60))
+        db.add(PostModel(
+            id=str(uuid.uuid4()),
+            title=f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} alert {i}",
+            content=words,
+            author="Benchmark",
+            createdAt=now - timedelta(minutes=i),
+        ))
+    for statement in version_bump_statements():
+        db.execute(statement)
+    db.commit()
+    db.close()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Connection:
+    """Bare keep-alive HTTP/1.1 client; enough for a benchmark without extra dependencies"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b"", headers: dict = None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        lines = [f"{method} {path} HTTP/1.1", "Host: bench", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+        payload = await self.reader.readexactly(length)
+        return status, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def reader(port: int, stop: float, latencies: list, errors: list, rng: random.Random):
+    conn = Connection(port)
+    cursor = None
+    try:
+        while time.monotonic() < stop:
+            if rng.random() < 0.5:
+                path = f"/posts/search?q={rng.choice(VOCABULARY)}&limit={rng.randint(5, 30)}"
+            else:
+                path = f"/posts?limit={rng.randint(10, 30)}" + (f"&cursor={cursor}" if cursor else "")
+            start = time.perf_counter()
+            status, payload = await conn.request("GET", path)
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors.append(status)
+            elif path.startswith("/posts?"):
+                page = json.loads(payload)
+                cursor = page["next"] if rng.random() < 0.8 else None
+    finally:
+        conn.close()
+
+
+async def writer(port: int, stop: float, api_key: str, rate: float) -> int:
+    """Create posts at a fixed rate so both servers under comparison do the same work"""
+    conn = Connection(port)
+    created = 0
+    next_write = time.monotonic()
+    try:
+        while time.monotonic() < stop:
+            await asyncio.sleep(max(0.0, next_write - time.monotonic()))
+            next_write += 1.0 / rate
+            body = json.dumps({
+                "title": f"Write load {created}",
+                "content": " ".join(random.choice(VOCABULARY) for _ in range(400)),
+                "author": "Benchmark",
+            }).encode()
+            status, _ = await conn.request("POST", "/posts", body, {
+                "Content-Type": "application/json",
+                "Authorization": f"Bearer {api_key}",
+            })
+            if status == 201:
+                created += 1
+    finally:
+        conn.close()
+    return created
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_phase(label: str, port: int, readers: int, duration: float, write_rate: float = 0.0):
+    latencies, errors = [], []
+    stop = time.monotonic() + duration
+    tasks = [reader(port, stop, latencies, errors, random.Random(i)) for i in range(readers)]
+    if write_rate:
+        tasks.append(writer(port, stop, os.environ["API_KEY"], write_rate))
+    results = await asyncio.gather(*tasks)
+    created = results[-1] if write_rate else 0
+    ms = [value * 1e3 for value in latencies]
+    print(f"{label:<20} {len(ms) / duration:8.0f} req/s  p50 {percentile(ms, 50):7.2f} ms  "
+          f"p95 {percentile(ms, 95):7.2f} ms  p99 {percentile(ms, 99):7.2f} ms  "
+          f"errors {len(errors)}  posts written {created}")
+
+
+async def wait_until_ready(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = Connection(port)
+            status, _ = await conn.request("GET", "/config")
+            conn.close()
+            if status == 200:
+                return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--readers", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per phase")
+    parser.add_argument("--write-rate", type=float, default=5.0, help="posts created per second")
+    parser.add_argument("--backend", default=BACKEND_DIR, help="backend directory to serve the app from")
+    args = parser.parse_args()
+
+    create_tables()
+    seed(args.posts)
+
+    port = free_port()
+    env = dict(os.environ, **{SKIP_MIGRATIONS_ENV: "1"})
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--no-access-log",
+         "--log-level", "warning"],
+        cwd=args.backend, env=env, stdout=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(wait_until_ready(port))
+        asyncio.run(run_phase("reads only", port, args.readers, args.duration))
+        asyncio.run(run_phase("reads + writer", port, args.readers, args.duration, args.write_rate))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
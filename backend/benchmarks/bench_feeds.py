@@ -0,0 +1,111 @@
+"""Compare the old per-request RSS rendering with serving pre-built feed artifacts.
+
+Seeds a throwaway database, then times both paths in-process:
+
+    python -m benchmarks.bench_feeds --posts 5000 --requests 2000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-feeds-")
+
+from app.database.base import SessionLocal, create_tables  # noqa: E402
+from app.models.post import PostModel  # noqa: E402
+from app.utils.feeds import current_feed_artifacts  # noqa: E402
+from app.utils.post_cache import post_cache, version_bump_statements  # noqa: E402
+
+
+def legacy_rss(db) -> str:
+    """The original get_rss_feed body: query 20 rows and concatenate per request"""
+    posts = db.query(PostModel).order_by(PostModel.createdAt.desc()).limit(20).all()
+    rss_content = '<?xml version="1.0" encoding="UTF-8"?>\n'
+    rss_content += '<rss version="2.0" xmlns:media="http://search.yahoo.com/mrss/">\n'
+    rss_content += '<channel>\n'
+    rss_content += '<title>SMALLCAP Signal Blog</title>\n'
+    rss_content += '<link>https://www.smallcapsignal.com</link>\n'
+    rss_content += '<description>Real-time alerts for Trump\'s market-moving posts</description>\n'
+    rss_content += '<language>en-us</language>\n'
+    rss_content += f'<lastBuildDate>{datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")}</lastBuildDate>\n'
+    for post in posts:
+        rss_content += '<item>\n'
+        rss_content += f'<title>{post.title}</title>\n'
+        rss_content += f'<link>https://www.smallcapsignal.com/post/{post.id}</link>\n'
+        rss_content += f'<guid>https://www.smallcapsignal.com/post/{post.id}</guid>\n'
+        rss_content += f'<pubDate>{post.createdAt.strftime("%a, %d %b %Y %H:%M:%S GMT")}</pubDate>\n'
+        content = post.content.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+        rss_content += f'<description>{content}</description>\n'
+        if post.author:
+            rss_content += f'<author>{post.author}</author>\n'
+        rss_content += '</item>\n'
+    rss_content += '</channel>\n'
+    rss_content += '</rss>'
+    return rss_content
+
+
+def seed(count: int):
+    db = SessionLocal()
+    start = datetime.utcnow() - timedelta(minutes=count)
+    body = "Tariff headline moves small caps. " * 40
+    db.bulk_save_objects([
+        PostModel(id=str(uuid.uuid4()), title=f"Signal {i}", content=body, author="SMALLCAP Signal",
+                  createdAt=start + timedelta(minutes=i))
+        for i in range(count)
+    ])
+    for statement in version_bump_statements():
+        db.execute(statement)
+    db.commit()
+    db.close()
+
+
+async def timed(label: str, requests: int, fn):
+    start = time.perf_counter()
+    for _ in range(requests):
+        await fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {requests / elapsed:>10.0f} req/s  {elapsed / requests * 1e6:>8.1f} µs/req")
+
+
+async def run(args):
+    create_tables()
+    seed(args.posts)
+
+    async def per_request():
+        db = SessionLocal()
+        try:
+            legacy_rss(db).encode("utf-8")
+        finally:
+            db.close()
+
+    start = time.perf_counter()
+    await current_feed_artifacts()
+    print(f"artifact build (3 feeds + gzip/br): {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+    def prebuilt(encoding):
+        async def serve():
+            await post_cache.get()
+            (await current_feed_artifacts())["rss"].negotiate(encoding)
+        return serve
+
+    await timed("per-request RSS", args.requests, per_request)
+    await timed("pre-built RSS (identity)", args.requests, prebuilt(""))
+    await timed("pre-built RSS (br, gzip)", args.requests, prebuilt("br, gzip"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
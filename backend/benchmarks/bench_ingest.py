@@ -0,0 +1,128 @@
+"""Post ingestion throughput: one ``POST /posts`` per post against ``POST /posts/batch``.
+
+Starts ``app.main:app`` in uvicorn on a throwaway DATA_DIR and writes
+``--posts`` posts each way over ``--concurrency`` keep-alive connections,
+then sends every batch again to time a retried upload, which should store
+nothing:
+
+    python -m benchmarks.bench_ingest --posts 5000 --batch-size 500
+
+Requests per second are posts per second for the single path; for the
+batch paths the posts/s column is what matters.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from benchmarks.loadtest import Connection, free_port, percentile, wait_until_ready
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_KEY = "benchmark"
+HEADERS = {"Authorization": f"Bearer {API_KEY}", "Content-Type": "application/json"}
+
+
+def make_post(i: int, source_id: str = None) -> dict:
+    post = {"title": f"Signal {i}", "content": f"Benchmark signal number {i} " * 8, "author": "Benchmark"}
+    if source_id:
+        post["sourceId"] = source_id
+    return post
+
+
+async def drive(port: int, concurrency: int, bodies: list, path: str, check) -> list:
+    """POST every body, ``concurrency`` at a time; returns per-request latencies in ms"""
+    pending = iter(bodies)
+    latencies = []
+
+    async def client():
+        conn = Connection(port)
+        try:
+            for body in pending:
+                start = time.perf_counter()
+                status, payload = await conn.request("POST", path, body, HEADERS)
+                latencies.append((time.perf_counter() - start) * 1e3)
+                check(status, payload)
+        finally:
+            conn.close()
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return latencies
+
+
+def expect_status(expected: int):
+    def check(status, payload):
+        if status != expected:
+            raise RuntimeError(f"expected {expected}, got {status}: {payload[:200]!r}")
+    return check
+
+
+def expect_batch(field: str, counts: list):
+    def check(status, payload):
+        if status != 200:
+            raise RuntimeError(f"batch returned {status}: {payload[:200]!r}")
+        counts.append(json.loads(payload)[field])
+    return check
+
+
+def report(label: str, posts: int, requests: int, elapsed: float, latencies: list):
+    latencies.sort()
+    print(f"{label:<10} {posts:>7} posts in {elapsed:6.2f} s  {posts / elapsed:9.0f} posts/s  "
+          f"{requests / elapsed:7.0f} req/s  p50 {percentile(latencies, 50):7.1f} ms  p95 {percentile(latencies, 95):7.1f} ms")
+
+
+async def run(args, port: int):
+    await wait_until_ready(port)
+    run_id = uuid.uuid4().hex[:8]
+
+    singles = [json.dumps(make_post(i)).encode() for i in range(args.posts)]
+    start = time.perf_counter()
+    latencies = await drive(port, args.concurrency, singles, "/posts", expect_status(201))
+    report("single", args.posts, len(singles), time.perf_counter() - start, latencies)
+
+    batches = [
+        json.dumps({"posts": [make_post(i, f"{run_id}-{i}") for i in range(first, min(first + args.batch_size, args.posts))]}).encode()
+        for first in range(0, args.posts, args.batch_size)
+    ]
+    for label, field in (("batch", "created"), ("retry", "duplicates")):
+        counts = []
+        start = time.perf_counter()
+        latencies = await drive(port, args.concurrency, batches, "/posts/batch", expect_batch(field, counts))
+        report(label, sum(counts), len(batches), time.perf_counter() - start, latencies)
+        if sum(counts) != args.posts:
+            raise RuntimeError(f"{label}: {sum(counts)} {field}, expected {args.posts}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    port = free_port()
+    env = dict(
+        os.environ, DATA_DIR=tempfile.mkdtemp(prefix="bench-ingest-"), API_KEY=API_KEY, LOG_LEVEL="WARNING",
+        # The per-key limit would cap the single-post path at AUTH_RATE_LIMIT posts a minute
+        AUTH_RATE_LIMIT="0",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(args.workers),
+         "--no-access-log", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    try:
+        asyncio.run(run(args, port))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Per-row cost of turning posts into a JSON response, before and after the fast path.
+
+Seeds a throwaway database, then times each stage in-process over the same
+rows:
+
+    python -m benchmarks.bench_json --posts 5000 --repeat 5
+
+"before" is what the handlers used to do: load ORM entities, build a
+``Post`` per row, validate the list again through ``response_model`` and
+encode with the json module. "after" reads plain columns, maps them to dicts
+with pre-formatted timestamps and encodes with ``app.utils.fast_json``
+(orjson when installed).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-json-")
+
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+from sqlalchemy import select  # noqa: E402
+
+from app.database.base import AsyncSessionLocal, SessionLocal, create_tables  # noqa: E402
+from app.models.post import PostModel  # noqa: E402
+from app.schemas.post import Post  # noqa: E402
+from app.utils import fast_json  # noqa: E402
+from app.utils.post_cache import POST_COLUMNS, post_dict  # noqa: E402
+
+POSTS_FIELD = create_response_field("posts", List[Post])
+
+
+def seed(count: int):
+    db = SessionLocal()
+    start = datetime.utcnow() - timedelta(minutes=count)
+    body = "Tariff headline moves small caps — “quoted” and naïve text. " * 10
+    db.bulk_save_objects([
+        PostModel(id=str(uuid.uuid4()), title=f"Signal {i}", content=body, author="SMALLCAP Signal",
+                  createdAt=start + timedelta(minutes=i), imageUrl=f"https://example.com/{i}.png" if i % 2 else None)
+        for i in range(count)
+    ])
+    db.commit()
+    db.close()
+
+
+def stdlib_dumps(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+async def load_entities():
+    async with AsyncSessionLocal() as db:
+        return (await db.scalars(select(PostModel).order_by(PostModel.createdAt.desc(), PostModel.id.desc()))).all()
+
+
+async def load_columns():
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(*POST_COLUMNS).order_by(PostModel.createdAt.desc(), PostModel.id.desc()))).all()
+
+
+def to_models(entities):
+    return [
+        Post(id=post.id, title=post.title, content=post.content, author=post.author,
+             createdAt=post.createdAt.isoformat(), imageUrl=post.imageUrl)
+        for post in entities
+    ]
+
+
+def to_dicts(rows):
+    return [post_dict(*row) for row in rows]
+
+
+async def validate(models):
+    return await serialize_response(field=POSTS_FIELD, response_content=models)
+
+
+async def before() -> bytes:
+    return stdlib_dumps(await validate(to_models(await load_entities())))
+
+
+async def after() -> bytes:
+    return fast_json.dumps(to_dicts(await load_columns()))
+
+
+async def timed(label: str, rows: int, repeat: int, work):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = work()
+        if asyncio.iscoroutine(result):
+            await result
+        best = min(best, time.perf_counter() - start)
+    print(f"  {label:<34} {best * 1e6 / rows:8.2f} µs/row  {best * 1e3:9.1f} ms")
+    return best
+
+
+async def run(args):
+    create_tables()
+    seed(args.posts)
+    entities = await load_entities()
+    rows = await load_columns()
+    models = to_models(entities)
+    validated = await validate(models)
+    dicts = to_dicts(rows)
+    if stdlib_dumps(validated) != fast_json.dumps(dicts):
+        raise RuntimeError("fast path output differs from the response_model path")
+
+    print(f"{args.posts} posts, best of {args.repeat} (json encoder: {'orjson' if fast_json.orjson else 'stdlib'})")
+    print("stages")
+    await timed("read ORM entities", args.posts, args.repeat, load_entities)
+    await timed("read columns", args.posts, args.repeat, load_columns)
+    await timed("build Post models", args.posts, args.repeat, lambda: to_models(entities))
+    await timed("build dicts", args.posts, args.repeat, lambda: to_dicts(rows))
+    await timed("response_model validation", args.posts, args.repeat, lambda: validate(models))
+    await timed("encode: json module", args.posts, args.repeat, lambda: stdlib_dumps(dicts))
+    await timed("encode: fast_json.dumps", args.posts, args.repeat, lambda: fast_json.dumps(dicts))
+    print("end to end")
+    slow = await timed("before", args.posts, args.repeat, before)
+    fast = await timed("after", args.posts, args.repeat, after)
+    print(f"  {slow / fast:.1f}x faster")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""CPU cost of building newsletter messages: a MIME tree per recipient against one precompiled template.
+
+Renders the same newsletter for every recipient both ways, then sends them
+over one pooled SMTP connection to the local sink, which runs in its own
+process so only the sender's CPU time is counted:
+
+    python -m benchmarks.bench_mail_templates --recipients 100000
+
+"before" is what jobs used to do per recipient: build a ``MIMEMultipart``,
+attach the parts and flatten it with ``as_string``. "after" is
+``newsletter_template`` compiled once and ``render`` per recipient. Both
+produce the same headers and decoded bodies, which is checked first.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from email import message_from_string
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.policy import default
+
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ["DOMAIN_SENDER"] = "Signals <signals@example.com>"
+
+from app.utils.email_templates import TEXT_FOOTER, HTML_FOOTER, unsubscribe_url  # noqa: E402
+from app.utils.newsletter_email import newsletter_template  # noqa: E402
+from app.utils.smtp_pool import SMTPConnectionPool  # noqa: E402
+from benchmarks.loadtest import free_port  # noqa: E402
+
+SENDER = os.environ["DOMAIN_SENDER"]
+SUBJECT = "Signal alert – tariffs move small caps"
+TEXT = "A market-moving post just went live: “tariffs” on imports, naïve readings aside.\n" * 30
+HTML = "<html><body>" + "<p>A market-moving post just went live: <b>“tariffs”</b> on imports.</p>" * 30 + "</body></html>"
+
+
+def build_per_recipient(email: str, html: bool) -> str:
+    """The old path, with the unsubscribe footer and headers the template adds"""
+    url = unsubscribe_url(email)
+    msg = MIMEMultipart("alternative") if html else MIMEMultipart()
+    msg["From"] = SENDER
+    msg["Subject"] = SUBJECT
+    msg["To"] = email
+    msg["List-Unsubscribe"] = f"<{url}>"
+    msg["List-Unsubscribe-Post"] = "List-Unsubscribe=One-Click"
+    msg.attach(MIMEText(TEXT + TEXT_FOOTER.replace("{{unsubscribe_url}}", url), "plain", "utf-8"))
+    if html:
+        body = HTML.replace("</body>", HTML_FOOTER.replace("{{unsubscribe_url}}", url.replace("&", "&amp;")) + "</body>")
+        msg.attach(MIMEText(body, "html", "utf-8"))
+    return msg.as_string()
+
+
+def check_equivalent(html: bool):
+    template = newsletter_template(SUBJECT, TEXT, HTML if html else None)
+    email = "check@example.com"
+    old = message_from_string(build_per_recipient(email, html), policy=default)
+    new = message_from_string(template.render(email), policy=default)
+    for header in ("From", "To", "Subject", "List-Unsubscribe", "List-Unsubscribe-Post"):
+        if old[header] != new[header]:
+            raise RuntimeError(f"{header} differs: {old[header]!r} != {new[header]!r}")
+    for kind in (("plain", "html") if html else ("plain",)):
+        if old.get_body((kind,)).get_content() != new.get_body((kind,)).get_content():
+            raise RuntimeError(f"text/{kind} body differs")
+
+
+def start_sink() -> tuple:
+    port = free_port()
+    process = subprocess.Popen([sys.executable, "-u", "-m", "benchmarks.smtp_sink", "--port", str(port)],
+                               stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # "SMTP sink listening on ..."
+    return process, port
+
+
+def timed(label: str, count: int, work) -> float:
+    cpu, wall = time.process_time(), time.perf_counter()
+    work()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    print(f"  {label:<28} {cpu * 1e6 / count:8.1f} µs CPU/msg  {cpu:7.2f}s CPU  {wall:7.2f}s wall")
+    return cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipients", type=int, default=100000)
+    parser.add_argument("--text-only", action="store_true", help="send text/plain instead of multipart/alternative")
+    parser.add_argument("--skip-send", action="store_true", help="only time building the messages")
+    args = parser.parse_args()
+
+    html = not args.text_only
+    check_equivalent(html)
+    recipients = [f"subscriber{i}@example.com" for i in range(args.recipients)]
+    size = len(newsletter_template(SUBJECT, TEXT, HTML if html else None).render(recipients[0]))
+    print(f"{args.recipients} recipients, {'multipart/alternative' if html else 'text/plain'}, ~{size} bytes each")
+
+    def render_old():
+        for email in recipients:
+            build_per_recipient(email, html)
+
+    def render_new():
+        template = newsletter_template(SUBJECT, TEXT, HTML if html else None)
+        for email in recipients:
+            template.render(email)
+
+    print("build only")
+    slow = timed("before: MIME per recipient", len(recipients), render_old)
+    fast = timed("after: precompiled template", len(recipients), render_new)
+    print(f"  {slow / fast:.1f}x less CPU")
+    if args.skip_send:
+        return
+
+    sink, port = start_sink()
+    pool = SMTPConnectionPool(host="127.0.0.1", port=port, username="bench", password="bench",
+                              use_tls=False, size=1)
+    try:
+        def send_old():
+            for email in recipients:
+                pool.send(SENDER, email, build_per_recipient(email, html), kind="newsletter")
+
+        def send_new():
+            template = newsletter_template(SUBJECT, TEXT, HTML if html else None)
+            for email in recipients:
+                pool.send(SENDER, email, template.render(email), kind="newsletter")
+
+        print("build and send to the SMTP sink (sender process CPU)")
+        slow = timed("before: MIME per recipient", len(recipients), send_old)
+        fast = timed("after: precompiled template", len(recipients), send_new)
+        print(f"  {slow / fast:.1f}x less CPU")
+    finally:
+        pool.close()
+        sink.terminate()
+        sink.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Compare serial per-message SMTP sends with the pooled newsletter scheduler.
+
+Runs entirely offline against the local SMTP sink and a throwaway database;
+``--rate-limit`` paces the scheduler to that many messages per second:
+
+    python -m benchmarks.bench_newsletter --recipients 2000 --connect-delay 0.05
+"""
+
+import argparse
+import asyncio
+import os
+import smtplib
+import tempfile
+import time
+from datetime import datetime
+
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ.setdefault("EMAIL_PASSWORD", "benchmark")
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-newsletter-")
+
+from benchmarks.smtp_sink import SMTPSink  # noqa: E402
+from app.database.base import AsyncSessionLocal, SessionLocal, create_tables  # noqa: E402
+from app.models.newsletter import NewsletterJobModel  # noqa: E402
+from app.models.subscriber import SubscriberModel  # noqa: E402
+from app.utils.newsletter_email import build_newsletter_message  # noqa: E402
+from app.utils.newsletter_jobs import BROADCAST, NewsletterScheduler, schedule_newsletter  # noqa: E402
+from app.utils.smtp_pool import SMTPConnectionPool  # noqa: E402
+
+SENDER = "signals@example.com"
+
+
+def run_serial(sink: SMTPSink, recipients, subject: str, body: str) -> float:
+    """The original path: one fresh, logged-in session per recipient"""
+    start = time.perf_counter()
+    for email in recipients:
+        server = smtplib.SMTP(sink.host, sink.port)
+        server.ehlo()
+        server.login("bench", "bench")
+        server.sendmail(SENDER, email, build_newsletter_message(email, subject, body))
+        server.quit()
+    return time.perf_counter() - start
+
+
+def seed_subscribers(recipients):
+    create_tables()
+    with SessionLocal() as db:
+        db.bulk_insert_mappings(SubscriberModel, [
+            {"email": email, "subscribed_at": datetime.utcnow()} for email in recipients
+        ])
+        db.commit()
+
+
+async def schedule(subject: str, body: str) -> str:
+    async with AsyncSessionLocal() as db:
+        job = schedule_newsletter(db, BROADCAST, subject, body)
+        await db.commit()
+        return job.id
+
+
+def run_pooled(sink: SMTPSink, subject: str, body: str, pool_size: int, max_messages: int, rate_limit: int):
+    """Schedule a job and let the scheduler claim, snapshot and send it, recording progress per batch"""
+    pool = SMTPConnectionPool(host=sink.host, port=sink.port, username="bench", password="bench",
+                              use_tls=False, size=pool_size, max_messages=max_messages)
+    scheduler = NewsletterScheduler(pool=pool, workers=pool_size, sender=SENDER, rate_limit=rate_limit,
+                                    rate_window=1.0, digest_interval_hours=0)
+    job_id = asyncio.run(schedule(subject, body))
+    start = time.perf_counter()
+    scheduler.run_once()
+    elapsed = time.perf_counter() - start
+    scheduler.shutdown()
+    pool.close()
+    with SessionLocal() as db:
+        job = db.get(NewsletterJobModel, job_id)
+    return elapsed, job, pool.connects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipients", type=int, default=1000)
+    parser.add_argument("--pool-size", type=int, default=8)
+    parser.add_argument("--max-messages", type=int, default=100)
+    parser.add_argument("--connect-delay", type=float, default=0.02, help="simulated handshake latency")
+    parser.add_argument("--message-delay", type=float, default=0.002, help="simulated per-message latency")
+    parser.add_argument("--rate-limit", type=int, default=0, help="messages per second for the scheduler; 0 is unlimited")
+    parser.add_argument("--skip-serial", action="store_true")
+    args = parser.parse_args()
+
+    recipients = [f"subscriber{i}@example.com" for i in range(args.recipients)]
+    seed_subscribers(recipients)
+    subject = "Signal alert"
+    body = "A market-moving post just went live.\n" * 20
+
+    sink = SMTPSink(connect_delay=args.connect_delay, message_delay=args.message_delay).start()
+    try:
+        if not args.skip_serial:
+            elapsed = run_serial(sink, recipients, subject, body)
+            print(f"serial:  {len(recipients)} msgs in {elapsed:.2f}s "
+                  f"({len(recipients) / elapsed:.0f} msg/s, {len(recipients)} connections)")
+
+        elapsed, job, connects = run_pooled(sink, subject, body, args.pool_size, args.max_messages, args.rate_limit)
+        print(f"pooled:  {job.sent} msgs in {elapsed:.2f}s "
+              f"({job.sent / elapsed:.0f} msg/s, {connects} connections, {job.failed} failed)")
+    finally:
+        sink.stop()
+
+
+if __name__ == "__main__":
+    main()
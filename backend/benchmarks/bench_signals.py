@@ -0,0 +1,185 @@
+"""Publish-to-receive latency of the live signal stream.
+
+Starts ``server.py --prod`` with several workers on a throwaway DATA_DIR,
+opens many idle ``GET /posts/stream`` connections (spread over the workers
+by the kernel), then creates posts at a fixed interval and records when
+each client receives each one:
+
+    python -m benchmarks.bench_signals --clients 2000 --workers 2 --posts 30
+
+Latency covers the POST, the commit, the other workers' log poll and the
+fan-out, so it is bounded below by ``SIGNAL_POLL_INTERVAL`` for clients on
+workers that did not handle the write.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_KEY = "benchmark"
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def worker_rss_mb(parent_pid: int) -> float:
+    """Total resident memory of the server's worker processes"""
+    total = 0
+    try:
+        with open(f"/proc/{parent_pid}/task/{parent_pid}/children") as f:
+            children = f.read().split()
+    except OSError:
+        return float("nan")
+    for pid in children:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            pass
+    return total / 1024
+
+
+class StreamClient:
+    """One idle SSE connection recording when each signal arrives"""
+
+    def __init__(self, port: int, received: dict):
+        self.port = port
+        self.received = received
+        self.ready = asyncio.Event()
+
+    async def run(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(b"GET /posts/stream HTTP/1.1\r\nHost: bench\r\nAccept: text/event-stream\r\n\r\n")
+        await writer.drain()
+        await reader.readuntil(b"\r\n\r\n")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                # Chunked-encoding size lines are ignored; every frame arrives whole in one chunk
+                if line.startswith(b"retry:"):
+                    self.ready.set()
+                elif line.startswith(b"data:"):
+                    now = time.perf_counter()
+                    title = json.loads(line[5:])["title"]
+                    self.received.setdefault(title, []).append(now)
+        finally:
+            writer.close()
+
+
+async def create_post(port: int, title: str):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps({"title": title, "content": "Benchmark signal", "author": "Benchmark"}).encode()
+    writer.write(
+        f"POST /posts HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+        f"Authorization: Bearer {API_KEY}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+    )
+    await writer.drain()
+    status = (await reader.readline()).split()[1]
+    await reader.read()
+    writer.close()
+    if status != b"201":
+        raise RuntimeError(f"POST /posts returned {status.decode()}")
+
+
+async def wait_until_ready(port: int, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"GET /config HTTP/1.1\r\nHost: bench\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            if b" 200 " in await reader.readline():
+                writer.close()
+                return
+            writer.close()
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(args, port: int, server_pid: int):
+    await wait_until_ready(port)
+    idle_rss = worker_rss_mb(server_pid)
+
+    received = {}
+    clients = [StreamClient(port, received) for _ in range(args.clients)]
+    connect_limit = asyncio.Semaphore(200)
+
+    async def connect(client):
+        async with connect_limit:
+            task = asyncio.create_task(client.run())
+            await client.ready.wait()
+            return task
+
+    start = time.perf_counter()
+    tasks = await asyncio.gather(*(connect(client) for client in clients))
+    print(f"{args.clients} streams connected in {time.perf_counter() - start:.1f} s; "
+          f"worker RSS {idle_rss:.0f} -> {worker_rss_mb(server_pid):.0f} MB")
+
+    sent = {}
+    for i in range(args.posts):
+        title = f"signal {i}"
+        sent[title] = time.perf_counter()
+        await create_post(port, title)
+        await asyncio.sleep(args.interval)
+    await asyncio.sleep(max(1.0, args.interval * 2))
+
+    latencies = [
+        (arrival - sent[title]) * 1e3
+        for title, arrivals in received.items() if title in sent
+        for arrival in arrivals
+    ]
+    expected = args.clients * args.posts
+    print(f"delivered {len(latencies)}/{expected} events")
+    if latencies:
+        print(f"publish-to-receive  p50 {percentile(latencies, 50):7.1f} ms  p95 {percentile(latencies, 95):7.1f} ms  "
+              f"p99 {percentile(latencies, 99):7.1f} ms  max {max(latencies):7.1f} ms")
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--posts", type=int, default=30)
+    parser.add_argument("--interval", type=float, default=0.5, help="seconds between posts")
+    args = parser.parse_args()
+
+    port = free_port()
+    env = dict(os.environ, API_KEY=API_KEY, SERVER_PORT=str(port), SERVER_HOST="127.0.0.1",
+               DATA_DIR=tempfile.mkdtemp(prefix="bench-signals-"), SERVER_GRACEFUL_SHUTDOWN_TIMEOUT="1")
+    server = subprocess.Popen(
+        [sys.executable, "server.py", "--prod", "--workers", str(args.workers)],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        asyncio.run(run(args, port, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Compare the old disk-backed SPA/asset serving with the in-memory static index.
+
+Builds a throwaway frontend tree and drives each handler as an ASGI app, so
+the numbers are the per-request cost without a network in between:
+
+    python -m benchmarks.bench_static --requests 5000
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from fastapi import FastAPI, Request
+from fastapi.responses import FileResponse, Response
+from fastapi.staticfiles import StaticFiles
+
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-static-")
+STATIC_DIR = os.environ["STATIC_DIR"] = tempfile.mkdtemp(prefix="bench-static-site-")
+
+from app.utils.http_cache import make_etag, validator_headers, is_not_modified  # noqa: E402
+from app.utils.static_site import StaticIndex, IndexedStaticFiles  # noqa: E402
+
+
+def write_site(directory: str):
+    os.makedirs(os.path.join(directory, "assets"), exist_ok=True)
+    with open(os.path.join(directory, "index.html"), "w") as f:
+        f.write("<!doctype html><html><head>" + '<link rel="modulepreload" href="/assets/chunk.js">' * 40
+                + '</head><body><div id="root"></div></body></html>')
+    with open(os.path.join(directory, "assets", "index-3f9a1c.js"), "w") as f:
+        f.writelines(f"export function render{i}(props){{return createElement('div',{{...props,key:{i * 7919 % 10007}}})}}\n"
+                     for i in range(6000))
+
+
+def legacy_app(directory: str) -> FastAPI:
+    """The original static mount and serve_spa: stat and read from disk on every request"""
+    app = FastAPI()
+
+    def spa_file_response(request: Request, file_path: str, status_code: int = 200):
+        stat_result = os.stat(file_path)
+        etag = make_etag(file_path, stat_result.st_mtime_ns, stat_result.st_size)
+        last_modified = datetime.utcfromtimestamp(stat_result.st_mtime)
+        headers = validator_headers(etag, last_modified)
+        if status_code == 200 and is_not_modified(request, etag, last_modified):
+            return Response(status_code=304, headers=headers)
+        return FileResponse(file_path, status_code=status_code, headers=headers, stat_result=stat_result)
+
+    app.mount("/assets", StaticFiles(directory=os.path.join(directory, "assets")), name="assets")
+
+    @app.get("/{full_path:path}")
+    async def serve_spa(full_path: str, request: Request):
+        if full_path.startswith("api/") or full_path.startswith("subscribers") or full_path.startswith("posts") or full_path.startswith("contact") or full_path.startswith("auth") or full_path.startswith("newsletter") or full_path.startswith("metrics"):
+            return spa_file_response(request, os.path.join(directory, "index.html"), status_code=404)
+        file_path = os.path.join(directory, full_path)
+        if os.path.exists(file_path) and os.path.isfile(file_path):
+            return spa_file_response(request, file_path)
+        return spa_file_response(request, os.path.join(directory, "index.html"))
+
+    return app
+
+
+def indexed_app(directory: str) -> FastAPI:
+    """The same routes served from StaticIndex, as in app/main.py"""
+    app = FastAPI()
+    index = StaticIndex(directory, check_interval=0)
+    index.rebuild()
+    app.mount("/assets", IndexedStaticFiles(index, prefix="assets/"), name="assets")
+
+    @app.get("/{full_path:path}")
+    async def serve_spa(full_path: str, request: Request):
+        asset = index.get(full_path)
+        return (asset or index.shell).response(request)
+
+    return app
+
+
+async def drive(app, path: str, accept_encoding: bytes, requests: int):
+    sent = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            sent.append(len(message.get("body", b"")))
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(b"host", b"bench"), (b"accept-encoding", accept_encoding)],
+        "client": ("127.0.0.1", 1), "server": ("bench", 80),
+    }
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    elapsed = time.perf_counter() - start
+    return elapsed / requests * 1e6, sum(sent) // requests
+
+
+async def run(args):
+    write_site(STATIC_DIR)
+    apps = {"legacy": legacy_app(STATIC_DIR), "indexed": indexed_app(STATIC_DIR)}
+    cases = [
+        ("deep link /post/123", "/post/123", b"gzip, deflate, br"),
+        ("asset, identity", "/assets/index-3f9a1c.js", b"identity"),
+        ("asset, br accepted", "/assets/index-3f9a1c.js", b"gzip, deflate, br"),
+    ]
+    for label, path, accept_encoding in cases:
+        for name, app in apps.items():
+            micros, size = await drive(app, path, accept_encoding, args.requests)
+            print(f"{label:<22} {name:<8} {micros:>8.1f} µs/req  {size:>8} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
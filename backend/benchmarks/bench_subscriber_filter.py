@@ -0,0 +1,113 @@
+"""False-positive rate, memory and speed of the subscriber Bloom filter at a given list size.
+
+Fills a filter with ``--subscribers`` addresses and probes it with as many
+addresses that were never added; then seeds a throwaway database of that
+size and times loading the filter from it at startup, and a signup check
+through the filter against the indexed lookup every signup used to make:
+
+    python -m benchmarks.bench_subscriber_filter --subscribers 1000000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-subscriber-filter-")
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app.config import SUBSCRIBER_FILTER_ERROR_RATE  # noqa: E402
+from app.database.base import SessionLocal, create_tables  # noqa: E402
+from app.models.subscriber import EMAIL_KEY, SubscriberModel, email_key  # noqa: E402
+from app.utils.subscriber_filter import BloomFilter, SubscriberFilter  # noqa: E402
+
+
+def addresses(count: int, prefix: str):
+    return [f"{prefix}{i}.Trader@Example{i % 997}.com" for i in range(count)]
+
+
+def per_op(label: str, seconds: float, count: int):
+    print(f"  {label:<36} {seconds * 1e6 / count:8.2f} µs")
+
+
+def measure_filter(subscribers, strangers, error_rate: float):
+    keys = [email_key(email) for email in subscribers]
+    bloom = BloomFilter(len(keys), error_rate)
+    start = time.perf_counter()
+    bloom.update(keys)
+    per_op("add", time.perf_counter() - start, len(keys))
+
+    start = time.perf_counter()
+    missed = sum(1 for key in keys if key not in bloom)
+    per_op("lookup, subscribed", time.perf_counter() - start, len(keys))
+    start = time.perf_counter()
+    false_positives = sum(1 for email in strangers if email_key(email) in bloom)
+    per_op("lookup, new address", time.perf_counter() - start, len(strangers))
+    if missed:
+        raise RuntimeError(f"{missed} added addresses not found")
+
+    tracemalloc.start()
+    exact = set(keys)
+    exact_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del exact
+    print(f"  false positives                      {false_positives} of {len(strangers)} "
+          f"({false_positives / len(strangers):.4%}, target {error_rate:.4%})")
+    print(f"  memory                               {bloom.nbytes / 2 ** 20:8.2f} MiB, {bloom.hashes} hashes "
+          f"(a set of the same addresses: {exact_bytes / 2 ** 20:.1f} MiB)")
+
+
+def seed(subscribers):
+    create_tables()
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        db.execute(insert(SubscriberModel.__table__), [{"email": email, "subscribed_at": now} for email in subscribers])
+        db.commit()
+
+
+def measure_signup_check(subscribers, strangers, sample: int, error_rate: float):
+    members = SubscriberFilter(error_rate=error_rate, min_capacity=0)
+    start = time.perf_counter()
+    members.start()
+    members.wait()
+    print(f"  load {len(subscribers)} addresses at startup    {time.perf_counter() - start:8.2f} s "
+          f"(sized for {members.bloom.capacity})")
+
+    probes = strangers[:sample]
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        for email in probes:
+            db.execute(select(SubscriberModel.email).where(EMAIL_KEY == email_key(email))).first()
+        per_op("indexed lookup (before)", time.perf_counter() - start, len(probes))
+    start = time.perf_counter()
+    looked_up = sum(1 for email in probes if members.might_contain(email))
+    per_op("filter check (after)", time.perf_counter() - start, len(probes))
+    print(f"  new addresses still looked up        {looked_up} of {len(probes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=1000000)
+    parser.add_argument("--error-rate", type=float, default=SUBSCRIBER_FILTER_ERROR_RATE or 0.001)
+    parser.add_argument("--lookups", type=int, default=20000, help="signup checks timed against the database")
+    parser.add_argument("--skip-db", action="store_true", help="only measure the filter itself")
+    args = parser.parse_args()
+
+    subscribers = addresses(args.subscribers, "member")
+    strangers = addresses(args.subscribers, "visitor")
+    print(f"{args.subscribers} subscribers, error rate {args.error_rate}")
+    print("bloom filter")
+    measure_filter(subscribers, strangers, args.error_rate)
+    if args.skip_db:
+        return
+    print("signup check")
+    seed(subscribers)
+    measure_signup_check(subscribers, strangers, args.lookups, args.error_rate)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""Time subscriber import/export and the memory they need.
+
+Generates CSV files in a throwaway DATA_DIR, imports them through the
+request-body (async) and file (CLI) paths, then exports through both
+streaming paths and, for contrast, the old ``fetchall()`` approach:
+
+    python -m benchmarks.bench_subscribers --rows 200000 [--memory]
+
+``--memory`` also reports the peak of Python allocations in each phase
+(tracemalloc, so SQLite's page cache and mmap are left out); tracing slows
+everything down, so compare throughput from runs without it.
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+os.environ.setdefault("API_KEY", "benchmark")
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="bench-subscribers-")
+
+from app.config import DATA_DIR, DATABASE_PATH  # noqa: E402
+from app.database.base import create_tables  # noqa: E402
+from app.utils.subscriber_io import import_subscribers, import_subscribers_async, iter_export, iter_export_async  # noqa: E402
+
+READ_CHUNK = 64 * 1024
+
+
+def write_csv(path: str, rows: int, prefix: str):
+    """``rows`` addresses with ~1% duplicates and ~0.5% invalid lines mixed in"""
+    start = datetime(2024, 1, 1)
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["email", "subscribed_at"])
+        for i in range(rows):
+            if i % 200 == 7:
+                writer.writerow([f"not-an-email-{i}", ""])
+            elif i % 100 == 3:
+                writer.writerow([f"{prefix}{i - 1}@example.com", ""])
+            else:
+                writer.writerow([f"{prefix}{i}@example.com", (start + timedelta(seconds=i)).isoformat()])
+
+
+TRACE_MEMORY = False
+
+
+def measure(label: str, rows: int, fn):
+    if TRACE_MEMORY:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    line = f"{label:<34} {rows / elapsed:9.0f} rows/s  {elapsed:6.2f} s"
+    if TRACE_MEMORY:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        line += f"  peak {peak / 2**20:7.1f} MB"
+    print(line)
+    return result
+
+
+async def file_chunks(path: str):
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(READ_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+
+async def drain(chunks) -> int:
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+    return size
+
+
+def legacy_export(path: str):
+    """The old check_subscribers.py: fetchall() into memory, then write"""
+    conn = sqlite3.connect(DATABASE_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM subscribers")
+    rows = cursor.fetchall()
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow([description[0] for description in cursor.description])
+        writer.writerows(rows)
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000, help="rows per import file")
+    parser.add_argument("--memory", action="store_true", help="trace peak Python memory per phase")
+    args = parser.parse_args()
+
+    global TRACE_MEMORY
+    TRACE_MEMORY = args.memory
+
+    create_tables()
+    upload = os.path.join(DATA_DIR, "upload.csv")
+    cli_file = os.path.join(DATA_DIR, "cli.csv")
+    write_csv(upload, args.rows, "web")
+    write_csv(cli_file, args.rows, "cli")
+
+    report = measure("import, request body (async)", args.rows,
+                     lambda: asyncio.run(import_subscribers_async(file_chunks(upload), "csv")))
+    print(f"  imported {report['imported']}, duplicates {report['duplicates']}, invalid {report['invalid']}")
+
+    def import_file():
+        with open(cli_file, newline="", encoding="utf-8") as file:
+            return import_subscribers(file, "csv")
+    report = measure("import, file (CLI)", args.rows, import_file)
+    print(f"  imported {report['imported']}, duplicates {report['duplicates']}, invalid {report['invalid']}")
+
+    total = args.rows * 2
+    measure("export CSV, streamed (async)", total, lambda: asyncio.run(drain(iter_export_async("csv"))))
+    measure("export NDJSON, streamed (async)", total, lambda: asyncio.run(drain(iter_export_async("ndjson"))))
+
+    def export_file():
+        with open(os.devnull, "w") as file:
+            for chunk in iter_export("csv"):
+                file.write(chunk)
+    measure("export CSV, streamed (CLI)", total, export_file)
+    measure("export CSV, fetchall (old script)", total, lambda: legacy_export(os.path.join(DATA_DIR, "legacy.csv")))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,400 @@
+"""Load test for the whole backend, with results that can be compared between runs.
+
+Seeds a database of the requested size (cached under ``--data-dir`` and
+copied for every run, so each run starts from the same data), starts
+``app.main:app`` in uvicorn with an SMTP sink standing in for the mail
+provider, then drives each scenario for ``--duration`` seconds over
+``--concurrency`` keep-alive connections:
+
+    posts      GET /posts?limit=20, following the cursor like the home page
+    search     GET /posts/search with a random term
+    rss        GET /rss (gzip/br accepted)
+    subscribe  POST /subscribe with a new address; welcome mails are counted at the sink
+    spa        GET /post/<id>, the SPA fallback
+
+    python -m benchmarks.loadtest --posts 100000 --subscribers 100000 --output before.json
+    python -m benchmarks.loadtest --posts 100000 --subscribers 100000 --compare before.json
+
+With ``--compare`` the exit status is 1 if any scenario lost more than
+``--threshold`` percent of its throughput or gained as much p95/p99 latency.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+from benchmarks.smtp_sink import SMTPSink
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_FORMAT = 1
+API_KEY = "loadtest"
+
+WORDS = [
+    "tariff", "market", "rally", "crypto", "energy", "china", "deal", "trade", "stocks", "oil",
+    "bank", "rates", "fed", "tech", "chips", "steel", "auto", "pharma", "defense", "gold",
+    "dollar", "bond", "yield", "merger", "earnings", "guidance", "surge", "plunge", "ban", "order",
+]
+# Bodies draw from a larger vocabulary so searches match a realistic slice of posts
+VOCABULARY = [f"{word}{n}" for word in WORDS for n in range(100)]
+SCENARIOS = ("posts", "search", "rss", "subscribe", "spa")
+SEED_BATCH = 10000
+
+
+# ------------------- Seeding -------------------
+
+def seed_database(data_dir: str, posts: int, subscribers: int):
+    """Create the schema and rows through the app's own models (imported late, once DATA_DIR is set)"""
+    os.environ["DATA_DIR"] = data_dir
+    from sqlalchemy import insert
+    from app.database.base import SessionLocal, create_tables
+    from app.models.post import PostModel
+    from app.models.subscriber import SubscriberModel
+    from app.utils.post_cache import version_bump_statements
+
+    create_tables()
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        for start in range(0, posts, SEED_BATCH):
+            db.execute(insert(PostModel.__table__), [
+                {
+                    "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                    "title": f"{rng.choice(WORDS).title()} {rng.choice(WORDS)} alert {i}",
+                    "content": " ".join(rng.choice(VOCABULARY) for _ in range(60)),
+                    "author": "Load test",
+                    "createdAt": now - timedelta(minutes=i),
+                }
+                for i in range(start, min(posts, start + SEED_BATCH))
+            ])
+            db.commit()
+        for start in range(0, subscribers, SEED_BATCH):
+            db.execute(insert(SubscriberModel.__table__), [
+                {"email": f"reader{i}@example.com", "subscribed_at": now - timedelta(seconds=i)}
+                for i in range(start, min(subscribers, start + SEED_BATCH))
+            ])
+            db.commit()
+        for statement in version_bump_statements():
+            db.execute(statement)
+        db.commit()
+
+
+def seeded_data_dir(cache_dir: str, posts: int, subscribers: int) -> str:
+    """A seeded directory for these sizes, built once and reused by later runs"""
+    directory = os.path.join(cache_dir, f"posts{posts}-subscribers{subscribers}")
+    marker = os.path.join(directory, "seed.json")
+    if os.path.exists(marker):
+        with open(marker) as f:
+            if json.load(f).get("format") == SEED_FORMAT:
+                return directory
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    started = time.perf_counter()
+    # In a child process: the app's engines are bound to DATA_DIR at import time
+    subprocess.run(
+        [sys.executable, "-c", f"from benchmarks.loadtest import seed_database; "
+                               f"seed_database({directory!r}, {posts}, {subscribers})"],
+        cwd=BACKEND_DIR, env=dict(os.environ, API_KEY=API_KEY, LOG_LEVEL="WARNING"), check=True,
+    )
+    with sqlite3.connect(os.path.join(directory, "smallcap.db")) as conn:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    with open(marker, "w") as f:
+        json.dump({"format": SEED_FORMAT, "posts": posts, "subscribers": subscribers}, f)
+    print(f"Seeded {posts} posts and {subscribers} subscribers in {time.perf_counter() - started:.1f}s")
+    return directory
+
+
+def write_site(directory: str):
+    """A small built frontend for the SPA fallback"""
+    os.makedirs(os.path.join(directory, "assets"), exist_ok=True)
+    with open(os.path.join(directory, "index.html"), "w") as f:
+        f.write('<!doctype html><html><head><script type="module" src="/assets/index.js"></script>'
+                '</head><body><div id="root"></div></body></html>')
+    with open(os.path.join(directory, "assets", "index.js"), "w") as f:
+        f.write("console.log('smallcap');\n" * 2000)
+
+
+# ------------------- HTTP client -------------------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Connection:
+    """Bare keep-alive HTTP/1.1 client; enough for a benchmark without extra dependencies"""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes = b"", headers: dict = None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+        lines = [f"{method} {path} HTTP/1.1", "Host: loadtest", f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = 0
+        for line in head.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+        payload = await self.reader.readexactly(length)
+        return status, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+# ------------------- Scenarios -------------------
+
+class Scenario:
+    """Produces the next request for one connection and reads what it needs from the response"""
+
+    def __init__(self, name: str, rng: random.Random, run_id: str, client: int):
+        self.name = name
+        self.rng = rng
+        self.run_id = run_id
+        self.client = client
+        self.sent = 0
+        self.cursor = None
+
+    def next_request(self):
+        self.sent += 1
+        if self.name == "posts":
+            return "GET", "/posts?limit=20" + (f"&cursor={quote(self.cursor)}" if self.cursor else ""), b"", {}
+        if self.name == "search":
+            return "GET", f"/posts/search?q={self.rng.choice(VOCABULARY)}&limit=20", b"", {}
+        if self.name == "rss":
+            return "GET", "/rss", b"", {"Accept-Encoding": "gzip, br"}
+        if self.name == "subscribe":
+            body = json.dumps({"email": f"load-{self.run_id}-{self.client}-{self.sent}@example.com"}).encode()
+            return "POST", "/subscribe", body, {"Content-Type": "application/json"}
+        return "GET", f"/post/{uuid.UUID(int=self.rng.getrandbits(128))}", b"", {"Accept-Encoding": "gzip, br"}
+
+    def on_response(self, status: int, payload: bytes):
+        if self.name == "posts" and status == 200:
+            # Most readers scroll on; some go back to the top
+            self.cursor = json.loads(payload)["next"] if self.rng.random() < 0.8 else None
+
+
+def percentile(ordered: list, pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] if ordered else 0.0
+
+
+async def client_loop(port: int, scenario: Scenario, warmup_until: float, stop: float, latencies: list,
+                      statuses: dict, totals: dict):
+    conn = Connection(port)
+    try:
+        while True:
+            now = time.monotonic()
+            if now >= stop:
+                return
+            method, path, body, headers = scenario.next_request()
+            start = time.perf_counter()
+            try:
+                status, payload = await conn.request(method, path, body, headers)
+            except (OSError, asyncio.IncompleteReadError):
+                conn.close()
+                status, payload = 0, b""
+            elapsed = time.perf_counter() - start
+            scenario.on_response(status, payload)
+            totals[status] = totals.get(status, 0) + 1
+            if now >= warmup_until:
+                latencies.append(elapsed)
+                statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        conn.close()
+
+
+async def run_scenario(name: str, port: int, concurrency: int, duration: float, warmup: float, run_id: str):
+    """Stats for the measured part, and status counts including the warmup"""
+    latencies, statuses, totals = [], {}, {}
+    started = time.monotonic()
+    warmup_until = started + warmup
+    stop = warmup_until + duration
+    await asyncio.gather(*[
+        client_loop(port, Scenario(name, random.Random(i), run_id, i), warmup_until, stop, latencies, statuses, totals)
+        for i in range(concurrency)
+    ])
+    ordered = sorted(value * 1e3 for value in latencies)
+    errors = sum(count for status, count in statuses.items() if not 200 <= status < 400)
+    return {
+        "requests": len(ordered),
+        "throughput": len(ordered) / duration,
+        "p50_ms": percentile(ordered, 50),
+        "p95_ms": percentile(ordered, 95),
+        "p99_ms": percentile(ordered, 99),
+        "max_ms": ordered[-1] if ordered else 0.0,
+        "errors": errors,
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+    }, totals
+
+
+async def wait_until_ready(port: int, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = Connection(port)
+            status, _ = await conn.request("GET", "/config")
+            conn.close()
+            if status == 200:
+                return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("server did not start")
+
+
+# ------------------- Results -------------------
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results: dict):
+    print(f"{'scenario':<10} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8} {'errors':>7}")
+    for name, stats in results["scenarios"].items():
+        line = (f"{name:<10} {stats['throughput']:>9.0f} {stats['p50_ms']:>8.2f} {stats['p95_ms']:>8.2f} "
+                f"{stats['p99_ms']:>8.2f} {stats['max_ms']:>8.1f} {stats['errors']:>7}")
+        if "mail_delivered" in stats:
+            line += f"   mail {stats['mail_delivered']}/{stats['mail_expected']} in {stats['mail_drain_s']:.1f}s"
+        print(line)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """Print the change per metric; returns the regressions beyond ``threshold`` percent"""
+    regressions = []
+    print(f"\nAgainst {baseline.get('revision', '?')} ({baseline.get('started_at', '?')}):")
+    if baseline.get("config") != results["config"]:
+        print(f"  (baseline ran with different settings: {baseline.get('config')})")
+    for name, stats in results["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        changes = []
+        for metric, higher_is_better in (("throughput", True), ("p95_ms", False), ("p99_ms", False)):
+            if not before[metric]:
+                continue
+            delta = (stats[metric] - before[metric]) / before[metric] * 100
+            worse = -delta if higher_is_better else delta
+            flag = " !" if worse > threshold else ""
+            changes.append(f"{metric} {delta:+.1f}%{flag}")
+            if worse > threshold:
+                regressions.append(f"{name} {metric} {delta:+.1f}%")
+        print(f"  {name:<10} " + "  ".join(changes))
+    return regressions
+
+
+# ------------------- Main -------------------
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=10000)
+    parser.add_argument("--subscribers", type=int, default=10000)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="comma-separated subset of " + ", ".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=32, help="keep-alive connections per scenario")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=2.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "smallcap-loadtest"),
+                        help="where seeded databases are cached between runs")
+    parser.add_argument("--smtp-delay", type=float, default=0.0, help="seconds the fake provider takes per message")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change counted as a regression")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    seeded = seeded_data_dir(args.data_dir, args.posts, args.subscribers)
+    run_dir = tempfile.mkdtemp(prefix="smallcap-loadtest-run-")
+    data_dir = os.path.join(run_dir, "data")
+    os.makedirs(data_dir)
+    shutil.copy(os.path.join(seeded, "smallcap.db"), data_dir)
+    static_dir = os.path.join(run_dir, "static")
+    write_site(static_dir)
+
+    sink = SMTPSink(message_delay=args.smtp_delay).start()
+    port = free_port()
+    env = dict(
+        os.environ, DATA_DIR=data_dir, STATIC_DIR=static_dir, API_KEY=API_KEY, SMALLCAP_MIGRATIONS_DONE="1",
+        SMTP_HOST=sink.host, SMTP_PORT=str(sink.port), SMTP_USE_TLS="false",
+        EMAIL_ADDRESS="alerts@example.com", EMAIL_PASSWORD="loadtest", DOMAIN_SENDER="alerts@example.com",
+        # Every connection comes from 127.0.0.1
+        RATE_LIMIT_IP_PER_MINUTE="0", RATE_LIMIT_EMAIL_PER_HOUR="0",
+        LOG_LEVEL="WARNING",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(args.workers),
+         "--no-access-log", "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env,
+    )
+    run_id = uuid.uuid4().hex[:8]
+    results = {
+        "revision": git_revision(),
+        "started_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "config": {key: getattr(args, key) for key in
+                   ("posts", "subscribers", "concurrency", "duration", "warmup", "workers", "smtp_delay")},
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "scenarios": {},
+    }
+    try:
+        asyncio.run(wait_until_ready(port))
+        for name in scenarios:
+            messages_before = sink.messages
+            stats, totals = asyncio.run(run_scenario(name, port, args.concurrency, args.duration, args.warmup, run_id))
+            if name == "subscribe":
+                # Welcome mails leave through the outbox after the response; time how long it takes to drain
+                expected = totals.get(201, 0)
+                drain_started = time.monotonic()
+                sink.wait_for(messages_before + expected, timeout=60)
+                stats["mail_expected"] = expected
+                stats["mail_delivered"] = sink.messages - messages_before
+                stats["mail_drain_s"] = time.monotonic() - drain_started
+            results["scenarios"][name] = stats
+    finally:
+        server.terminate()
+        server.wait()
+        sink.stop()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("Regressions: " + "; ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
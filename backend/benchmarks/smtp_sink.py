@@ -0,0 +1,148 @@
+"""Local SMTP stand-in for offline delivery benchmarks.
+
+Accepts any login and any recipient, discards message bodies and counts
+what it received. ``--connect-delay`` and ``--message-delay`` emulate the
+handshake and per-message latency of a real provider.
+
+    python -m benchmarks.smtp_sink --port 2525 --connect-delay 0.3
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+
+
+class SMTPSink:
+    """Minimal SMTP server that runs in a background thread"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, connect_delay: float = 0.0,
+                 message_delay: float = 0.0):
+        self.host = host
+        self.port = port
+        self.connect_delay = connect_delay
+        self.message_delay = message_delay
+        self.connections = 0
+        self.messages = 0
+        self.recipients = 0
+        self.bytes_received = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        if self.connect_delay:
+            await asyncio.sleep(self.connect_delay)
+
+        def reply(line: str):
+            writer.write((line + "\r\n").encode())
+
+        reply("220 smtp-sink ready")
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.decode(errors="replace").rstrip("\r\n")
+                verb = line.split(" ", 1)[0].upper()
+                if verb == "EHLO":
+                    reply("250-smtp-sink")
+                    reply("250-AUTH PLAIN LOGIN")
+                    reply("250 8BITMIME")
+                elif verb == "HELO":
+                    reply("250 smtp-sink")
+                elif verb == "AUTH":
+                    parts = line.split()
+                    if parts[1].upper() == "LOGIN":
+                        for _ in range(2 - (len(parts) > 2)):
+                            reply("334 ")
+                            await writer.drain()
+                            await reader.readline()
+                    reply("235 Authentication successful")
+                elif verb == "MAIL":
+                    reply("250 OK")
+                elif verb == "RCPT":
+                    self.recipients += 1
+                    reply("250 OK")
+                elif verb == "DATA":
+                    reply("354 End data with <CR><LF>.<CR><LF>")
+                    await writer.drain()
+                    while True:
+                        data = await reader.readline()
+                        if not data or data in (b".\r\n", b".\n"):
+                            break
+                        self.bytes_received += len(data)
+                    if self.message_delay:
+                        await asyncio.sleep(self.message_delay)
+                    self.messages += 1
+                    reply("250 OK queued")
+                elif verb in ("RSET", "NOOP"):
+                    reply("250 OK")
+                elif verb == "QUIT":
+                    reply("221 Bye")
+                    await writer.drain()
+                    break
+                else:
+                    reply("502 Command not implemented")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=1024)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._server.close()
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    def start(self) -> "SMTPSink":
+        self._thread = threading.Thread(target=self._run, name="smtp-sink", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def wait_for(self, messages: int, timeout: float = 60.0) -> bool:
+        """Block until ``messages`` have been received"""
+        deadline = time.monotonic() + timeout
+        while self.messages < messages:
+            if time.monotonic() > deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local SMTP sink")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--connect-delay", type=float, default=0.0, help="seconds per new session")
+    parser.add_argument("--message-delay", type=float, default=0.0, help="seconds per message")
+    args = parser.parse_args()
+
+    sink = SMTPSink(args.host, args.port, args.connect_delay, args.message_delay).start()
+    print(f"SMTP sink listening on {sink.host}:{sink.port}")
+    try:
+        while True:
+            time.sleep(5)
+            print(f"connections={sink.connections} messages={sink.messages}")
+    except KeyboardInterrupt:
+        sink.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,75 @@
-import sqlite3
-import csv
-
-# Connect to the SQLite database
-conn = sqlite3.connect("subscribers.db")
-cursor = conn.cursor()
-
-# Query to select all data from the subscribers table
-cursor.execute("SELECT * FROM subscribers")
-
-# Fetch all rows
-rows = cursor.fetchall()
-
-# Get column names
-column_names = [description[0] for description in cursor.description]
-
-# Open a CSV file and write the data
-with open("subscribers.csv", "w", newline="", encoding="utf-8") as file:
-    writer = csv.writer(file)
-    
-    # Write column names
-    writer.writerow(column_names)
-    
-    # Write data rows
-    writer.writerows(rows)
-
-# Close the connection
-conn.close()
-
-print("Data successfully exported to subscribers.csv")
\ No newline at end of file
+"""Export or import subscribers from the command line.
+
+Uses the database configured in app.config (DATA_DIR) and streams in
+batches, so it works the same for ten rows or a million:
+
+    python check_subscribers.py                          # export to subscribers.csv
+    python check_subscribers.py export -o subs.ndjson --format ndjson
+    python check_subscribers.py import subs.csv
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from app.database.base import create_tables
+from app.utils.subscriber_io import FORMATS, iter_export, import_subscribers
+
+
+def guess_format(path: str, fmt: str) -> str:
+    if fmt:
+        return fmt
+    return "ndjson" if os.path.splitext(path)[1].lower() in (".ndjson", ".jsonl") else "csv"
+
+
+def export_command(args):
+    fmt = guess_format(args.output, args.format)
+    if args.output == "-":
+        for chunk in iter_export(fmt):
+            sys.stdout.write(chunk)
+        return
+    count = 0
+    with open(args.output, "w", newline="", encoding="utf-8") as file:
+        for chunk in iter_export(fmt):
+            file.write(chunk)
+            count += chunk.count("\n")
+    if fmt == "csv":
+        count -= 1  # header row
+    print(f"Exported {count} subscribers to {args.output}")
+
+
+def import_command(args):
+    fmt = guess_format(args.input, args.format)
+    if args.input == "-":
+        report = import_subscribers(sys.stdin, fmt)
+    else:
+        with open(args.input, newline="", encoding="utf-8-sig") as file:
+            report = import_subscribers(file, fmt)
+    print(json.dumps(report, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export or import subscribers")
+    subcommands = parser.add_subparsers(dest="command")
+
+    export_parser = subcommands.add_parser("export", help="write every subscriber to a file")
+    export_parser.add_argument("-o", "--output", default="subscribers.csv", help="file to write, or - for stdout")
+    export_parser.add_argument("--format", choices=FORMATS)
+
+    import_parser = subcommands.add_parser("import", help="add subscribers from a CSV or NDJSON file")
+    import_parser.add_argument("input", help="file to read, or - for stdin")
+    import_parser.add_argument("--format", choices=FORMATS)
+
+    args = parser.parse_args()
+    create_tables()
+    if args.command == "import":
+        import_command(args)
+    else:
+        if args.command is None:
+            args.output, args.format = "subscribers.csv", None
+        export_command(args)
+
+
+if __name__ == "__main__":
+    main()
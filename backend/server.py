@@ -1,6 +1,57 @@
 
+import argparse
+import logging
+import os
+
 import uvicorn
-from app.main import app
+
+from app.config import (
+    FORWARDED_ALLOW_IPS, SERVER_HOST, SERVER_PORT, SERVER_WORKERS, SERVER_GRACEFUL_SHUTDOWN_TIMEOUT,
+)
+from app.utils.log import configure_logging
+
+logger = logging.getLogger("server")
+
+def worker_count() -> int:
+    """Configured worker count, or one per CPU"""
+    if SERVER_WORKERS > 0:
+        return SERVER_WORKERS
+    return os.cpu_count() or 1
+
+def run_production(workers: int):
+    """Migrate once in this process, then serve with N workers and no reloader"""
+    from app.database.base import create_tables, SKIP_MIGRATIONS_ENV
+    
+    create_tables()
+    # Inherited by the worker processes so none of them repeats the migration
+    os.environ[SKIP_MIGRATIONS_ENV] = "1"
+    logger.info("Starting production server on %s:%s with %d workers", SERVER_HOST, SERVER_PORT, workers)
+    uvicorn.run(
+        "app.main:app",
+        host=SERVER_HOST,
+        port=SERVER_PORT,
+        workers=workers,
+        reload=False,
+        # Only the configured proxies may set the client address the rate limits key on
+        proxy_headers=True,
+        forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+        access_log=False,
+        # Logging is configured by app.utils.log in each process, not by uvicorn
+        log_config=None,
+        # Live signal streams never finish by themselves
+        timeout_graceful_shutdown=SERVER_GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8111, reload=True)
+    parser = argparse.ArgumentParser(description="Run the SMALLCAP Signal API")
+    parser.add_argument("--prod", action="store_true", help="multi-worker production mode without reload")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes in production mode")
+    args = parser.parse_args()
+    configure_logging()
+    
+    if args.prod:
+        run_production(args.workers or worker_count())
+    else:
+        uvicorn.run("app.main:app", host=SERVER_HOST, port=SERVER_PORT, reload=True, log_config=None,
+                    proxy_headers=True, forwarded_allow_ips=FORWARDED_ALLOW_IPS,
+                    timeout_graceful_shutdown=SERVER_GRACEFUL_SHUTDOWN_TIMEOUT)
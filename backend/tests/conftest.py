@@ -0,0 +1,69 @@
+"""Shared fixtures: every test run gets its own ``DATA_DIR`` and an empty database per test.
+
+Settings are read when ``app.config`` is imported, so they are set here
+before anything from ``app`` is.
+"""
+
+import os
+import tempfile
+
+os.environ["DATA_DIR"] = tempfile.mkdtemp(prefix="smallcap-tests-")
+os.environ["STATIC_DIR"] = tempfile.mkdtemp(prefix="smallcap-tests-static-")
+os.environ["API_KEY"] = "test-key"
+os.environ["API_KEY_HASHES"] = ""
+# No background mail delivery and no per-address limits between tests
+os.environ["EMAIL_PASSWORD"] = ""
+os.environ["RATE_LIMIT_IP_PER_MINUTE"] = "0"
+os.environ["RATE_LIMIT_EMAIL_PER_HOUR"] = "0"
+
+import pytest  # noqa: E402
+
+from app import config  # noqa: E402
+
+if config.DATA_DIR != os.environ["DATA_DIR"]:
+    # app/.env overrides the environment; never run against a real database
+    pytest.exit(f"DATA_DIR is {config.DATA_DIR} (set in app/.env?); tests need their own", returncode=2)
+
+from app.database.base import Base, create_tables, engine  # noqa: E402
+from app.models.cache_version import CacheVersionModel  # noqa: E402
+
+API_KEY = os.environ["API_KEY"]
+
+
+@pytest.fixture(autouse=True)
+def database():
+    """Tables exist for each test and are emptied after it"""
+    create_tables()
+    yield engine
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            # Versions keep counting up, so no worker cache mistakes a new post set for an old one
+            if table.name != CacheVersionModel.__tablename__:
+                conn.execute(table.delete())
+
+
+@pytest.fixture
+def client():
+    from fastapi.testclient import TestClient
+
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def auth_headers():
+    return {"Authorization": f"Bearer {API_KEY}"}
+
+
+@pytest.fixture
+def create_post(client, auth_headers):
+    """``create_post(title, content=...)`` adds a post through the API and returns it"""
+
+    def create(title, content="Tariffs move small caps"):
+        response = client.post("/posts", json={"title": title, "content": content, "author": "Desk"}, headers=auth_headers)
+        assert response.status_code == 201
+        return response.json()
+
+    return create
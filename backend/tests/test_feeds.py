@@ -0,0 +1,32 @@
+import json
+from xml.etree import ElementTree
+
+from app.utils.feeds import render_atom, render_json_feed
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+POST = {
+    "id": "a1b2",
+    "title": "Tariff relief",
+    "content": "<p>Semiconductors <b>rally</b> &amp; more</p>",
+    "author": "Desk",
+    "imageUrl": None,
+    "createdAt": "2025-04-02T13:45:10",
+}
+
+
+def test_full_content_is_published_as_html():
+    entry = ElementTree.fromstring(render_atom([POST], full_content=True)).find(f"{ATOM}entry")
+    content = entry.find(f"{ATOM}content")
+    assert (content.get("type"), content.text) == ("html", POST["content"])
+
+    item = json.loads(render_json_feed([POST], full_content=True))["items"][0]
+    assert item["content_html"] == POST["content"] and "content_text" not in item
+
+
+def test_excerpts_are_published_as_text():
+    entry = ElementTree.fromstring(render_atom([POST], full_content=False)).find(f"{ATOM}entry")
+    summary = entry.find(f"{ATOM}summary")
+    assert (summary.get("type"), summary.text) == ("text", "Semiconductors rally & more")
+
+    item = json.loads(render_json_feed([POST], full_content=False))["items"][0]
+    assert item["content_text"] == "Semiconductors rally & more"
@@ -0,0 +1,144 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from app.database.base import SessionLocal
+from app.models.newsletter import NewsletterDeliveryModel, NewsletterJobModel
+from app.models.subscriber import SubscriberModel
+from app.utils.newsletter_jobs import BROADCAST, COMPLETED, PENDING, RUNNING, SENT, NewsletterScheduler, schedule_newsletter
+
+SUBSCRIBERS = [f"reader{i}@example.com" for i in range(5)]
+
+
+class RecordingPool:
+    """Records recipients; ``after_send`` runs after each one (e.g. to stop the scheduler)"""
+
+    def __init__(self, after_send=None):
+        self.after_send = after_send
+        self.sent = []
+        self._lock = threading.Lock()
+
+        self.sent_at = []
+
+    def send(self, sender, recipient, message, kind=None):
+        with self._lock:
+            self.sent.append(recipient)
+            self.sent_at.append(time.monotonic())
+            count = len(self.sent)
+        if self.after_send is not None:
+            self.after_send(count)
+
+
+def seed_job() -> str:
+    with SessionLocal() as db:
+        for email in SUBSCRIBERS:
+            db.add(SubscriberModel(email=email, subscribed_at=datetime.utcnow()))
+        job_id = schedule_newsletter(db, BROADCAST, "Signal", "A post went live").id
+        db.commit()
+    return job_id
+
+
+def scheduler(pool, **options) -> NewsletterScheduler:
+    defaults = dict(workers=1, batch_size=2, rate_limit=0, sender="news@example.com", digest_interval_hours=0)
+    return NewsletterScheduler(pool=pool, **dict(defaults, **options))
+
+
+def load_job(job_id: str) -> NewsletterJobModel:
+    with SessionLocal() as db:
+        return db.get(NewsletterJobModel, job_id)
+
+
+def delivery_statuses(job_id: str) -> dict:
+    with SessionLocal() as db:
+        return dict(db.execute(
+            select(NewsletterDeliveryModel.email, NewsletterDeliveryModel.status)
+            .where(NewsletterDeliveryModel.job_id == job_id)
+        ).all())
+
+
+def test_job_is_sent_to_every_subscriber_once():
+    job_id = seed_job()
+    pool = RecordingPool()
+
+    assert scheduler(pool).run_once() is True
+
+    job = load_job(job_id)
+    assert sorted(pool.sent) == SUBSCRIBERS
+    assert (job.status, job.total, job.sent, job.failed) == (COMPLETED, 5, 5, 0)
+    assert set(delivery_statuses(job_id).values()) == {SENT}
+
+
+def test_stopped_job_is_resumed_by_another_worker_without_resending():
+    job_id = seed_job()
+    first = scheduler(None)
+    # Shut down after the first batch of two, as a deploy would
+    first.pool = RecordingPool(after_send=lambda count: count == 2 and first._stopping.set())
+    first.run_once()
+
+    job = load_job(job_id)
+    assert (job.status, job.sent, job.lease_until) == (RUNNING, 2, None)
+    assert list(delivery_statuses(job_id).values()).count(PENDING) == 3
+
+    second_pool = RecordingPool()
+    second = scheduler(second_pool)
+    assert second.run_once() is True
+
+    job = load_job(job_id)
+    assert sorted(first.pool.sent + second_pool.sent) == SUBSCRIBERS
+    assert (job.status, job.sent, job.claimed_by) == (COMPLETED, 5, second.worker_id)
+
+
+def test_leased_job_is_left_alone_until_the_lease_expires():
+    job_id = seed_job()
+    crashed = scheduler(RecordingPool())
+    # Claimed and snapshotted, then the worker died without releasing it
+    job = crashed._claim()
+    crashed._snapshot_recipients(job)
+
+    other_pool = RecordingPool()
+    other = scheduler(other_pool)
+    assert other.run_once() is False
+    assert other_pool.sent == []
+
+    with SessionLocal() as db:
+        db.execute(
+            update(NewsletterJobModel)
+            .where(NewsletterJobModel.id == job_id)
+            .values(lease_until=datetime.utcnow() - timedelta(seconds=1))
+        )
+        db.commit()
+    assert other.run_once() is True
+
+    job = load_job(job_id)
+    assert sorted(other_pool.sent) == SUBSCRIBERS
+    # The resumed job keeps the recipient list taken when it first started
+    assert (job.status, job.total, job.sent) == (COMPLETED, 5, 5)
+
+
+def test_future_job_is_not_claimed():
+    with SessionLocal() as db:
+        schedule_newsletter(db, BROADCAST, "Later", "Not yet", send_at=datetime.utcnow() + timedelta(hours=1))
+        db.commit()
+
+    assert scheduler(RecordingPool()).run_once() is False
+
+
+def test_rate_limit_holds_across_workers_and_jobs():
+    first_job, second_job = seed_job(), None
+    with SessionLocal() as db:
+        second_job = schedule_newsletter(db, BROADCAST, "Signal again", "Another post went live").id
+        db.commit()
+    pool = RecordingPool()
+    window = 0.4
+    # Two workers sharing one database, each taking whichever job is due
+    workers = [scheduler(pool, workers=2, batch_size=5, rate_limit=3, rate_window=window) for _ in range(2)]
+
+    while any(worker.run_once() for worker in workers):
+        pass
+
+    assert (load_job(first_job).sent, load_job(second_job).sent) == (5, 5)
+    assert len(pool.sent_at) == 10
+    for start in pool.sent_at:
+        assert sum(start <= moment < start + window for moment in pool.sent_at) <= 3
@@ -0,0 +1,118 @@
+import smtplib
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from app.config import OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE, OUTBOX_RETRY_MAX
+from app.database.base import SessionLocal
+from app.models.outbox import OutboxMessageModel
+from app.utils.outbox import DEAD, PENDING, SENT, OutboxDispatcher, enqueue_email, retry_delay
+
+
+class FakePool:
+    """Records what was sent, or raises ``error`` for every message"""
+
+    def __init__(self, error=None):
+        self.error = error
+        self.sent = []
+
+    def send(self, sender, recipient, message, kind=None):
+        if self.error is not None:
+            raise self.error
+        self.sent.append(recipient)
+
+
+def queue(recipient="reader@example.com") -> str:
+    with SessionLocal() as db:
+        message_id = enqueue_email(db, "welcome", recipient, "Subject: hi\n\nhello", sender="news@example.com").id
+        db.commit()
+    return message_id
+
+
+def load(message_id: str) -> OutboxMessageModel:
+    with SessionLocal() as db:
+        return db.get(OutboxMessageModel, message_id)
+
+
+def make_due(message_id: str, **values):
+    with SessionLocal() as db:
+        db.execute(
+            update(OutboxMessageModel)
+            .where(OutboxMessageModel.id == message_id)
+            .values(next_attempt_at=datetime.utcnow() - timedelta(seconds=1), **values)
+        )
+        db.commit()
+
+
+def dispatcher(pool) -> OutboxDispatcher:
+    return OutboxDispatcher(pool=pool, workers=1)
+
+
+def test_delivered_message_is_marked_sent():
+    message_id = queue()
+    pool = FakePool()
+
+    assert dispatcher(pool).run_once() == 1
+
+    message = load(message_id)
+    assert pool.sent == ["reader@example.com"]
+    assert (message.status, message.attempts) == (SENT, 1)
+    assert message.sent_at is not None
+
+
+def test_transient_failure_is_retried_after_backoff():
+    message_id = queue()
+    outbox = dispatcher(FakePool(smtplib.SMTPServerDisconnected("gone")))
+    before = datetime.utcnow()
+
+    assert outbox.run_once() == 1
+    # Not due again until the backoff has passed
+    assert outbox.run_once() == 0
+
+    message = load(message_id)
+    assert (message.status, message.attempts) == (PENDING, 1)
+    assert message.last_error == "gone"
+    delay = (message.next_attempt_at - before).total_seconds()
+    assert OUTBOX_RETRY_BASE <= delay <= OUTBOX_RETRY_BASE * 1.1 + 1
+
+
+def test_retry_delay_doubles_up_to_the_maximum():
+    assert OUTBOX_RETRY_BASE <= retry_delay(1) <= OUTBOX_RETRY_BASE * 1.1
+    assert OUTBOX_RETRY_BASE * 4 <= retry_delay(3) <= OUTBOX_RETRY_BASE * 4 * 1.1
+    assert OUTBOX_RETRY_MAX <= retry_delay(50) <= OUTBOX_RETRY_MAX * 1.1
+
+
+def test_last_attempt_is_dead_lettered():
+    message_id = queue()
+    make_due(message_id, attempts=OUTBOX_MAX_ATTEMPTS - 1)
+
+    dispatcher(FakePool(smtplib.SMTPServerDisconnected("gone"))).run_once()
+
+    message = load(message_id)
+    assert (message.status, message.attempts) == (DEAD, OUTBOX_MAX_ATTEMPTS)
+
+
+def test_permanent_rejection_is_dead_lettered_at_once():
+    message_id = queue()
+    refused = smtplib.SMTPRecipientsRefused({"reader@example.com": (550, b"no such user")})
+
+    dispatcher(FakePool(refused)).run_once()
+
+    message = load(message_id)
+    assert (message.status, message.attempts) == (DEAD, 1)
+
+
+def test_message_of_a_crashed_sender_is_claimed_again_after_its_lease():
+    message_id = queue()
+    crashed = dispatcher(FakePool())
+    # Claimed, then the process died before delivering
+    assert [message["id"] for message in crashed._claim()] == [message_id]
+    assert dispatcher(FakePool()).run_once() == 0
+
+    make_due(message_id)
+    pool = FakePool()
+    assert dispatcher(pool).run_once() == 1
+
+    message = load(message_id)
+    assert pool.sent == ["reader@example.com"]
+    assert (message.status, message.attempts) == (SENT, 2)
@@ -0,0 +1,58 @@
+import pytest
+from fastapi import HTTPException
+
+from app.utils.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2025-04-02T13:45:10.123456", "a1b2")
+    created_at, post_id = decode_cursor(cursor)
+    assert (created_at.isoformat(), post_id) == ("2025-04-02T13:45:10.123456", "a1b2")
+    assert "=" not in cursor
+
+
+def test_malformed_cursor_is_rejected():
+    with pytest.raises(HTTPException) as error:
+        decode_cursor("not-a-cursor")
+    assert error.value.status_code == 400
+
+
+def test_pages_cover_every_post_once_newest_first(client, create_post):
+    ids = [create_post(f"Post {i}")["id"] for i in range(5)]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, "summary": "true"}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/posts", params=params).json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next"]
+        if cursor is None:
+            break
+
+    assert seen == ids[::-1]
+    assert "excerpt" in page["items"][0] and "content" not in page["items"][0]
+
+
+def test_excerpt_is_text_cut_after_the_markup_is_removed(client, create_post):
+    create_post("Short", content="<p>Tariffs &amp; <b>small caps</b></p>")
+    # Mostly markup: more than a page reads of the body before the text runs out
+    padding = '<span class="x"></span>' * 200
+    create_post("Long", content=f"<p>{padding}{'word ' * 100}</p>")
+
+    items = client.get("/posts", params={"summary": "true"}).json()["items"]
+    long, short = items
+
+    assert (short["excerpt"], short["truncated"]) == ("Tariffs & small caps", False)
+    assert long["truncated"] is True
+    assert long["excerpt"].startswith("word word") and long["excerpt"].endswith("…")
+    assert "<" not in long["excerpt"] and len(long["excerpt"]) <= 281
+
+
+def test_posts_without_page_parameters_is_a_plain_list(client, create_post):
+    post = create_post("Only post")
+
+    assert client.get("/posts").json() == [post]
+    assert client.get(f"/posts/{post['id']}").json() == post
+    assert client.get("/posts/missing").status_code == 404
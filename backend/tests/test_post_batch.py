@@ -0,0 +1,24 @@
+def test_batch_skips_source_ids_already_stored_or_repeated(client, auth_headers):
+    item = {"title": "Signal", "content": "Body", "author": "Desk"}
+    batch = {"posts": [dict(item, sourceId="truth-1"), dict(item, sourceId="truth-2"), dict(item, sourceId="truth-1")]}
+
+    first = client.post("/posts/batch", json=batch, headers=auth_headers).json()
+    assert (first["created"], first["duplicates"]) == (2, 1)
+    assert [result["status"] for result in first["results"]] == ["created", "created", "duplicate"]
+    assert first["results"][2]["id"] == first["results"][0]["id"]
+
+    retry = client.post("/posts/batch", json=batch, headers=auth_headers).json()
+    assert (retry["created"], retry["duplicates"]) == (0, 3)
+    assert [result["id"] for result in retry["results"]] == [result["id"] for result in first["results"]]
+    assert len(client.get("/posts").json()) == 2
+
+
+def test_idempotency_key_keys_items_without_source_ids(client, auth_headers):
+    batch = {"posts": [{"title": "One", "content": "Body", "author": "Desk"}]}
+    headers = dict(auth_headers, **{"Idempotency-Key": "upload-7"})
+
+    first = client.post("/posts/batch", json=batch, headers=headers).json()
+    retry = client.post("/posts/batch", json=batch, headers=headers).json()
+
+    assert first["results"][0]["sourceId"] == "upload-7:0"
+    assert (retry["created"], retry["results"][0]["id"]) == (0, first["results"][0]["id"])
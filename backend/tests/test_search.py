@@ -0,0 +1,18 @@
+def test_search_index_follows_creates_and_deletes(client, auth_headers, create_post):
+    post = create_post("Tariff relief", content="Semiconductors rally on the news")
+
+    assert [result["id"] for result in client.get("/posts/search", params={"q": "semicond"}).json()] == [post["id"]]
+
+    assert client.delete(f"/posts/{post['id']}", headers=auth_headers).status_code == 204
+    assert client.get("/posts/search", params={"q": "semicond"}).json() == []
+
+
+def test_snippet_keeps_only_the_match_markers(client, create_post):
+    create_post("Chips", content='<p class="lead">Semiconductors <b>rally</b> &amp; <a href="/x">more</a></p>')
+
+    snippet = client.get("/posts/search", params={"q": "rally"}).json()[0]["snippet"]
+
+    assert snippet == "Semiconductors <mark>rally</mark> &amp; more"
+    # Tag names and attributes are indexed too, but never shown
+    snippet = client.get("/posts/search", params={"q": "b lead"}).json()[0]["snippet"]
+    assert "<mark>" not in snippet and "&lt;" not in snippet
@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, text
+
+from app.database.base import SessionLocal, engine
+from app.database.dedupe import UNIQUE_INDEX, merge_duplicate_subscribers
+from app.models.subscriber import SubscriberModel, SubscriberSegmentModel, email_key
+from app.utils.subscriber_filter import BloomFilter, SubscriberFilter, subscriber_filter
+
+NEW = "Thank you for subscribing!"
+ALREADY = "You're already subscribed!"
+
+
+def subscribe(client, email: str) -> str:
+    response = client.post("/subscribe", json={"email": email})
+    assert response.status_code == 201
+    return response.json()["message"]
+
+
+def stored_emails() -> list:
+    with SessionLocal() as db:
+        return db.scalars(select(SubscriberModel.email)).all()
+
+
+def test_email_key_folds_ascii_case_only():
+    assert email_key(" Reader@Example.COM ") == "reader@example.com"
+    # SQLite's lower() leaves non-ASCII letters alone, so the key must too
+    assert email_key("Ärger@Example.com") == "Ärger@example.com"
+
+
+def test_subscribing_in_another_case_is_a_duplicate(client):
+    assert subscribe(client, "Reader@example.com") == NEW
+    assert subscribe(client, "READER@Example.com") == ALREADY
+
+    # Stored as first typed (the schema already lowercases the domain)
+    assert stored_emails() == ["Reader@example.com"]
+
+
+def test_address_added_by_another_worker_is_caught_by_the_unique_index(client):
+    subscriber_filter.wait()
+    with SessionLocal() as db:
+        db.add(SubscriberModel(email="elsewhere@example.com", subscribed_at=datetime.utcnow()))
+        db.commit()
+    # This worker's filter has never seen it, so the lookup is skipped
+    assert not subscriber_filter.might_contain("Elsewhere@example.com")
+
+    assert subscribe(client, "Elsewhere@example.com") == ALREADY
+    assert stored_emails() == ["elsewhere@example.com"]
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    members = [f"member{i}@example.com" for i in range(5000)]
+    bloom = BloomFilter(len(members), 0.01)
+    bloom.update(members)
+
+    assert all(member in bloom for member in members)
+    false_positives = sum(f"visitor{i}@example.com" in bloom for i in range(5000))
+    assert false_positives < 5000 * 0.03
+
+
+def test_filter_treats_every_address_as_known_until_loaded():
+    members = SubscriberFilter(error_rate=0.01, min_capacity=10, bind=engine)
+    assert members.might_contain("anyone@example.com")
+
+    with SessionLocal() as db:
+        db.add(SubscriberModel(email="Loaded@Example.com", subscribed_at=datetime.utcnow()))
+        db.commit()
+    members.start()
+    members.wait()
+
+    assert members.ready
+    assert members.might_contain("loaded@example.com")
+    members.add(["Added@Example.com"])
+    assert members.might_contain("ADDED@example.com")
+
+
+def test_case_duplicates_merge_into_the_earliest_subscription():
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        # An older database from before the unique index
+        conn.execute(text(f"DROP INDEX {UNIQUE_INDEX}"))
+    with SessionLocal() as db:
+        db.add(SubscriberModel(email="Reader@Example.com", subscribed_at=now - timedelta(days=2)))
+        db.add(SubscriberModel(email="reader@example.com", subscribed_at=now))
+        db.add(SubscriberSegmentModel(segment="ticker:abcd", email="reader@example.com"))
+        db.commit()
+
+    groups = merge_duplicate_subscribers(engine)
+
+    assert groups == {"reader@example.com": ["Reader@Example.com", "reader@example.com"]}
+    assert stored_emails() == ["Reader@Example.com"]
+    with SessionLocal() as db:
+        assert db.scalars(select(SubscriberSegmentModel.email)).all() == ["Reader@Example.com"]
+        assert db.scalar(select(func.count()).select_from(SubscriberModel)) == 1
+
+
+def test_subscriber_list_requires_the_api_key(client, auth_headers):
+    subscribe(client, "reader@example.com")
+
+    assert client.get("/subscribers", headers={"Authorization": "Bearer wrong-key"}).status_code == 401
+    listed = client.get("/subscribers", headers=auth_headers).json()
+    assert [subscriber["email"] for subscriber in listed] == ["reader@example.com"]
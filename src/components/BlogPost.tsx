@@ -11,6 +11,8 @@ export interface Post {
   author: string;
   createdAt: string;
   imageUrl?: string;
+  excerpt?: string;  // Plain-text start of content, shown in lists instead of it
+  truncated?: boolean;  // The excerpt stops short of the end; the post page has the rest
 }
 
 interface BlogPostProps {
@@ -56,10 +58,19 @@ const BlogPost = ({ post }: BlogPostProps) => {
             />
           </div>
         )}
-        <div 
-          className="blog-post whitespace-pre-wrap break-words"
-          dangerouslySetInnerHTML={{ __html: post.content }}
-        />
+        {post.excerpt !== undefined ? (
+          <p className="blog-post whitespace-pre-wrap break-words">{post.excerpt}</p>
+        ) : (
+          <div 
+            className="blog-post whitespace-pre-wrap break-words"
+            dangerouslySetInnerHTML={{ __html: post.content }}
+          />
+        )}
+        {post.truncated && (
+          <Link to={`/post/${post.id}`} className="inline-block mt-4 text-maga-red hover:underline">
+            Read more
+          </Link>
+        )}
       </CardContent>
     </Card>
   );
@@ -4,6 +4,7 @@ import { useSearchParams } from "react-router-dom";
 import Admin from "@/pages/Admin";
 import NotFound from "@/pages/NotFound";
 import { useQuery } from "@tanstack/react-query";
+import { adminAuthorization } from "@/lib/adminSession";
 
 const ProtectedAdminRoute = () => {
   const [searchParams] = useSearchParams();
@@ -28,16 +29,9 @@ const ProtectedAdminRoute = () => {
       const verifyKey = async () => {
         try {
           console.log("Attempting to verify key:", urlKey);
-          const response = await fetch("https://www.smallcapsignal.com/verify-key", {
-            method: "POST",
-            headers: {
-              "Content-Type": "application/json",
-              "Authorization": `Bearer ${urlKey}`
-            },
-          });
-          
-          console.log("Key verification response:", response.status);
-          setIsAuthorized(response.ok);
+          // Also starts the session whose token later admin requests send
+          await adminAuthorization(urlKey);
+          setIsAuthorized(true);
         } catch (error) {
           console.error("Key verification failed:", error);
           setIsAuthorized(false);
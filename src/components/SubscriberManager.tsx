@@ -9,6 +9,7 @@ import { AlertDialog, AlertDialogAction, AlertDialogCancel, AlertDialogContent,
 import { Trash2, UserPlus, Users } from "lucide-react";
 import { toast } from "sonner";
 import { useQuery, useQueryClient, useMutation } from "@tanstack/react-query";
+import { adminAuthorization, clearAdminSession } from "@/lib/adminSession";
 
 interface Subscriber {
   email: string;
@@ -26,10 +27,19 @@ const SubscriberManager = ({ apiKey }: SubscriberManagerProps) => {
 
   // Fetch subscribers
   const { data: subscribers = [], isLoading, error } = useQuery({
-    queryKey: ["subscribers"],
+    queryKey: ["subscribers", apiKey],
+    // The list is only served with an API key
+    enabled: !!apiKey,
     queryFn: async () => {
-      const response = await fetch("https://www.smallcapsignal.com/subscribers");
+      const response = await fetch("https://www.smallcapsignal.com/subscribers", {
+        headers: {
+          "Authorization": await adminAuthorization(apiKey),
+        },
+      });
       if (!response.ok) {
+        if (response.status === 401) {
+          clearAdminSession();
+        }
         throw new Error("Failed to fetch subscribers");
       }
       return response.json();
@@ -70,10 +80,13 @@ const SubscriberManager = ({ apiKey }: SubscriberManagerProps) => {
       const response = await fetch(`https://www.smallcapsignal.com/subscribers/${encodeURIComponent(email)}`, {
         method: "DELETE",
         headers: {
-          "Authorization": `Bearer ${apiKey}`,
+          "Authorization": await adminAuthorization(apiKey),
         },
       });
       if (!response.ok) {
+        if (response.status === 401) {
+          clearAdminSession();
+        }
         throw new Error("Failed to delete subscriber");
       }
       return response.json();
@@ -143,7 +156,7 @@ const SubscriberManager = ({ apiKey }: SubscriberManagerProps) => {
           {!apiKey && (
             <div className="bg-yellow-50 border border-yellow-200 rounded-md p-4">
               <p className="text-yellow-800 text-sm">
-                Enter your API key in the main admin form below to enable subscriber deletion.
+                Enter your API key in the main admin form below to list and delete subscribers.
               </p>
             </div>
           )}
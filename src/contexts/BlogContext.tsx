@@ -1,12 +1,16 @@
 import React, { createContext, useContext, useState, useEffect } from "react";
 import { toast } from "sonner";
 import { Post } from "@/components/BlogPost";
+import { adminAuthorization, clearAdminSession } from "@/lib/adminSession";
 
 interface BlogContextType {
   posts: Post[];
   isLoading: boolean;
   isError: boolean;
+  hasMore: boolean;
+  isLoadingMore: boolean;
   fetchPosts: () => Promise<void>;
+  loadMorePosts: () => Promise<void>;
   createPost: (post: Omit<Post, 'id' | 'createdAt'>, apiKey: string) => Promise<boolean>;
   deletePost: (postId: string, apiKey: string) => Promise<boolean>;
   configStatus: {
@@ -18,6 +22,18 @@ interface BlogContextType {
 
 const BlogContext = createContext<BlogContextType | undefined>(undefined);
 
+// Lists load a page of summaries at a time; the post page fetches the full post
+const PAGE_SIZE = 20;
+const LIST_FIELDS = "id,title,excerpt,author,imageUrl,createdAt";
+
+// The server sends an excerpt as plain text, with whether it cut the content short
+interface PostSummary extends Omit<Post, "content" | "excerpt" | "truncated"> {
+  excerpt: string;
+  truncated: boolean;
+}
+
+const summaryToPost = (summary: PostSummary): Post => ({ ...summary, content: "" });
+
 interface BlogProviderProps {
   children: React.ReactNode;
 }
@@ -26,6 +42,8 @@ export const BlogProvider = ({ children }: BlogProviderProps) => {
   const [posts, setPosts] = useState<Post[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [isError, setIsError] = useState(false);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [configStatus, setConfigStatus] = useState({
     loading: true,
     apiKeyAvailable: false,
@@ -36,11 +54,6 @@ export const BlogProvider = ({ children }: BlogProviderProps) => {
   const API_URL = "https://www.smallcapsignal.com/posts";
   const CONFIG_URL = "https://www.smallcapsignal.com/config";
   
-  // Helper function to format API key consistently
-  const formatApiKey = (key: string): string => {
-    return key.startsWith("Bearer ") ? key : `Bearer ${key}`;
-  };
-  
   // Fetch configuration from the server
   useEffect(() => {
     const fetchConfig = async () => {
@@ -67,15 +80,23 @@ export const BlogProvider = ({ children }: BlogProviderProps) => {
     fetchConfig();
   }, []);
   
+  const fetchPage = async (cursor: string | null) => {
+    const params = new URLSearchParams({ limit: String(PAGE_SIZE), fields: LIST_FIELDS });
+    if (cursor) params.set("cursor", cursor);
+    const response = await fetch(`${API_URL}?${params}`);
+    if (!response.ok) throw new Error('Failed to fetch posts');
+    const data: { items: PostSummary[]; next: string | null } = await response.json();
+    return { posts: data.items.map(summaryToPost), next: data.next };
+  };
+  
   const fetchPosts = async () => {
     setIsLoading(true);
     setIsError(false);
     
     try {
-      const response = await fetch(API_URL);
-      if (!response.ok) throw new Error('Failed to fetch posts');
-      const data = await response.json();
-      setPosts(data);
+      const page = await fetchPage(null);
+      setPosts(page.posts);
+      setNextCursor(page.next);
       setIsLoading(false);
     } catch (error) {
       console.error("Error fetching posts:", error);
@@ -85,6 +106,23 @@ export const BlogProvider = ({ children }: BlogProviderProps) => {
     }
   };
   
+  const loadMorePosts = async () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    
+    try {
+      const page = await fetchPage(nextCursor);
+      // Skip posts a live signal already added
+      setPosts(prev => [...prev, ...page.posts.filter(post => !prev.some(p => p.id === post.id))]);
+      setNextCursor(page.next);
+    } catch (error) {
+      console.error("Error fetching more posts:", error);
+      toast.error("Failed to load more posts. Please try again later.");
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+  
   const createPost = async (
     post: Omit<Post, 'id' | 'createdAt'>, 
     apiKey: string
@@ -92,20 +130,18 @@ export const BlogProvider = ({ children }: BlogProviderProps) => {
     try {
       console.log("Creating post with API key provided:", !!apiKey);
       
-      // Format the API key consistently
-      const formattedKey = formatApiKey(apiKey.trim());
-      console.log("Authorization header:", formattedKey.substring(0, 8) + "...");
+      // The key is exchanged for a session token once; requests send the token
+      const authorization = await adminAuthorization(apiKey);
       
       // Additional debugging
       console.log("API key length:", apiKey.length);
-      console.log("Formatted key length:", formattedKey.length);
       console.log("Server reports API key length:", configStatus.apiKeyLength);
       
       const response = await fetch(API_URL, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
-          "Authorization": formattedKey
+          "Authorization": authorization
         },
         body: JSON.stringify(post)
       });
@@ -114,6 +150,7 @@ export const BlogProvider = ({ children }: BlogProviderProps) => {
         const errorData = await response.json().catch(() => ({ detail: "Unknown error" }));
         console.error("Error response:", response.status, errorData);
         if (response.status === 401) {
+          clearAdminSession();
           toast.error("Authentication failed: Invalid API key");
         } else {
           toast.error(errorData.detail || "Failed to create post");
@@ -139,19 +176,17 @@ export const BlogProvider = ({ children }: BlogProviderProps) => {
     try {
       console.log("Deleting post with API key provided:", !!apiKey);
       
-      // Format the API key consistently
-      const formattedKey = formatApiKey(apiKey.trim());
-      console.log("Authorization header:", formattedKey.substring(0, 8) + "...");
+      // The key is exchanged for a session token once; requests send the token
+      const authorization = await adminAuthorization(apiKey);
       
       // Additional debugging
       console.log("API key length:", apiKey.length);
-      console.log("Formatted key length:", formattedKey.length);
       console.log("Server reports API key length:", configStatus.apiKeyLength);
       
       const response = await fetch(`${API_URL}/${postId}`, {
         method: "DELETE",
         headers: {
-          "Authorization": formattedKey
+          "Authorization": authorization
         }
       });
       
@@ -159,6 +194,7 @@ export const BlogProvider = ({ children }: BlogProviderProps) => {
         const errorData = await response.json().catch(() => ({ detail: "Unknown error" }));
         console.error("Delete error response:", response.status, errorData);
         if (response.status === 401) {
+          clearAdminSession();
           toast.error("Authentication failed: Invalid API key");
         } else if (response.status === 404) {
           toast.error("Post not found");
@@ -182,12 +218,33 @@ export const BlogProvider = ({ children }: BlogProviderProps) => {
   useEffect(() => {
     fetchPosts();
   }, []);
-  
+
+  // Live signals: new and deleted posts are pushed by the server instead of polled
+  useEffect(() => {
+    const stream = new EventSource(`${API_URL}/stream`);
+
+    stream.addEventListener("post", (event) => {
+      const post: Post = JSON.parse((event as MessageEvent).data);
+      // The author's own createPost already added it
+      setPosts(prev => prev.some(p => p.id === post.id) ? prev : [post, ...prev]);
+    });
+
+    stream.addEventListener("delete", (event) => {
+      const { id } = JSON.parse((event as MessageEvent).data);
+      setPosts(prev => prev.filter(post => post.id !== id));
+    });
+
+    return () => stream.close();
+  }, []);
+
   const value = {
     posts,
     isLoading,
     isError,
+    hasMore: nextCursor !== null,
+    isLoadingMore,
     fetchPosts,
+    loadMorePosts,
     createPost,
     deletePost,
     configStatus
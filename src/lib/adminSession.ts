@@ -0,0 +1,65 @@
+// Admin requests send a short-lived session token instead of the API key.
+// The key is exchanged once at POST /verify-key; the token is reused until
+// shortly before it expires, then the key is exchanged again.
+
+const VERIFY_KEY_URL = "https://www.smallcapsignal.com/verify-key";
+// Renew this long before the server's expiry so a request never races it
+const RENEW_MARGIN_MS = 30 * 1000;
+
+interface Session {
+  key: string;
+  token: string;
+  expiresAt: number;
+}
+
+let session: Session | null = null;
+let pending: Promise<Session> | null = null;
+
+const stripBearer = (key: string): string => {
+  const trimmed = key.trim();
+  return trimmed.startsWith("Bearer ") ? trimmed.slice(7).trim() : trimmed;
+};
+
+const exchangeKey = async (key: string): Promise<Session> => {
+  const response = await fetch(VERIFY_KEY_URL, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "Authorization": `Bearer ${key}`
+    },
+  });
+  if (!response.ok) {
+    throw new Error(response.status === 401 ? "Invalid API key" : "Failed to verify API key");
+  }
+  const data = await response.json();
+  if (!data.token) {
+    // A token was presented rather than a key; keep sending it as is
+    return { key, token: key, expiresAt: Number.POSITIVE_INFINITY };
+  }
+  return { key, token: data.token, expiresAt: Date.now() + data.expiresIn * 1000 - RENEW_MARGIN_MS };
+};
+
+// The Authorization header for an admin request made with this key
+export const adminAuthorization = async (apiKey: string): Promise<string> => {
+  const key = stripBearer(apiKey);
+  if (session && session.key === key && session.expiresAt > Date.now()) {
+    return `Bearer ${session.token}`;
+  }
+  if (!pending) {
+    pending = exchangeKey(key).finally(() => {
+      pending = null;
+    });
+  }
+  const fresh = await pending;
+  if (fresh.key !== key) {
+    // The key changed while another exchange was running
+    return adminAuthorization(key);
+  }
+  session = fresh;
+  return `Bearer ${fresh.token}`;
+};
+
+// Forget the token, e.g. after a 401 because the key was removed on the server
+export const clearAdminSession = () => {
+  session = null;
+};
@@ -3,6 +3,7 @@ import Header from "@/components/Header";
 import Footer from "@/components/Footer";
 import SubscriberManager from "@/components/SubscriberManager";
 import { useBlog } from "@/contexts/BlogContext";
+import { adminAuthorization, clearAdminSession } from "@/lib/adminSession";
 import { Button } from "@/components/ui/button";
 import { Card, CardContent, CardHeader, CardTitle } from "@/components/ui/card";
 import { Input } from "@/components/ui/input";
@@ -17,7 +18,7 @@ import { Trash2, AlertCircle, CheckCircle, Send } from "lucide-react";
 import { Alert, AlertDescription, AlertTitle } from "@/components/ui/alert";
 
 const Admin = () => {
-  const { posts, createPost, deletePost, configStatus } = useBlog();
+  const { posts, createPost, deletePost, configStatus, hasMore, isLoadingMore, loadMorePosts } = useBlog();
   const [title, setTitle] = useState("");
   const [content, setContent] = useState("");
   const [author, setAuthor] = useState("");
@@ -98,7 +99,7 @@ const Admin = () => {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
-          "Authorization": `Bearer ${apiKey}`,
+          "Authorization": await adminAuthorization(apiKey),
         },
         body: JSON.stringify({
           subject: emailSubject,
@@ -113,6 +114,9 @@ const Admin = () => {
         setEmailSubject("");
         setEmailMessage("");
       } else {
+        if (response.status === 401) {
+          clearAdminSession();
+        }
         toast.error(data.detail || "Failed to send newsletter");
       }
       
@@ -317,6 +321,13 @@ const Admin = () => {
                       </TableBody>
                     </Table>
                   )}
+                  {hasMore && (
+                    <div className="flex justify-center mt-4">
+                      <Button variant="outline" onClick={loadMorePosts} disabled={isLoadingMore}>
+                        {isLoadingMore ? "Loading..." : "Load more posts"}
+                      </Button>
+                    </div>
+                  )}
                 </CardContent>
               </Card>
             </TabsContent>
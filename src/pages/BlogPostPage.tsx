@@ -14,20 +14,15 @@ const BlogPostPage = () => {
   const { data: post, isLoading, isError } = useQuery({
     queryKey: ["post", id],
     queryFn: async () => {
-      // Use the available posts from the main feed
-      // This avoids having to create a new endpoint just for individual posts
-      const response = await fetch("https://www.smallcapsignal.com/posts");
-      if (!response.ok) {
-        throw new Error("Failed to fetch posts");
-      }
-      const posts: Post[] = await response.json();
-      const foundPost = posts.find(p => p.id === id);
-      
-      if (!foundPost) {
+      const response = await fetch(`https://www.smallcapsignal.com/posts/${encodeURIComponent(id ?? "")}`);
+      if (response.status === 404) {
         throw new Error("Post not found");
       }
-      
-      return foundPost;
+      if (!response.ok) {
+        throw new Error("Failed to fetch post");
+      }
+      const post: Post = await response.json();
+      return post;
     }
   });
 
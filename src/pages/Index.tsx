@@ -9,7 +9,7 @@ import { useState } from "react";
 import { ChevronLeft, ChevronRight } from "lucide-react";
 
 const Index = () => {
-  const { posts, isLoading, isError } = useBlog();
+  const { posts, isLoading, isError, hasMore, isLoadingMore, loadMorePosts } = useBlog();
   const [currentPage, setCurrentPage] = useState(0);
   const postsPerPage = 2;
   const [searchTerm, setSearchTerm] = useState("");
@@ -23,6 +23,8 @@ const Index = () => {
   const startIndex = currentPage * postsPerPage;
   const endIndex = startIndex + postsPerPage;
   const currentPosts = displayedPosts.slice(startIndex, endIndex);
+  // Search results arrive complete; the post list is fetched a page at a time
+  const canLoadMore = searchResults === null && hasMore;
   const handleSearch = async (e: React.FormEvent<HTMLFormElement>) => {
     e.preventDefault();
     if (!searchTerm.trim()) {
@@ -50,7 +52,12 @@ const Index = () => {
     setCurrentPage(prev => Math.max(0, prev - 1));
   };
 
-  const handleNext = () => {
+  const handleNext = async () => {
+    if (currentPage >= totalPages - 1 && canLoadMore) {
+      await loadMorePosts();
+      setCurrentPage(prev => prev + 1);
+      return;
+    }
     setCurrentPage(prev => Math.min(totalPages - 1, prev + 1));
   };
 
@@ -136,7 +143,7 @@ const Index = () => {
               </div>
 
               {/* Pagination Controls */}
-              {totalPages > 1 && (
+              {(totalPages > 1 || canLoadMore) && (
                 <div className="flex justify-center items-center gap-4 mt-8">
                   <Button
                     variant="outline"
@@ -149,13 +156,13 @@ const Index = () => {
                   </Button>
                   
                   <span className="text-sm text-muted-foreground">
-                    Page {currentPage + 1} of {totalPages}
+                    {canLoadMore ? `Page ${currentPage + 1}` : `Page ${currentPage + 1} of ${totalPages}`}
                   </span>
                   
                   <Button
                     variant="outline"
                     onClick={handleNext}
-                    disabled={currentPage === totalPages - 1}
+                    disabled={(currentPage === totalPages - 1 && !canLoadMore) || isLoadingMore}
                     className="flex items-center gap-2"
                   >
                     Next